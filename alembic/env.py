@@ -8,7 +8,9 @@ from alembic import context
 
 from src.app.db.database import Base
 from src.app.models.user import User
-from src.app.models.usage import UsageLog
+from src.app.models.usage import UsageLog, UsageDailyRollup
+from src.app.models.api_key import ApiKey
+from src.app.models.idempotency import IdempotencyRecord
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,86 @@
+# benchmarks/cases.py
+"""Benchmark cases for the analysis hot paths.
+
+Each case is a name plus a zero-argument callable; all setup (corpus, rule
+catalogs, images) happens up front so only the hot path is timed. Nothing
+here needs OCR binaries or network access.
+"""
+import io
+import json
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from PIL import Image
+
+from benchmarks.corpus import generate_ad_copy, generate_rule_catalog
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.pdf_service import PDFService
+from src.app.services.recommendation_engine import RecommendationEngine
+from src.app.services.rules_engine import RULES_FILE_PATH, RulesEngine
+
+RULE_CATALOG_SIZES = [10, 100, 10_000]
+# name -> (sentences, claim density)
+TEXTS = {
+    "short": (5, 0.4),
+    "medium": (40, 0.25),
+    "long": (400, 0.1),
+}
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def _rules_engine(size: int, workdir: Path) -> RulesEngine:
+    # The shipped rules come first so every catalog produces realistic matches.
+    shipped = json.loads(RULES_FILE_PATH.read_text())
+    path = workdir / f"rules_{size}.json"
+    path.write_text(json.dumps(shipped + generate_rule_catalog(size - len(shipped))))
+    return RulesEngine(path)
+
+
+def _png(width: int = 800, height: int = 800) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 140, 80)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_cases() -> List[Case]:
+    texts: Dict[str, str] = {name: generate_ad_copy(sentences, density, seed=index) for index, (name, (sentences, density)) in enumerate(TEXTS.items())}
+    cases: List[Case] = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engines = {size: _rules_engine(size, Path(workdir)) for size in RULE_CATALOG_SIZES}
+
+    for size, engine in engines.items():
+        # The 10k catalog on long copy takes seconds per call; short and medium show the trend.
+        for text_name in (["short", "medium"] if size >= 10_000 else TEXTS):
+            text = texts[text_name]
+            cases.append((f"rules_apply[rules={size},text={text_name}]", lambda engine=engine, text=text: engine.apply(text)))
+
+    service = AnalysisService(RulesEngine(RULES_FILE_PATH))
+    gpt_analysis = {
+        "risk_score": 55,
+        "level": "Medium",
+        "reasons": [f"Reason {i}" for i in range(5)],
+        "subtle_triggers": ["jargon", "omission"],
+        "recommendations": [f"Recommendation {i}" for i in range(5)],
+        "claims": [],
+    }
+    for size in (10, 100):
+        claims = [sentence for sentence in texts["long"].split(".") if sentence.strip()]
+        rule_matches = [dict(match, claim_index=index) for index, claim in enumerate(claims) for match in engines[size].apply(claim)]
+        cases.append((
+            f"aggregate_results[rules={size}]",
+            lambda rule_matches=rule_matches: service._aggregate_results(rule_matches, gpt_analysis),
+        ))
+
+    recommendation_engine = RecommendationEngine()
+    for text_name in ("short", "long"):
+        text = texts[text_name]
+        cases.append((f"detect_triggers[text={text_name}]", lambda text=text: recommendation_engine.detect_rule_based_triggers(text)))
+
+    image = _png()
+    report_data = {"text": texts["medium"], "score": 62, "level": "Medium", "reasons": [f"Reason {i}" for i in range(10)]}
+    cases.append(("pdf_report[text=medium]", lambda: PDFService(image, report_data).generate_report()))
+
+    return cases
@@ -0,0 +1,72 @@
+# benchmarks/corpus.py
+"""Seeded generators for synthetic ad copy and rule catalogs.
+
+Everything is deterministic for a given seed so results are comparable
+between runs and machines.
+"""
+import random
+from typing import Any, Dict, List
+
+PRODUCTS = ["bottle", "sneaker", "detergent", "coffee pod", "t-shirt", "shampoo", "phone case", "backpack"]
+CLAIM_TEMPLATES = [
+    "Our {product} is 100% eco-friendly",
+    "Every {product} is carbon neutral",
+    "The new {product} is made with sustainable materials",
+    "We offset all emissions from each {product}",
+    "Our {product} packaging is fully recyclable",
+    "This {product} will be net-zero by 2030",
+    "A green choice for a conscious planet",
+    "Our goal is to make every {product} climate positive",
+    "The {product} is made from {percent}% recycled plastic",
+    "Renewable energy powers the factory that makes our {product}",
+]
+FILLER_TEMPLATES = [
+    "Order your {product} today and get free shipping",
+    "Available in {count} colours at selected stores",
+    "Designed in Berlin and loved by customers everywhere",
+    "Sign up for our newsletter to hear about new arrivals",
+    "Each {product} comes with a two-year warranty",
+    "Prices include VAT while stocks last",
+    "Ask our team for sizing advice",
+    "Follow us for behind-the-scenes stories",
+]
+
+# Vocabulary for synthetic rules: each rule matches a few two-word phrases.
+RULE_ADJECTIVES = [
+    "eco", "green", "natural", "clean", "pure", "conscious", "ethical", "responsible",
+    "planet", "earth", "climate", "carbon", "ocean", "forest", "zero", "circular",
+]
+RULE_NOUNS = [
+    "friendly", "safe", "positive", "neutral", "smart", "choice", "future", "impact",
+    "promise", "standard", "formula", "approved", "certified", "conscious", "inspired", "kind",
+]
+SEVERITIES = ["Low", "Medium", "High"]
+
+
+def generate_ad_copy(sentences: int, claim_density: float, seed: int = 0) -> str:
+    """Return ad copy of `sentences` sentences, a `claim_density` fraction of which are environmental claims."""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(sentences):
+        template = rng.choice(CLAIM_TEMPLATES if rng.random() < claim_density else FILLER_TEMPLATES)
+        parts.append(template.format(product=rng.choice(PRODUCTS), percent=rng.randint(10, 90), count=rng.randint(2, 12)))
+    return ". ".join(parts) + "."
+
+
+def generate_rule_catalog(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Return `size` rules in the `src/rules.json` format with distinct word-boundary patterns."""
+    rng = random.Random(seed)
+    phrases = [f"{adjective}[- ]?{noun}" for adjective in RULE_ADJECTIVES for noun in RULE_NOUNS]
+    rules = []
+    for index in range(size):
+        alternatives = rng.sample(phrases, 3)
+        # A numeric suffix keeps patterns unique beyond the phrase vocabulary.
+        alternatives.append(f"claim{index:05d}")
+        rules.append({
+            "id": f"bench_{index:05d}",
+            "category": f"Synthetic Category {index % 12}",
+            "pattern": r"\b(" + "|".join(alternatives) + r")\b",
+            "severity": SEVERITIES[index % len(SEVERITIES)],
+            "recommendation": f"Synthetic recommendation {index}.",
+        })
+    return rules
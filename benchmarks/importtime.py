@@ -0,0 +1,85 @@
+# benchmarks/importtime.py
+"""Cold-start report for the API process.
+
+Imports `src.app.main` in fresh interpreters, reports the best wall-clock
+import time and the `-X importtime` breakdown of the slowest modules:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --top 40 --output importtime.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_MODULE = "src.app.main"
+# Dependencies that must only be imported when first used.
+LAZY_MODULES = ["openai", "reportlab", "pytesseract", "PIL", "numpy", "fitz"]
+
+_TIMED_IMPORT = (
+    "import json, sys, time\n"
+    "started = time.perf_counter()\n"
+    f"import {APP_MODULE}\n"
+    "elapsed_ms = (time.perf_counter() - started) * 1000\n"
+    f"print(json.dumps({{'import_ms': elapsed_ms, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def timed_import(env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Import the app in a fresh interpreter; return its import time and which lazy modules got loaded."""
+    result = subprocess.run([sys.executable, "-c", _TIMED_IMPORT], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def best_import_ms(runs: int = 3, env: Optional[Dict[str, str]] = None) -> float:
+    return min(timed_import(env)["import_ms"] for _ in range(runs))
+
+
+def importtime_breakdown(env: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Parse `python -X importtime` output into one row per module (times in ms)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {APP_MODULE}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the API's cold-start import time.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25, help="Number of slowest modules to list.")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    best_ms = best_import_ms(args.runs)
+    loaded = timed_import()["loaded"]
+    rows = importtime_breakdown()
+    slowest = sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:args.top]
+
+    print(f"import {APP_MODULE}: best of {args.runs} = {best_ms:.1f} ms")
+    print(f"lazy modules loaded at import: {', '.join(loaded) or 'none'}")
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+    for row in slowest:
+        print(f"{row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}  {'  ' * row['depth']}{row['module']}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"best_import_ms": best_ms, "lazy_modules_loaded": loaded, "modules": rows}, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
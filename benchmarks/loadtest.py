@@ -0,0 +1,250 @@
+# benchmarks/loadtest.py
+"""Closed-loop load test for the API with simulated OCR and LLM backends.
+
+Drives the FastAPI `app` either in-process over an ASGI transport or through
+a local uvicorn server on a background thread. OCR and the LLM judge are
+replaced by simulations with configurable latency distributions, and a
+temporary SQLite database takes the usage writes. For every endpoint and
+concurrency level it reports throughput, latency percentiles, event-loop lag
+and the error rate:
+
+    python -m benchmarks.loadtest --concurrency 1,4,16,64 --duration 10
+    python -m benchmarks.loadtest --mode uvicorn --ocr-latency lognormal:400:0.5 --llm-latency fixed:800
+
+Latency specs are `fixed:MS`, `uniform:LO:HI` or `lognormal:MEDIAN:SIGMA` (milliseconds).
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ENDPOINTS = ["analyze", "report", "usage_summary"]
+
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """Return a sampler of latencies in milliseconds for `spec`."""
+    rng = random.Random(seed)
+    kind, *args = spec.split(":")
+    values = [float(arg) for arg in args]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda: median * math.exp(rng.gauss(0, sigma))
+    raise ValueError(f"Invalid latency spec {spec!r}; use fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA.")
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed: float, lag_ms: List[float]) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    lags = sorted(lag_ms)
+    total = len(ordered)
+    return {
+        "requests": total,
+        "rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+        "p99_ms": round(percentile(ordered, 0.99), 2),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "loop_lag_p99_ms": round(percentile(lags, 0.99), 2),
+        "loop_lag_max_ms": round(lags[-1], 2) if lags else 0.0,
+    }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from short sleeps.
+
+    Lag appears whenever something blocks the loop (synchronous work in a
+    handler, a slow SQLite call on the loop thread, ...).
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples_ms: List[float] = []
+        self._stopped = False
+
+    async def run(self) -> None:
+        while not self._stopped:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples_ms.append(max(0.0, (time.perf_counter() - started - self.interval) * 1000))
+
+    def stop(self) -> None:
+        self._stopped = True
+
+
+def _images(count: int) -> List[bytes]:
+    """Distinct small PNGs, so identical-upload coalescing does not flatter the numbers."""
+    from PIL import Image
+
+    images = []
+    for index in range(count):
+        buffer = io.BytesIO()
+        Image.new("RGB", (160, 160), (index % 256, (index * 7) % 256, (index * 13) % 256)).save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def _install_simulations(ocr_latency: Callable[[], float], llm_latency: Callable[[], float]) -> None:
+    from benchmarks.corpus import generate_ad_copy
+    from src.app.services import analysis_service, gpt_service
+    from src.app.services.llm_backend import StubBackend
+
+    texts = [generate_ad_copy(12, 0.4, seed=seed) for seed in range(32)]
+
+    def simulated_ocr(image_bytes: bytes, language_hints=()) -> str:
+        time.sleep(ocr_latency() / 1000)
+        return texts[len(image_bytes) % len(texts)]
+
+    analysis_service.extract_text_from_image = simulated_ocr
+    gpt_service.set_llm_backend(StubBackend(latency_sampler=llm_latency))
+
+
+def _request_factory(endpoint: str, images: List[bytes]) -> Callable[[Any, int], Any]:
+    if endpoint == "usage_summary":
+        return lambda client, n: client.get("/api/v1/usage/summary")
+    path = "/api/v1/analyze" if endpoint == "analyze" else "/api/v1/report.pdf"
+    return lambda client, n: client.post(path, files={"file": (f"ad{n}.png", images[n % len(images)], "image/png")})
+
+
+async def _run_level(client, send, concurrency: int, duration: float, loop: asyncio.AbstractEventLoop) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(sys.maxsize))
+    monitor = LoopLagMonitor()
+    monitor_future = asyncio.run_coroutine_threadsafe(monitor.run(), loop)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await send(client, next(counter))
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+    await asyncio.wrap_future(monitor_future)
+    return summarize(latencies, errors, elapsed, monitor.samples_ms)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_load_test(
+    mode: str,
+    endpoints: List[str],
+    concurrency_levels: List[int],
+    duration: float,
+    ocr_latency: Callable[[], float],
+    llm_latency: Callable[[], float],
+) -> List[Dict[str, Any]]:
+    import httpx
+    from src.app.db.database import Base, engine
+    from src.app.main import app
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    _install_simulations(ocr_latency, llm_latency)
+    images = _images(max(concurrency_levels) * 4)
+
+    server = thread = None
+    if mode == "uvicorn":
+        import uvicorn
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+        server_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=server_loop.run_until_complete, args=(server.serve(),), daemon=True)
+        thread.start()
+        while not server.started:
+            await asyncio.sleep(0.05)
+        transport, base_url, app_loop = None, f"http://127.0.0.1:{port}", server_loop
+    else:
+        transport, base_url, app_loop = httpx.ASGITransport(app=app), "http://127.0.0.1", asyncio.get_running_loop()
+
+    results = []
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=120) as client:
+            for endpoint in endpoints:
+                send = _request_factory(endpoint, images)
+                for concurrency in concurrency_levels:
+                    stats = await _run_level(client, send, concurrency, duration, app_loop)
+                    results.append({"endpoint": endpoint, "concurrency": concurrency, **stats})
+                    _print_row(results[-1])
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+    return results
+
+
+def _print_row(row: Dict[str, Any]) -> None:
+    print(
+        f"{row['endpoint']:<14} c={row['concurrency']:<4} {row['requests']:>6} req  {row['rps']:>8.1f} rps  "
+        f"p50 {row['p50_ms']:>8.1f}  p95 {row['p95_ms']:>8.1f}  p99 {row['p99_ms']:>8.1f} ms  "
+        f"err {row['error_rate']:>6.1%}  loop lag p99 {row['loop_lag_p99_ms']:>7.1f} / max {row['loop_lag_max_ms']:>7.1f} ms"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API with simulated OCR and LLM backends.")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Comma-separated subset of {ENDPOINTS}.")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated concurrency levels to sweep.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint and concurrency level.")
+    parser.add_argument("--ocr-latency", default="lognormal:300:0.4")
+    parser.add_argument("--llm-latency", default="lognormal:900:0.5")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    # The database URL is read when the app is imported, so point it at a scratch file first.
+    scratch = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{scratch.name}/loadtest.db"
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret")
+
+    results = asyncio.run(run_load_test(
+        args.mode, endpoints, levels, args.duration, parse_latency(args.ocr_latency), parse_latency(args.llm_latency),
+    ))
+    if args.output:
+        args.output.write_text(json.dumps({"config": vars(args) | {"output": str(args.output)}, "results": results}, indent=2) + "\n")
+    scratch.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
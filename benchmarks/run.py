@@ -0,0 +1,105 @@
+# benchmarks/run.py
+"""Run the microbenchmarks and compare them against a stored baseline.
+
+    python -m benchmarks.run                          # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline          # record a new baseline
+    python -m benchmarks.run --filter rules_apply --output results.json
+
+Exits with status 1 when any case's median is more than `--threshold`
+(default 25%) slower than its baseline. Baselines are machine-specific;
+record them on the machine that runs the check.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.5, max_runs: int = 1000, min_runs: int = 5) -> Dict[str, Any]:
+    """Time `fn` repeatedly for at least `min_time` seconds and `min_runs` runs, after one warm-up call."""
+    fn()
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 4),
+        "min_ms": round(samples[0], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+def run(filter_text: str = "", min_time: float = 0.5, min_runs: int = 5) -> Dict[str, Any]:
+    from benchmarks.cases import build_cases
+
+    results = {}
+    for name, fn in build_cases():
+        if filter_text not in name:
+            continue
+        results[name] = measure(fn, min_time=min_time, min_runs=min_runs)
+        print(f"{name:<45} median {results[name]['median_ms']:>10.3f} ms  p95 {results[name]['p95_ms']:>10.3f} ms  ({results[name]['runs']} runs)")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Return the cases whose median regressed by more than `threshold` relative to `baseline`."""
+    regressions = []
+    for name, stats in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None or reference["median_ms"] <= 0:
+            continue
+        ratio = stats["median_ms"] / reference["median_ms"]
+        if ratio > 1 + threshold:
+            regressions.append({"case": name, "baseline_ms": reference["median_ms"], "current_ms": stats["median_ms"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the analysis hot paths.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds to spend per case.")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown ratio, e.g. 0.25 for 25%%.")
+    args = parser.parse_args(argv)
+
+    current = run(args.filter, args.min_time)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+
+    regressions = compare(current, json.loads(args.baseline.read_text()), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['case']}: {regression['baseline_ms']} ms -> {regression['current_ms']} ms (x{regression['ratio']})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
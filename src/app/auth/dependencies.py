@@ -1,11 +1,52 @@
 from typing import Optional
-from fastapi import Depends, Request
+from fastapi import Depends, HTTPException, Request
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from src.app.db.database import async_session_maker
 from src.app.models.user import User
-from src.app.routers.auth import fastapi_users
+from src.app.auth.manager import UserManager
+from src.app.auth.transport import get_jwt_strategy
+from src.app.auth.user_cache import user_cache
+from src.app.routers.auth import cookie_transport
+from src.app.services.api_key_service import api_key_service
+
+API_KEY_HEADER = "X-API-Key"
+
+
+async def _read_user_from_token(token: str) -> Optional[User]:
+    async with async_session_maker() as session:
+        user_manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        return await get_jwt_strategy().read_token(token, user_manager)
+
 
 async def get_optional_current_user(request: Request) -> Optional[User]:
-    try:
-        user = await fastapi_users.authenticator.try_read_user(request)
+    """Resolve the user behind an API key or the auth cookie, or None for anonymous requests.
+
+    Resolved users are kept in a short-TTL cache so hot endpoints do not
+    decode the JWT and query the users table on every request. A verified API
+    key is exposed as `request.state.api_key` for per-key quota accounting.
+    """
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key:
+        verified = await api_key_service.validate_api_key(api_key)
+        if verified is None:
+            raise HTTPException(status_code=401, detail="Invalid or revoked API key.")
+        request.state.api_key = verified
+        return verified.user
+
+    token = request.cookies.get(cookie_transport.cookie_name)
+    if not token:
+        return None
+
+    user = user_cache.get(token)
+    if user is not None:
         return user
+
+    try:
+        user = await _read_user_from_token(token)
     except Exception:
         return None
+    if user is None or not user.is_active:
+        return None
+
+    user_cache.set(token, user)
+    return user
@@ -1,5 +1,5 @@
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, UUIDIDMixin
@@ -7,6 +7,12 @@ from fastapi_users import BaseUserManager, UUIDIDMixin
 from src.app.db.database import get_async_session
 from src.app.models.user import User
 from src.app.db.user_db import get_user_db
+from src.app.auth.user_cache import user_cache
+from src.app.services.api_key_service import api_key_service
+from src.app.services.gpt_service import invalidate_prompt_cache
+
+# Profile fields that personalize the GPT prompt.
+PROMPT_PROFILE_FIELDS = {"sector", "company_size", "role"}
 
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
@@ -16,6 +22,19 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     async def on_after_register(self, user: User, request: Optional[Request] = None):
         print(f"User {user.id} has registered.")
 
+    async def on_after_update(
+        self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None
+    ):
+        # Profile and premium changes must be visible on the next request.
+        user_cache.invalidate_user(user.id)
+        api_key_service.invalidate_user(user.id)
+        if PROMPT_PROFILE_FIELDS & set(update_dict):
+            invalidate_prompt_cache()
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate_user(user.id)
+        api_key_service.invalidate_user(user.id)
+
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
@@ -1,12 +1,12 @@
 import os
 from fastapi_users.authentication import AuthenticationBackend, JWTStrategy
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY not found in environment variables")
-
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET_KEY, lifetime_seconds=3600)
+    # Read on use rather than at import, so the app (and tooling) can be imported without it.
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key:
+        raise ValueError("SECRET_KEY not found in environment variables")
+    return JWTStrategy(secret=secret_key, lifetime_seconds=3600)
 
 auth_backend = AuthenticationBackend(
     name="jwt",
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from src.app.models.user import User
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+
+class UserCache:
+    """Bounded, short-TTL cache of users resolved from auth tokens.
+
+    Entries are keyed by a hash of the token so raw JWTs are not kept in
+    memory. A reverse index from user id to token keys lets profile updates
+    drop every cached session of that user.
+    """
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._keys_by_user: Dict[uuid.UUID, Set[str]] = {}
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[User]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return user
+
+    def set(self, token: str, user: User) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, user)
+        self._keys_by_user.setdefault(user.id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """Drop every cached token of `user_id`, e.g. after a profile update."""
+        for key in self._keys_by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].id
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Singleton instance
+user_cache = UserCache()
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -9,8 +12,24 @@ from src.app.routers.analysis import router as analysis_router
 from src.app.routers.auth import router as auth_router
 from src.app.routers.usage import router as usage_router
 from src.app.routers.onboarding import router as onboarding_router
+from src.app.routers.api_keys import router as api_keys_router
+from src.app.services.compression import CompressionMiddleware
+from src.app.services.idempotency import IdempotencyMiddleware
+from src.app.services.profiling import ProfilingMiddleware
+from src.app.services.tracing import TracingMiddleware, trace_sink
+from src.app.services.url_fetcher import url_fetcher
+from src.app.services.warmup import warmup
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per-worker warm-up; under the pre-fork launcher the shared parts already ran in the parent
+    await warmup.warm_worker()
+    yield
+    await url_fetcher.aclose()
+    # Write out traces still queued for the JSONL sink
+    trace_sink.flush()
 
-app = FastAPI(title="GreenCheck API", version="2.0.0")
+app = FastAPI(title="GreenCheck API", version="2.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Configure CORS
 origins = [
@@ -19,20 +38,38 @@ origins = [
     "http://127.0.0.1:5500",
 ]
 
+# Innermost, so replayed responses still get CORS headers and compression
+app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Analysis-Cache", "Idempotent-Replayed", "Retry-After"],
 )
+# Inside tracing, so traced response sizes are the compressed bytes sent
+app.add_middleware(CompressionMiddleware)
+# Runs inside the tracing middleware so profiles are attached to the request trace
+app.add_middleware(ProfilingMiddleware)
+# Added last so it is outermost and its timings cover the whole request
+app.add_middleware(TracingMiddleware)
 
 # Include routers
 app.include_router(analysis_router, prefix="/api/v1")
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(usage_router, prefix="/api/v1")
 app.include_router(onboarding_router, prefix="/api/v1")
+app.include_router(api_keys_router, prefix="/api/v1")
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/ready")
+def readiness_check(response: Response):
+    """Readiness for load balancers: 503 until every component of this worker is warm."""
+    ready, components = warmup.readiness()
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "not_ready", "components": components}
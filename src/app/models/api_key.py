@@ -0,0 +1,19 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import String, DateTime, func, Integer, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from src.app.db.database import Base
+
+class ApiKey(Base):
+    __tablename__ = "api_keys"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Public, non-secret start of the key (e.g. "sk_AbCdEfGh"), used as the lookup index
+    prefix: Mapped[str] = mapped_column(String(16), nullable=False, index=True)
+    # HMAC-SHA256 of the full key, hex encoded
+    key_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    daily_quota: Mapped[int] = mapped_column(Integer, nullable=True) # None means no per-key limit
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+from typing import Dict
+from sqlalchemy import String, DateTime, func, Integer, JSON, LargeBinary, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from src.app.db.database import Base
+
+class IdempotencyRecord(Base):
+    """Response stored for an `Idempotency-Key`, replayed to retries of the same request."""
+    __tablename__ = "idempotency_records"
+    __table_args__ = (UniqueConstraint("subject", "key", name="uq_idempotency_records_subject_key"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    # SHA-256 of the caller's API key, session token or IP address, hex encoded
+    subject: Mapped[str] = mapped_column(String(64), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    # SHA-256 of method, path and body; a key reused for another request is rejected
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=True) # None while the original request runs
+    response_headers: Mapped[Dict[str, str]] = mapped_column(JSON, nullable=True)
+    response_body: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    # Lease of the running request; once past, a retry may take the key over
+    locked_until: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
@@ -1,6 +1,7 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import String, Boolean, DateTime, func, Integer, JSON, ForeignKey
+from datetime import date, datetime
+from typing import Dict, List
+from sqlalchemy import String, Boolean, Date, DateTime, func, Integer, JSON, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 from src.app.db.database import Base
 
@@ -9,11 +10,36 @@ class UsageLog(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=True)
+    api_key_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("api_keys.id"), nullable=True, index=True)
     ip_address: Mapped[str] = mapped_column(String(50), nullable=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
     # analysis_id is not needed as the id of this table serves the same purpose
-    input_type: Mapped[str] = mapped_column(String(50), nullable=False) # "image", "text", "url"
+    input_type: Mapped[str] = mapped_column(String(50), nullable=False) # "image", "text", "url", "reanalysis"
     chars_count: Mapped[int] = mapped_column(Integer, nullable=True)
     premium_features_used: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     result_json: Mapped[dict] = mapped_column(JSON, nullable=False)
     duration_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class UsageDailyRollup(Base):
+    """Per-user, per-day aggregates of `usage_logs`.
+
+    Rows are updated incrementally by `usage_service.log_analysis` so that
+    statistics endpoints never have to scan the raw log table.
+    """
+    __tablename__ = "usage_daily_rollups"
+    __table_args__ = (UniqueConstraint("user_id", "day", name="uq_usage_daily_rollups_user_day"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    analysis_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    premium_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    duration_sum_ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    duration_max_ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Counts per bucket of usage_service.DURATION_BUCKETS_MS (last bucket is overflow)
+    duration_histogram: Mapped[List[int]] = mapped_column(JSON, nullable=False)
+    # Counts per score decile: 0-9, 10-19, ..., 90-100
+    score_histogram: Mapped[List[int]] = mapped_column(JSON, nullable=False)
+    level_counts: Mapped[Dict[str, int]] = mapped_column(JSON, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,76 +1,327 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Request
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Request
 from fastapi.responses import StreamingResponse
-from src.app.schemas.analysis import AnalysisResponse
+from src.app.schemas.analysis import (
+    AnalysisResponse,
+    BatchAnalysisResponse,
+    BatchTextAnalysisRequest,
+    ReanalysisRequest,
+    TEXT_MAX_CHARS,
+    TextAnalysisRequest,
+    UrlAnalysisRequest,
+)
 from src.app.models.user import User
 from src.app.auth.dependencies import get_optional_current_user
 from src.app.services import usage_service
+from src.app.services.admission import AdmissionRejected, admission_controller
 import time
 from src.app.services.analysis_service import analysis_service  # Updated import
-from src.app.services.pdf_service import PDFService
+from src.app.services.serialization import FIELDS_DESCRIPTION, json_response, parse_fields
+from src.app.services.tracing import span
+from src.app.services.url_fetcher import UrlFetchError, url_fetcher
+import asyncio
 import io
-from typing import Any
+from typing import Any, Awaitable, Callable, List, Optional
 
 router = APIRouter()
 
+
+def _is_supported_upload(content_type: Optional[str]) -> bool:
+    # Images (including multi-page TIFF and animated GIF) and PDF one-pagers
+    return bool(content_type) and (content_type.startswith("image/") or content_type == "application/pdf")
+
+
+async def _usage_limit_exceeded(user: Optional[User], ip_address: str) -> HTTPException:
+    summary = await usage_service.get_usage_summary(user=user, ip_address=ip_address)
+    return HTTPException(
+        status_code=429,
+        detail={
+            "code": "USAGE_LIMIT_EXCEEDED",
+            "message": "Usage limit exceeded. Please upgrade to premium or log in.",
+            **summary,
+        },
+    )
+
+
+def _overloaded(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={"code": "OVERLOADED", "message": "The service is busy. Please retry shortly."},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def _admitted(user: Optional[User], run: Callable[[], Awaitable[Any]]) -> Any:
+    """Run an analysis in an admission slot of the user's priority lane; 503 when shed."""
+    try:
+        async with admission_controller.admit(user):
+            return await run()
+    except AdmissionRejected as e:
+        raise _overloaded(e)
+
+
+async def _admitted_batch(user: Optional[User], runs: List[Callable[[], Awaitable[Any]]]) -> List[Any]:
+    """Run a batch of analyses admitted as one request, as many at once as it holds slots; 503 when shed.
+
+    Shedding can only happen before the first item starts, so a batch either
+    runs completely or not at all.
+    """
+    results: List[Any] = [None] * len(runs)
+    items = iter(enumerate(runs))
+
+    async def run_items() -> None:
+        for index, run in items:
+            results[index] = await run()
+
+    try:
+        async with admission_controller.admit_batch(user, len(runs)) as slots:
+            workers = [asyncio.ensure_future(run_items()) for _ in range(slots)]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                # A failing item (or a client that went away) stops the rest of the batch
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+    except AdmissionRejected as e:
+        raise _overloaded(e)
+    return results
+
+
+async def _check_quota(request: Request, user: Optional[User], count: int) -> None:
+    """Raise 429 unless `count` more analyses fit in today's quota."""
+    ip_address = request.client.host
+    api_key = getattr(request.state, "api_key", None)
+    with span("db.quota_check"):
+        remaining = await usage_service.get_remaining_analyses(user=user, ip_address=ip_address, api_key=api_key)
+    if remaining is not None and remaining < count:
+        raise await _usage_limit_exceeded(user, ip_address)
+
+
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_image_endpoint(
     request: Request,
     file: UploadFile = File(...),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     user: User = Depends(get_optional_current_user),
 ) -> AnalysisResponse:
     """Accept an image file, perform analysis, and return the results."""
     start_time = time.time()
+    include = parse_fields(fields, AnalysisResponse)
 
     ip_address = request.client.host
-    if not await usage_service.can_perform_analysis(user=user, ip_address=ip_address):
-        summary = await usage_service.get_usage_summary(user=user, ip_address=ip_address)
-        raise HTTPException(
-            status_code=429,
-            detail={
-                "code": "USAGE_LIMIT_EXCEEDED",
-                "message": "Usage limit exceeded. Please upgrade to premium or log in.",
-                **summary,
-            },
-        )
+    api_key = getattr(request.state, "api_key", None)
+    with span("db.quota_check"):
+        allowed = await usage_service.can_perform_analysis(user=user, ip_address=ip_address, api_key=api_key)
+    if not allowed:
+        raise await _usage_limit_exceeded(user, ip_address)
 
-    if not file.content_type.startswith("image/"):
+    if not _is_supported_upload(file.content_type):
         raise HTTPException(status_code=400, detail="File provided is not an image.")
 
     image_bytes = await file.read()
     if not image_bytes:
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
-    analysis_results = analysis_service.analyze_image(image_bytes)  # Use the service instance
+    # Runs off the event loop; identical concurrent uploads share one execution
+    analysis_results = await _admitted(user, lambda: analysis_service.analyze_image_async(image_bytes, user))
+
+    duration_ms = int((time.time() * 1000) - (start_time * 1000))
+    with span("db.log_analysis"):
+        await usage_service.log_analysis(
+            input_type="image",
+            result_json=analysis_results,
+            duration_ms=duration_ms,
+            user=user,
+            ip_address=ip_address,
+            api_key=api_key,
+        )
+
+    return json_response(AnalysisResponse, analysis_results, include)
+
+
+@router.post("/analyze/text", response_model=AnalysisResponse)
+async def analyze_text_endpoint(
+    request: Request,
+    body: TextAnalysisRequest,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    user: User = Depends(get_optional_current_user),
+) -> AnalysisResponse:
+    """Analyze ad copy sent as text, skipping OCR."""
+    start_time = time.time()
+    include = parse_fields(fields, AnalysisResponse)
+    await _check_quota(request, user, 1)
+
+    analysis_results = await _admitted(user, lambda: analysis_service.analyze_text_async(body.text, user))
+
+    duration_ms = int((time.time() * 1000) - (start_time * 1000))
+    with span("db.log_analysis"):
+        await usage_service.log_analysis(
+            input_type="text",
+            result_json=analysis_results,
+            duration_ms=duration_ms,
+            user=user,
+            ip_address=request.client.host,
+            api_key=getattr(request.state, "api_key", None),
+        )
+
+    return json_response(AnalysisResponse, analysis_results, include)
+
+
+async def _revised_text(body: ReanalysisRequest, user: Optional[User]) -> str:
+    """The copy to re-analyze: the given text, or a prior analysis' sentences with the edits applied."""
+    if (body.text is None) == (body.log_id is None):
+        raise HTTPException(status_code=400, detail="Provide either `text` or `log_id`.")
+    if body.text is not None:
+        if body.edits:
+            raise HTTPException(status_code=400, detail="`edits` apply to the prior analysis given by `log_id`.")
+        return body.text
+    if user is None:
+        raise HTTPException(status_code=401, detail="Log in to re-analyze a prior analysis.")
+
+    with span("db.usage_log"):
+        log = await usage_service.get_usage_log_by_id(user, body.log_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail="Analysis not found.")
+    sentences = list(log.result_json.get("claim_texts") or [])
+    if not sentences:
+        raise HTTPException(status_code=400, detail="This analysis has no stored sentences; send the revised `text` instead.")
+    for edit in body.edits:
+        if edit.index >= len(sentences):
+            raise HTTPException(status_code=400, detail=f"Edit index {edit.index} is out of range; the analysis has {len(sentences)} sentences.")
+        sentences[edit.index] = edit.text
+    text = ". ".join(sentence.strip() for sentence in sentences if sentence.strip())
+    if not text or len(text) > TEXT_MAX_CHARS:
+        raise HTTPException(status_code=400, detail=f"The edited copy must be 1 to {TEXT_MAX_CHARS} characters.")
+    return text
+
+
+@router.post("/analyze/text/reanalyze", response_model=AnalysisResponse)
+async def reanalyze_text_endpoint(
+    request: Request,
+    body: ReanalysisRequest,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    user: User = Depends(get_optional_current_user),
+) -> AnalysisResponse:
+    """Re-check edited ad copy. Unchanged sentences reuse their memoized results; only new or changed ones are scored."""
+    start_time = time.time()
+    include = parse_fields(fields, AnalysisResponse)
+    text = await _revised_text(body, user)
+    await _check_quota(request, user, 1)
+
+    analysis_results = await _admitted(user, lambda: analysis_service.reanalyze_text_async(text, user))
 
     duration_ms = int((time.time() * 1000) - (start_time * 1000))
-    await usage_service.log_analysis(
-        input_type="image",
-        result_json=analysis_results,
-        duration_ms=duration_ms,
-        user=user,
-        ip_address=ip_address,
+    with span("db.log_analysis"):
+        await usage_service.log_analysis(
+            input_type="reanalysis",
+            result_json=analysis_results,
+            duration_ms=duration_ms,
+            user=user,
+            ip_address=request.client.host,
+            api_key=getattr(request.state, "api_key", None),
+        )
+
+    return json_response(AnalysisResponse, analysis_results, include)
+
+
+@router.post("/analyze/text/batch", response_model=BatchAnalysisResponse)
+async def analyze_text_batch_endpoint(
+    request: Request,
+    body: BatchTextAnalysisRequest,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION + " Applies to each result."),
+    user: User = Depends(get_optional_current_user),
+) -> BatchAnalysisResponse:
+    """Analyze several ad copies in one request; each counts against the quota."""
+    start_time = time.time()
+    include = parse_fields(fields, AnalysisResponse)
+    await _check_quota(request, user, len(body.texts))
+
+    # Admitted as one request; its texts run on the slots that were free
+    results = await _admitted_batch(
+        user, [lambda text=text: analysis_service.analyze_text_async(text, user) for text in body.texts]
     )
 
-    return AnalysisResponse(**analysis_results)
+    # The texts run concurrently, so each is logged with its share of the batch time.
+    duration_ms = int((time.time() * 1000) - (start_time * 1000)) // len(results)
+    with span("db.log_analysis", count=len(results)):
+        await usage_service.log_analyses(
+            input_type="text",
+            entries=[(result, duration_ms) for result in results],
+            user=user,
+            ip_address=request.client.host,
+            api_key=getattr(request.state, "api_key", None),
+        )
+
+    return json_response(BatchAnalysisResponse, {"results": results}, {"results": {"__all__": include}} if include else None)
+
+
+@router.post("/analyze/url", response_model=AnalysisResponse)
+async def analyze_url_endpoint(
+    request: Request,
+    body: UrlAnalysisRequest,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    user: User = Depends(get_optional_current_user),
+) -> AnalysisResponse:
+    """Fetch a creative by URL and analyze it; unchanged assets reuse their cached analysis."""
+    start_time = time.time()
+    include = parse_fields(fields, AnalysisResponse)
+    # Without an allowlist any public host can be fetched, so callers must be known
+    if user is None and not url_fetcher.allowed_hosts:
+        raise HTTPException(status_code=401, detail="Log in to analyze a creative by URL.")
+    await _check_quota(request, user, 1)
+
+    try:
+        asset = await url_fetcher.fetch(str(body.url))
+    except UrlFetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    key = analysis_service.content_key(asset.content, user)
+    analysis_results = url_fetcher.cached_analysis(asset, key)
+    cache_status = "hit" if analysis_results is not None else "miss"
+    if analysis_results is None:
+        analysis_results = await _admitted(user, lambda: analysis_service.analyze_image_async(asset.content, user))
+        url_fetcher.remember_analysis(asset, key, analysis_results)
+
+    duration_ms = int((time.time() * 1000) - (start_time * 1000))
+    with span("db.log_analysis"):
+        await usage_service.log_analysis(
+            input_type="url",
+            result_json=analysis_results,
+            duration_ms=duration_ms,
+            user=user,
+            ip_address=request.client.host,
+            api_key=getattr(request.state, "api_key", None),
+        )
+
+    return json_response(AnalysisResponse, analysis_results, include, headers={"X-Analysis-Cache": cache_status})
 
 
 @router.post("/report.pdf")
-async def generate_report_endpoint(file: UploadFile = File(...)):
+async def generate_report_endpoint(
+    file: UploadFile = File(...),
+    user: User = Depends(get_optional_current_user),
+):
     """Accept an image file, perform analysis, and return a PDF report."""
-    if not file.content_type.startswith("image/"):
+    if not _is_supported_upload(file.content_type):
         raise HTTPException(status_code=400, detail="File provided is not an image.")
 
     image_bytes = await file.read()
     if not image_bytes:
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
-    analysis_results = analysis_service.analyze_image(image_bytes)
+    analysis_results = await _admitted(user, lambda: analysis_service.analyze_image_async(image_bytes, user))
 
     # PDFService expects a dict-like object
     analysis_data = analysis_results
 
+    # reportlab is imported on first use to keep it out of the API's cold start
+    from src.app.services.pdf_service import PDFService
+
     pdf_service = PDFService(image_bytes, analysis_data)
-    pdf_bytes, filename = pdf_service.generate_report()
+    with span("pdf", image_bytes=len(image_bytes)) as attrs:
+        pdf_bytes, filename = pdf_service.generate_report()
+        attrs["pdf_bytes"] = len(pdf_bytes)
 
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
     return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers=headers)
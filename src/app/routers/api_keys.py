@@ -0,0 +1,36 @@
+import uuid
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from src.app.models.user import User
+from src.app.routers.auth import current_user
+from src.app.services.api_key_service import api_key_service
+from src.app.schemas.api_key import ApiKeyCreate, ApiKeyCreated, ApiKeyRead
+
+router = APIRouter()
+
+
+@router.post("/me/api-keys", response_model=ApiKeyCreated, status_code=201)
+async def create_my_api_key(payload: ApiKeyCreate, user: User = Depends(current_user)):
+    api_key, record = await api_key_service.create_api_key(user, payload.name, payload.daily_quota)
+    return ApiKeyCreated(
+        id=record.id,
+        name=record.name,
+        prefix=record.prefix,
+        daily_quota=record.daily_quota,
+        created_at=record.created_at,
+        revoked_at=record.revoked_at,
+        key=api_key,
+    )
+
+
+@router.get("/me/api-keys", response_model=List[ApiKeyRead])
+async def list_my_api_keys(user: User = Depends(current_user)):
+    return await api_key_service.list_api_keys(user)
+
+
+@router.delete("/me/api-keys/{key_id}", response_model=ApiKeyRead)
+async def revoke_my_api_key(key_id: uuid.UUID, user: User = Depends(current_user)):
+    record = await api_key_service.revoke_api_key(user, key_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="API key not found")
+    return record
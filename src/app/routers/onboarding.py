@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from src.app.models.user import User
 from src.app.routers.auth import current_user
 from src.app.auth.schemas import UserUpdate
@@ -9,8 +9,10 @@ router = APIRouter()
 @router.post("/me/onboarding", response_model=UserUpdate)
 async def complete_onboarding(
     onboarding_data: UserUpdate,
+    request: Request,
     user: User = Depends(current_user),
     user_manager = Depends(get_user_manager),
 ):
-    user = await user_manager.update_user(user, onboarding_data)
+    # UserManager.on_after_update invalidates the cached user for this account.
+    user = await user_manager.update(onboarding_data, user, safe=True, request=request)
     return user
@@ -1,14 +1,37 @@
+import hashlib
+import hmac
+import os
 import uuid
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from src.app.models.user import User
 from src.app.auth.dependencies import get_optional_current_user
 from src.app.routers.auth import current_user
 from src.app.services import usage_service
-from src.app.schemas.usage import UsageLogRead, UsageSummary
+from src.app.schemas.usage import UsageLogRead, UsageStats, UsageSummary
+from src.app.services.serialization import (
+    FIELDS_DESCRIPTION,
+    content_hash,
+    etag_matches,
+    if_none_match_tags,
+    json_response,
+    not_modified,
+    parse_fields,
+)
 
 router = APIRouter()
 
+# A log never changes once written. `private` keeps shared caches from serving one user's log to another.
+LOG_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# The history grows, so caches must revalidate it (a cheap count query) on every use.
+HISTORY_CACHE_CONTROL = "private, no-cache"
+
+
+def _owner_tag(user: User, log_id: uuid.UUID) -> str:
+    """Keyed hash of who may read the log; only the owner is ever sent a tag that matches."""
+    secret = os.getenv("SECRET_KEY", "")
+    return hmac.new(secret.encode(), f"{user.id}:{log_id}".encode(), hashlib.sha256).hexdigest()[:16]
+
 
 @router.get("/usage/summary", response_model=UsageSummary)
 async def get_usage_summary_endpoint(
@@ -21,12 +44,49 @@ async def get_usage_summary_endpoint(
 
 
 @router.get("/me/usage", response_model=List[UsageLogRead])
-async def get_my_usage(user: User = Depends(current_user)):
-    return await usage_service.get_usage_history(user)
+async def get_my_usage(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION + " Applies to each log, e.g. `id,timestamp,result_json.score`."),
+    if_none_match: Optional[str] = Header(None),
+    user: User = Depends(current_user),
+):
+    include = parse_fields(fields, UsageLogRead)
+    # Logs are append-only: the latest id and the count identify the history without loading it
+    latest_id, count = await usage_service.get_usage_history_version(user)
+    etag = f'"{latest_id or "empty"}-{count}-{hashlib.sha256((fields or "").encode()).hexdigest()[:8]}"'
+    headers = {"ETag": etag, "Cache-Control": HISTORY_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, headers)
+    logs = await usage_service.get_usage_history(user)
+    return json_response(List[UsageLogRead], logs, {"__all__": include} if include else None, headers=headers)
+
+# Declared before /me/usage/{log_id} so "stats" is not parsed as a log id.
+@router.get("/me/usage/stats", response_model=UsageStats)
+async def get_my_usage_stats(
+    days: int = Query(30, ge=1, le=366),
+    user: User = Depends(current_user),
+):
+    return await usage_service.get_usage_stats(user, days=days)
 
 @router.get("/me/usage/{log_id}", response_model=UsageLogRead)
-async def get_my_usage_log(log_id: uuid.UUID, user: User = Depends(current_user)):
+async def get_my_usage_log(
+    log_id: uuid.UUID,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    user: User = Depends(current_user),
+):
+    include = parse_fields(fields, UsageLogRead)
+    # The ETag is `"<log id>-<owner tag>-<content hash>"`. A log never changes, so a tag the
+    # client holds for this log still matches and is answered without a database query. The
+    # owner tag keeps other users from learning that the log exists by getting a 304.
+    prefix = f'"{log_id}-{_owner_tag(user, log_id)}-'
+    for tag in if_none_match_tags(if_none_match):
+        if tag.startswith(prefix):
+            return not_modified(tag, {"Cache-Control": LOG_CACHE_CONTROL})
+
     log = await usage_service.get_usage_log_by_id(user, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="Usage log not found")
-    return log
+    response = json_response(UsageLogRead, log, include)
+    response.headers["ETag"] = f'{prefix}{content_hash(response.body)}"'
+    response.headers["Cache-Control"] = LOG_CACHE_CONTROL
+    return response
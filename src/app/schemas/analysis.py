@@ -1,5 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+import uuid
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Annotated, List, Dict, Any, Optional
+
+# Limits for pasted ad copy on the text endpoints.
+TEXT_MAX_CHARS = 20_000
+TEXT_BATCH_MAX_ITEMS = 50
 
 class RuleMatch(BaseModel):
     rule_id: str
@@ -8,12 +13,49 @@ class RuleMatch(BaseModel):
     matched_text: str
     recommendation: str
 
+class RecommendationItem(BaseModel):
+    type: str
+    message: str
+    severity: int
+    triggered_by: List[str] = []
+
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
 class GPTAnalysis(BaseModel):
     risk_score: int
     level: str
     reasons: List[str]
     subtle_triggers: List[str]
     recommendations: List[str]
+    skipped: bool = False
+    skip_reason: Optional[str] = None
+    token_usage: Optional[TokenUsage] = None
+
+class ClaimFinding(BaseModel):
+    index: int
+    text: str
+    page: Optional[int] = None
+    risk_score: Optional[int] = None
+    level: Optional[str] = None
+    subtle_triggers: List[str] = []
+    reasons: List[str] = []
+    rule_ids: List[str] = []
+    similarity: Optional[float] = Field(None, description="Similarity to the earlier claim whose GPT verdict was reused for this near-duplicate.")
+
+class ClaimFilterStats(BaseModel):
+    claims_total: int
+    claims_selected: int
+    tokens_in: int
+    tokens_sent: int
+    tokens_saved: int
+
+class ReanalysisStats(BaseModel):
+    claims_total: int
+    claims_reused: int
+    claims_sent_to_gpt: int
 
 class AnalysisResponse(BaseModel):
     score: int = Field(..., example=85)
@@ -22,3 +64,31 @@ class AnalysisResponse(BaseModel):
     recommendations: List[str] = Field(..., example=["Provide specific data to back up your claims."])
     rule_matches: List[RuleMatch] = Field(..., description="Matches from the rule-based engine.")
     gpt_analysis: GPTAnalysis = Field(..., description="Analysis from the GPT model.")
+    gpt_skipped: bool = Field(False, description="True when GPT was not consulted and the score is rules-only.")
+    claims: List[ClaimFinding] = Field([], description="Per-claim findings mapped onto the extracted claims.")
+    claim_filter: Optional[ClaimFilterStats] = Field(None, description="Claims kept by the pre-filter and estimated GPT tokens saved.")
+    language: Optional[str] = Field(None, example="deu", description="Detected language of the ad copy (Tesseract language code).")
+    reanalysis: Optional[ReanalysisStats] = Field(None, description="On re-analyses, how many claims reused memoized results.")
+
+AdText = Annotated[str, Field(min_length=1, max_length=TEXT_MAX_CHARS)]
+
+class TextAnalysisRequest(BaseModel):
+    text: AdText = Field(..., description="Ad copy to analyze.")
+
+class BatchTextAnalysisRequest(BaseModel):
+    texts: List[AdText] = Field(..., min_length=1, max_length=TEXT_BATCH_MAX_ITEMS, description="Ad copies to analyze.")
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[AnalysisResponse] = Field(..., description="One analysis per text, in request order.")
+
+class SentenceEdit(BaseModel):
+    index: int = Field(..., ge=0, description="Index of the sentence in the prior analysis' `claim_texts`.")
+    text: str = Field(..., max_length=TEXT_MAX_CHARS, description="Replacement sentence(s); empty removes the sentence.")
+
+class ReanalysisRequest(BaseModel):
+    text: Optional[AdText] = Field(None, description="The full revised ad copy.")
+    log_id: Optional[uuid.UUID] = Field(None, description="A prior analysis of yours to re-run with `edits` applied.")
+    edits: List[SentenceEdit] = Field([], max_length=TEXT_BATCH_MAX_ITEMS, description="Sentence edits to the prior analysis.")
+
+class UrlAnalysisRequest(BaseModel):
+    url: HttpUrl = Field(..., description="http(s) URL of the creative to fetch and analyze.")
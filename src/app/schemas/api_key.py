@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class ApiKeyCreate(BaseModel):
+    name: str = Field(..., max_length=100, example="CI pipeline")
+    daily_quota: Optional[int] = Field(None, ge=1, description="Maximum analyses per day for this key.")
+
+
+class ApiKeyRead(BaseModel):
+    id: uuid.UUID
+    name: str
+    prefix: str
+    daily_quota: Optional[int]
+    created_at: datetime
+    revoked_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class ApiKeyCreated(ApiKeyRead):
+    key: str = Field(..., description="The plaintext API key. It is only shown once.")
@@ -1,5 +1,6 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 class UsageLogRead(BaseModel):
@@ -20,3 +21,22 @@ class UsageSummary(BaseModel):
     remaining_today: int
     limit: int
     is_premium: bool
+
+
+class UsageStatsBucket(BaseModel):
+    analysis_count: int
+    mean_duration_ms: Optional[float]
+    p95_duration_ms: Optional[int]
+    score_distribution: Dict[str, int]
+    level_distribution: Dict[str, int]
+    premium_features_used: int
+
+
+class UsageDailyStats(UsageStatsBucket):
+    day: date
+
+
+class UsageStats(BaseModel):
+    since: date
+    totals: UsageStatsBucket
+    daily: List[UsageDailyStats]
@@ -0,0 +1,165 @@
+# src/app/serve.py
+"""Pre-fork production launcher.
+
+The parent imports the app once, runs the fork-safe warm-up (rules, PDF
+rendering, Tesseract check, LLM SDK) and freezes the heap, then forks N
+uvicorn workers that share the listening socket and the warmed read-only
+structures copy-on-write. Each worker opens its own database pool and LLM
+client during startup and only reports ready on `/ready` once it is warm.
+Dead workers are replaced, with a growing delay while a slot keeps crashing
+right after start; after `WORKER_MAX_QUICK_CRASHES` such crashes in a row the
+launcher stops and exits non-zero. SIGTERM/SIGINT stop all workers gracefully.
+
+    python -m src.app.serve --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# A worker that dies sooner than this after being forked counts as a crash on start
+WORKER_MIN_UPTIME_SECONDS = float(os.getenv("WORKER_MIN_UPTIME_SECONDS", "10"))
+WORKER_MAX_QUICK_CRASHES = int(os.getenv("WORKER_MAX_QUICK_CRASHES", "5"))
+WORKER_RESTART_MAX_DELAY_SECONDS = float(os.getenv("WORKER_RESTART_MAX_DELAY_SECONDS", "30"))
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    import uvicorn
+    from src.app.main import app
+
+    # Restore default signal handling; uvicorn installs its own graceful handlers.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        timeout_keep_alive=args.keep_alive,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, args)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            # The parent only sees the exit status, so the reason has to go to the logs from here
+            print(f"[serve] worker {os.getpid()} crashed:", file=sys.stderr)
+            traceback.print_exc()
+            code = 1
+        finally:
+            # os._exit skips interpreter shutdown, which would otherwise flush these
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    return pid
+
+
+def _restart_delay(quick_crashes: int) -> float:
+    """Seconds to wait before restarting a slot whose workers crashed on start this many times in a row."""
+    if quick_crashes <= 0:
+        return 1.0
+    return min(2.0 ** (quick_crashes - 1), WORKER_RESTART_MAX_DELAY_SECONDS)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked, pre-warmed uvicorn workers.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    sock = _bind(args.host, args.port, args.backlog)
+
+    # Load and warm everything that forked workers can share.
+    started = time.perf_counter()
+    from src.app.main import app  # noqa: F401
+    from src.app.services.warmup import warmup
+
+    warmup.preload()
+    for name, state in warmup.state.items():
+        print(f"[serve] {name}: {state['status']} {state.get('detail', '')}", flush=True)
+    print(f"[serve] warm-up took {(time.perf_counter() - started) * 1000:.0f} ms; forking {args.workers} workers", flush=True)
+    # Move the warmed objects out of the collector's reach so GC passes in the
+    # workers do not touch (and thereby copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+
+    workers: Dict[int, int] = {}
+    forked_at: Dict[int, float] = {}
+    quick_crashes: Dict[int, int] = {}
+    for slot in range(args.workers):
+        pid = _fork_worker(sock, args)
+        workers[pid], forked_at[pid] = slot, time.monotonic()
+
+    stopping = False
+    exit_code = 0
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = workers.pop(pid, None)
+        uptime = time.monotonic() - forked_at.pop(pid, 0.0)
+        if slot is None or stopping:
+            continue
+        quick_crashes[slot] = quick_crashes.get(slot, 0) + 1 if uptime < WORKER_MIN_UPTIME_SECONDS else 0
+        if quick_crashes[slot] >= WORKER_MAX_QUICK_CRASHES:
+            print(
+                f"[serve] worker {pid} exited with status {status}; slot {slot} crashed on start "
+                f"{quick_crashes[slot]} times in a row, giving up",
+                flush=True,
+            )
+            exit_code = 1
+            stop(signal.SIGTERM, None)
+            continue
+        delay = _restart_delay(quick_crashes[slot])
+        print(f"[serve] worker {pid} exited with status {status}; restarting in {delay:.0f} s", flush=True)
+        time.sleep(delay)
+        if stopping:
+            continue
+        pid = _fork_worker(sock, args)
+        workers[pid], forked_at[pid] = slot, time.monotonic()
+    sock.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# src/app/services/admission.py
+"""Admission control for the analysis pipeline, with priority lanes by user tier.
+
+At most `ADMISSION_MAX_CONCURRENCY` analyses run at once per worker. Requests
+beyond that wait in one queue per lane: premium (per `billing_service`),
+authenticated free, and anonymous. A freed slot goes to the next waiter of a
+lane picked by smooth weighted round-robin over `ADMISSION_WEIGHTS`, so
+higher tiers get most of the capacity without starving the others.
+
+A request is shed early with `AdmissionRejected` (503 + `Retry-After`) when
+its lane's queue is full or its projected wait exceeds the lane's budget.
+The projection comes from the queue ahead of it, its lane's share of the
+slots and a moving average of analysis time. Lower lanes have smaller
+budgets, so they are shed first and premium latency stays flat. A waiter
+still queued when its budget runs out is shed as well.
+
+A batch is admitted as one request (`admit_batch`): it queues, and can be
+shed, only for its first slot, before any of its items has started. It then
+adds slots that are free right away, without queueing for them, so it uses
+idle capacity but never delays other requests or gets shed halfway.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from ..models.user import User
+from .billing_service import billing_service
+from .tracing import span
+
+# Highest priority first
+LANES = ("premium", "free", "anonymous")
+
+
+def _lane_setting(name: str, default: str) -> Dict[str, float]:
+    values = {}
+    for item in os.getenv(name, default).split(","):
+        lane, _, value = item.partition("=")
+        if lane.strip() in LANES and value.strip():
+            values[lane.strip()] = float(value)
+    return {lane: values.get(lane, 0.0) for lane in LANES}
+
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+ADMISSION_WEIGHTS = _lane_setting("ADMISSION_WEIGHTS", "premium=6,free=3,anonymous=1")
+ADMISSION_QUEUE_LIMITS = _lane_setting("ADMISSION_QUEUE_LIMITS", "premium=200,free=50,anonymous=20")
+ADMISSION_WAIT_BUDGETS_SECONDS = _lane_setting("ADMISSION_WAIT_BUDGETS_SECONDS", "premium=60,free=15,anonymous=5")
+# Starting estimate of one analysis (OCR + GPT) before any has been timed
+ADMISSION_INITIAL_SERVICE_SECONDS = float(os.getenv("ADMISSION_INITIAL_SERVICE_SECONDS", "2"))
+_SERVICE_TIME_SMOOTHING = 0.2
+_MAX_RETRY_AFTER_SECONDS = 60
+
+
+class AdmissionRejected(Exception):
+    """The request was shed; retry after `retry_after` seconds."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"Analysis capacity for {lane} requests is exhausted.")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        capacity: int = ADMISSION_MAX_CONCURRENCY,
+        weights: Optional[Dict[str, float]] = None,
+        queue_limits: Optional[Dict[str, float]] = None,
+        wait_budgets: Optional[Dict[str, float]] = None,
+        initial_service_seconds: float = ADMISSION_INITIAL_SERVICE_SECONDS,
+    ):
+        self.capacity = capacity
+        self.weights = weights or ADMISSION_WEIGHTS
+        self.queue_limits = queue_limits or ADMISSION_QUEUE_LIMITS
+        self.wait_budgets = wait_budgets or ADMISSION_WAIT_BUDGETS_SECONDS
+        self.service_seconds = initial_service_seconds
+        self.shed: Counter = Counter()
+        self._running = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self._credit = {lane: 0.0 for lane in LANES}
+
+    def lane_for(self, user: Optional[User]) -> str:
+        if user is None:
+            return "anonymous"
+        return "premium" if billing_service.get_user_subscription_status(user) == "premium" else "free"
+
+    def projected_wait(self, lane: str) -> float:
+        """Seconds a request joining `lane` now is expected to wait for a slot."""
+        if self._running < self.capacity and not self.queued:
+            return 0.0
+        active = [other for other in LANES if self._queues[other] or other == lane]
+        share = self.weights[lane] / (sum(self.weights[other] for other in active) or 1)
+        return (len(self._queues[lane]) + 1) * self.service_seconds / (self.capacity * max(share, 1e-6))
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "running": self._running,
+            "capacity": self.capacity,
+            "queued": {lane: len(self._queues[lane]) for lane in LANES},
+            "service_seconds": round(self.service_seconds, 3),
+            "shed": dict(self.shed),
+        }
+
+    @asynccontextmanager
+    async def admit(self, user: Optional[User]) -> AsyncIterator[str]:
+        """Hold an analysis slot for the duration of the block; yields the lane."""
+        lane = self.lane_for(user)
+        with span("admission", lane=lane) as attrs:
+            attrs["queued_ahead"] = len(self._queues[lane])
+            await self._acquire(lane)
+        started = time.monotonic()
+        try:
+            yield lane
+        finally:
+            elapsed = time.monotonic() - started
+            self.service_seconds += _SERVICE_TIME_SMOOTHING * (elapsed - self.service_seconds)
+            self._release()
+
+    @asynccontextmanager
+    async def admit_batch(self, user: Optional[User], size: int) -> AsyncIterator[int]:
+        """Hold slots for a batch of `size` analyses; yields how many (1 to `size`) it may run at once."""
+        lane = self.lane_for(user)
+        with span("admission", lane=lane, batch=size) as attrs:
+            attrs["queued_ahead"] = len(self._queues[lane])
+            await self._acquire(lane)
+            slots = 1
+            while slots < size and self._running < self.capacity and not self.queued:
+                self._running += 1
+                slots += 1
+            attrs["slots"] = slots
+        started = time.monotonic()
+        try:
+            yield slots
+        finally:
+            # Time per analysis, as if the batch's items had run one per slot
+            elapsed = (time.monotonic() - started) * slots / max(size, 1)
+            self.service_seconds += _SERVICE_TIME_SMOOTHING * (elapsed - self.service_seconds)
+            for _ in range(slots):
+                self._release()
+
+    async def _acquire(self, lane: str) -> None:
+        if self._running < self.capacity and not self.queued:
+            self._running += 1
+            return
+        wait = self.projected_wait(lane)
+        budget = self.wait_budgets[lane]
+        if len(self._queues[lane]) >= self.queue_limits[lane] or wait > budget:
+            self._reject(lane, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[lane].append(future)
+        try:
+            # A slot is handed over by `_release` setting the future's result
+            await asyncio.wait_for(future, budget)
+        except asyncio.TimeoutError:
+            self._forget(lane, future)
+            self._reject(lane, wait)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # the slot arrived just as the client went away
+            else:
+                self._forget(lane, future)
+            raise
+
+    def _release(self) -> None:
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._running -= 1
+                return
+            future = self._queues[lane].popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+
+    def _next_lane(self) -> Optional[str]:
+        """Smooth weighted round-robin over the lanes that have waiters."""
+        candidates = [lane for lane in LANES if self._queues[lane]]
+        if not candidates:
+            return None
+        total = sum(self.weights[lane] for lane in candidates)
+        for lane in candidates:
+            self._credit[lane] += self.weights[lane]
+        chosen = max(candidates, key=lambda lane: self._credit[lane])
+        self._credit[chosen] -= total
+        return chosen
+
+    def _forget(self, lane: str, future: asyncio.Future) -> None:
+        try:
+            self._queues[lane].remove(future)
+        except ValueError:
+            pass
+
+    def _reject(self, lane: str, wait: float) -> None:
+        self.shed[lane] += 1
+        raise AdmissionRejected(lane, max(1, min(_MAX_RETRY_AFTER_SECONDS, math.ceil(wait))))
+
+# Singleton instance
+admission_controller = AdmissionController()
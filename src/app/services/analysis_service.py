@@ -1,48 +1,355 @@
 # src/app/services/analysis_service.py
-from typing import Any, Dict, List
+import asyncio
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..models.user import User
 from .rules_engine import rules_engine
-from .ocr_service import extract_text_from_image
-from .gpt_service import analyze_text_with_gpt
+from .claim_cache import claim_cache as default_claim_cache, claim_key
+from .claim_filter import claim_filter as default_claim_filter
+from .claim_index import claim_index as default_claim_index
+from .ocr_service import PAGE_SEPARATOR, extract_text_from_image
+from .gpt_service import analyze_claims_with_gpt, profile_fingerprint, prompt_version, summarize_claim_verdicts
+from .language_service import detect_language, user_language_hints
+from .singleflight import SingleFlight
+from .tracing import span
+
+# A per-claim GPT verdict and the recommendations of the call that produced it
+Verdict = Tuple[Dict[str, Any], List[str]]
 
 class AnalysisService:
-    def __init__(self, rules_engine):
+    def __init__(self, rules_engine, claim_filter=None, claim_cache=None, claim_index=None):
         self.rules_engine = rules_engine
+        self.claim_filter = claim_filter or default_claim_filter
+        self.claim_cache = claim_cache if claim_cache is not None else default_claim_cache
+        self.claim_index = claim_index if claim_index is not None else default_claim_index
+        self._single_flight = SingleFlight()
+
+    def content_key(self, image_bytes: bytes, user: Optional[User] = None) -> str:
+        """Key identifying analyses that are guaranteed to produce the same result."""
+        # The customer's country picks the OCR language packs
+        languages = "+".join(user_language_hints(user))
+        return f"{hashlib.sha256(image_bytes).hexdigest()}:{self._sharing_scope(user)}:{languages}"
+
+    async def analyze_image_async(self, image_bytes: bytes, user: Optional[User] = None) -> Dict[str, Any]:
+        """Run `analyze_image` off the event loop, coalescing identical in-flight requests.
+
+        Concurrent callers with the same image and profile fingerprint (and,
+        while the claim index is on, the same account) share a single OCR and
+        GPT execution and each receive a copy of its result.
+        """
+        return await self._single_flight.do(
+            self.content_key(image_bytes, user),
+            lambda: asyncio.to_thread(self.analyze_image, image_bytes, user),
+        )
+
+    def text_content_key(self, text: str, user: Optional[User] = None) -> str:
+        languages = "+".join(user_language_hints(user))
+        return f"text:{hashlib.sha256(text.encode()).hexdigest()}:{self._sharing_scope(user)}:{languages}"
 
-    def analyze_image(self, image_bytes: bytes) -> Dict[str, Any]:
+    async def analyze_text_async(self, text: str, user: Optional[User] = None) -> Dict[str, Any]:
+        """Run `analyze_text` off the event loop, coalescing identical in-flight requests."""
+        return await self._single_flight.do(
+            self.text_content_key(text, user),
+            lambda: asyncio.to_thread(self.analyze_text, text, user),
+        )
+
+    async def reanalyze_text_async(self, text: str, user: Optional[User] = None) -> Dict[str, Any]:
+        """Run `reanalyze_text` off the event loop, coalescing identical in-flight requests."""
+        # A re-analysis reuses the account's own memoized claims, so it is never shared across accounts
+        account = user.id if user is not None else ""
+        return await self._single_flight.do(
+            f"re{self.text_content_key(text, user)}:{account}",
+            lambda: asyncio.to_thread(self.reanalyze_text, text, user),
+        )
+
+    def analyze_image(self, image_bytes: bytes, user: Optional[User] = None) -> Dict[str, Any]:
         """
         Refactored analysis pipeline with distinct stages.
         """
         # Stage 1: OCR
-        ocr_text = extract_text_from_image(image_bytes)
+        ocr_text = extract_text_from_image(image_bytes, user_language_hints(user))
+        return self.analyze_text(ocr_text, user)
 
+    def analyze_text(self, ocr_text: str, user: Optional[User] = None) -> Dict[str, Any]:
+        """Run claim extraction, scoring and aggregation on already extracted text."""
         # Stage 2: Claim Extraction (for now, we'll treat the whole text as a single claim)
-        claims = self._extract_claims(ocr_text)
+        claims, claim_pages = self._extract_claims(ocr_text)
+        language = detect_language(ocr_text, user_language_hints(user))
 
         # Stage 3: Scoring (Rule-based and GPT)
-        rule_matches = self._score_with_rules(claims)
-        gpt_analysis = self._score_with_gpt(claims)
+        rule_matches = self._score_with_rules(claims, language)
+        # Only environment-related claims (plus a little context) are sent to GPT
+        selection = self.claim_filter.select(claims, rule_flagged=(match["claim_index"] for match in rule_matches))
+        gpt_analysis, verdicts, _ = self._score_selected(claims, selection.indices, {}, user)
 
         # Stage 4: Aggregation
         final_result = self._aggregate_results(rule_matches, gpt_analysis)
+        final_result["claims"] = self._build_claim_findings(claims, selection.indices, rule_matches, gpt_analysis, claim_pages)
+        final_result["claim_filter"] = selection.to_dict()
+        final_result["language"] = language
+        # Kept in the usage log so the analysis can be re-run with edited sentences
+        final_result["claim_texts"] = claims
+
+        # Seed the claim cache, so re-analyzing edited copy only scores what changed
+        context = self._claim_context(user, language)
+        if context is not None:
+            self._remember_claims(claims, context, range(len(claims)), self._matches_by_claim(rule_matches), verdicts)
 
         return final_result
 
-    def _extract_claims(self, text: str) -> List[str]:
+    def reanalyze_text(self, text: str, user: Optional[User] = None) -> Dict[str, Any]:
+        """Analyze edited copy, reusing the memoized results of unchanged claims.
+
+        Claims missing from the account's claim cache (new or edited
+        sentences, or ones analyzed under other rules, prompt, profile or
+        language; everything, for anonymous callers) go through
+        the rules; of the claims the filter picks for GPT, only those without
+        a cached or near-duplicate verdict are sent. The document-level verdict is rebuilt from
+        the per-claim verdicts, so a small edit costs about as much as a
+        rules-only analysis.
+        """
+        claims, claim_pages = self._extract_claims(text)
+        language = detect_language(text, user_language_hints(user))
+        context = self._claim_context(user, language)
+        cached = [self.claim_cache.get(claim_key(claim, context)) if context is not None else None for claim in claims]
+
+        fresh = [index for index, entry in enumerate(cached) if entry is None]
+        fresh_matches = self._matches_by_claim(self._score_with_rules([claims[index] for index in fresh], language))
+        matches_by_claim = {fresh[position]: matches for position, matches in fresh_matches.items()}
+        for index, entry in enumerate(cached):
+            if entry is not None and entry["rule_matches"]:
+                matches_by_claim[index] = entry["rule_matches"]
+        rule_matches = [
+            {**match, "claim_index": index} for index in sorted(matches_by_claim) for match in matches_by_claim[index]
+        ]
+
+        selection = self.claim_filter.select(claims, rule_flagged=matches_by_claim.keys())
+        known = {
+            index: (cached[index]["gpt"]["verdict"], cached[index]["gpt"]["recommendations"])
+            for index in selection.indices
+            if cached[index] is not None and "gpt" in cached[index]
+        }
+        gpt_analysis, new_verdicts, sent_to_gpt = self._score_selected(claims, selection.indices, known, user)
+
+        final_result = self._aggregate_results(rule_matches, gpt_analysis)
+        final_result["claims"] = self._build_claim_findings(claims, selection.indices, rule_matches, gpt_analysis, claim_pages)
+        final_result["claim_filter"] = selection.to_dict()
+        final_result["language"] = language
+        final_result["claim_texts"] = claims
+        final_result["reanalysis"] = {
+            "claims_total": len(claims),
+            "claims_reused": len(claims) - len(fresh),
+            "claims_sent_to_gpt": sent_to_gpt,
+        }
+
+        if context is not None:
+            self._remember_claims(claims, context, sorted(set(fresh) | set(new_verdicts)), matches_by_claim, new_verdicts)
+        return final_result
+
+    def _score_selected(
+        self,
+        claims: List[str],
+        gpt_indices: List[int],
+        known: Dict[int, Verdict],
+        user: Optional[User] = None,
+    ) -> Tuple[Dict[str, Any], Dict[int, Verdict], int]:
+        """GPT verdict of the claims at `gpt_indices`, sending GPT only the claims without one to reuse.
+
+        `known` holds memoized (verdict, recommendations) pairs by claim
+        index. Other claims with a near-duplicate in the user's similarity
+        index scope reuse its verdict, without recommendations: those came
+        from a call on another document. Returns the document-level verdict, the verdicts
+        obtained here (reused or new) by claim index, and how many claims
+        went to GPT. New verdicts are added to the similarity index.
+        """
+        scope = self._verdict_scope(user)
+        pending = [index for index in gpt_indices if index not in known]
+        obtained: Dict[int, Verdict] = {}
+        similar_verdicts = self.claim_index.lookup([claims[index] for index in pending], scope) if scope else [None] * len(pending)
+        for index, similar in zip(pending, similar_verdicts):
+            if similar is not None:
+                obtained[index] = (similar, [])
+        to_score = [index for index in pending if index not in obtained]
+
+        if not known and not obtained:
+            # Nothing to reuse: one plain GPT analysis, with GPT's own document-level verdict
+            new_analysis = gpt_analysis = self._score_with_gpt([claims[index] for index in to_score], user)
+        else:
+            new_analysis = self._score_with_gpt([claims[index] for index in to_score], user) if to_score else None
+        new_verdicts = self._verdicts_by_claim(to_score, new_analysis) if new_analysis else {}
+        recommendations = new_analysis.get("recommendations", []) if new_verdicts else []
+        obtained.update((index, (verdict, recommendations)) for index, verdict in new_verdicts.items())
+        if known or len(obtained) > len(new_verdicts):
+            gpt_analysis = self._rebuild_gpt_analysis(gpt_indices, {**known, **obtained}, new_analysis)
+
+        if scope:
+            self.claim_index.add([(claims[index], verdict) for index, verdict in new_verdicts.items()], scope)
+        return gpt_analysis, obtained, len(to_score)
+
+    def _rebuild_gpt_analysis(
+        self,
+        gpt_indices: List[int],
+        verdicts: Dict[int, Verdict],
+        new_analysis: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Document-level GPT verdict of the claims in `gpt_indices`, from their per-claim verdicts."""
+        if not gpt_indices:
+            return self._score_with_gpt([])
+        claim_verdicts, recommendations = [], []
+        for position, index in enumerate(gpt_indices):
+            if index in verdicts:
+                verdict, verdict_recommendations = verdicts[index]
+                claim_verdicts.append({**verdict, "index": position})
+                recommendations.append(verdict_recommendations)
+        if not claim_verdicts and new_analysis is not None and new_analysis.get("skipped"):
+            return new_analysis  # nothing to reuse and GPT unavailable: the usual fallback
+        gpt_analysis = summarize_claim_verdicts(claim_verdicts, recommendations)
+        if new_analysis is not None and new_analysis.get("token_usage"):
+            gpt_analysis["token_usage"] = new_analysis["token_usage"]
+        return gpt_analysis
+
+    def _verdict_scope(self, user: Optional[User]) -> Optional[str]:
+        """Similarity index scope of the user's verdicts, or None for anonymous callers.
+
+        Besides prompt, model and profile, the scope holds the user's id: a
+        verdict's reasons can quote the claim it was given for, so verdicts
+        are never reused across accounts.
+        """
+        if user is None:
+            return None
+        return f"{prompt_version()}:{user.id}:{profile_fingerprint(user)}"
+
+    def _sharing_scope(self, user: Optional[User]) -> str:
+        """Who may share a whole analysis result: users with the same profile.
+
+        While the claim index is on, a result can hold verdicts reused from
+        the account's own index scope, so it is only shared within the account.
+        """
+        if user is not None and self.claim_index.enabled:
+            return f"{profile_fingerprint(user)}:{user.id}"
+        return profile_fingerprint(user)
+
+    def _claim_context(self, user: Optional[User], language: Optional[str]) -> Optional[str]:
+        """Everything besides the claim itself that its memoized results depend on, or None for anonymous callers.
+
+        Memoized verdicts carry the recommendations of the call for the whole
+        document they came from, so they are only reused within one account.
+        """
+        if user is None:
+            return None
+        return f"{self.rules_engine.version}:{prompt_version()}:{user.id}:{profile_fingerprint(user)}:{language or ''}"
+
+    def _matches_by_claim(self, rule_matches: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        matches: Dict[int, List[Dict[str, Any]]] = {}
+        for match in rule_matches:
+            matches.setdefault(match["claim_index"], []).append({k: v for k, v in match.items() if k != "claim_index"})
+        return matches
+
+    def _verdicts_by_claim(self, gpt_indices: List[int], gpt_analysis: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """Per-claim GPT verdicts keyed by claim index; a skipped analysis has none."""
+        if gpt_analysis.get("skipped"):
+            return {}
+        return {
+            gpt_indices[verdict["index"]]: {k: v for k, v in verdict.items() if k != "index"}
+            for verdict in gpt_analysis.get("claims", [])
+            if 0 <= verdict["index"] < len(gpt_indices)
+        }
+
+    def _remember_claims(
+        self,
+        claims: List[str],
+        context: str,
+        indices: Iterable[int],
+        matches_by_claim: Dict[int, List[Dict[str, Any]]],
+        verdicts: Dict[int, Verdict],
+    ) -> None:
+        for index in indices:
+            key = claim_key(claims[index], context)
+            entry: Dict[str, Any] = {"rule_matches": matches_by_claim.get(index, [])}
+            if index in verdicts:
+                verdict, recommendations = verdicts[index]
+                entry["gpt"] = {"verdict": verdict, "recommendations": recommendations}
+            else:
+                # Keep a verdict from an earlier analysis in which the claim was sent to GPT
+                existing = self.claim_cache.get(key)
+                if existing is not None and "gpt" in existing:
+                    continue
+            self.claim_cache.put(key, entry)
+
+    def _extract_claims(self, text: str) -> Tuple[List[str], List[int]]:
+        """Split the text into claims and return them with the (1-based) page each comes from."""
         # Placeholder for a more sophisticated claim extraction logic.
-        # For now, we'll just split the text into sentences.
-        return [sentence.strip() for sentence in text.split('.') if sentence.strip()]
+        # For now, we'll just split each page into sentences.
+        claims, pages = [], []
+        for page, page_text in enumerate(text.split(PAGE_SEPARATOR), start=1):
+            for sentence in page_text.split('.'):
+                if sentence.strip():
+                    claims.append(sentence.strip())
+                    pages.append(page)
+        return claims, pages
 
-    def _score_with_rules(self, claims: List[str]) -> List[Dict[str, Any]]:
+    def _score_with_rules(self, claims: List[str], language: Optional[str] = None) -> List[Dict[str, Any]]:
         all_matches = []
-        for claim in claims:
-            all_matches.extend(self.rules_engine.apply(claim))
+        with span("rules", claims=len(claims), rules=len(self.rules_engine.rules), language=language) as attrs:
+            for index, claim in enumerate(claims):
+                for match in self.rules_engine.apply(claim, language):
+                    match["claim_index"] = index
+                    all_matches.append(match)
+            attrs["matches"] = len(all_matches)
         return all_matches
 
-    def _score_with_gpt(self, claims: List[str]) -> Dict[str, Any]:
-        # Placeholder for GPT-based scoring of each claim.
-        # For now, we'll just send the whole text to the GPT service.
-        full_text = " ".join(claims)
-        return analyze_text_with_gpt(full_text)
+    def _score_with_gpt(self, claims: List[str], user: Optional[User] = None) -> Dict[str, Any]:
+        # All claims are scored individually in one structured GPT call (chunked if long).
+        if not claims:
+            return {
+                "risk_score": 0,
+                "level": "Low",
+                "reasons": ["No environmental claims detected; AI analysis skipped."],
+                "subtle_triggers": [],
+                "recommendations": [],
+                "claims": [],
+                "skipped": True,
+                "skip_reason": "no_environmental_claims",
+            }
+        return analyze_claims_with_gpt(claims, user)
+
+    def _build_claim_findings(
+        self,
+        claims: List[str],
+        gpt_indices: List[int],
+        rule_matches: List[Dict[str, Any]],
+        gpt_analysis: Dict[str, Any],
+        claim_pages: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Map rule matches and per-claim GPT verdicts back onto the extracted claims.
+
+        `gpt_indices[i]` is the index in `claims` of the i-th claim sent to GPT,
+        and `claim_pages[i]` the page `claims[i]` was found on.
+        """
+        rule_ids: Dict[int, List[str]] = {}
+        for match in rule_matches:
+            rule_ids.setdefault(match["claim_index"], []).append(match["rule_id"])
+
+        verdicts = {}
+        for verdict in gpt_analysis.get("claims", []):
+            if 0 <= verdict["index"] < len(gpt_indices):
+                verdicts[gpt_indices[verdict["index"]]] = verdict
+
+        findings = []
+        for index in sorted(set(rule_ids) | set(verdicts)):
+            verdict = verdicts.get(index, {})
+            findings.append({
+                "index": index,
+                "text": claims[index],
+                "page": claim_pages[index] if claim_pages else None,
+                "risk_score": verdict.get("risk_score"),
+                "level": verdict.get("level"),
+                "subtle_triggers": verdict.get("subtle_triggers", []),
+                "reasons": verdict.get("reasons", []),
+                "rule_ids": rule_ids.get(index, []),
+                "similarity": verdict.get("similarity"),
+            })
+        return findings
 
     def _aggregate_results(self, rule_matches: List[Dict[str, Any]], gpt_analysis: Dict[str, Any]) -> Dict[str, Any]:
         # Placeholder for a more sophisticated aggregation logic.
@@ -53,7 +360,9 @@ class AnalysisService:
 
         # Simple score aggregation
         rule_score = sum(10 for match in rule_matches) # simplified scoring
-        final_score = self._combine_scores(rule_score, gpt_analysis.get("risk_score"))
+        # A skipped GPT verdict is a placeholder, so fall back to the rules-only score
+        gpt_skipped = bool(gpt_analysis.get("skipped"))
+        final_score = self._combine_scores(rule_score, None if gpt_skipped else gpt_analysis.get("risk_score"))
 
         return {
             "score": final_score,
@@ -62,6 +371,7 @@ class AnalysisService:
             "recommendations": recommendations,
             "rule_matches": rule_matches,
             "gpt_analysis": gpt_analysis,
+            "gpt_skipped": gpt_skipped,
         }
 
     def _combine_scores(self, rule_score: int, llm_score: int) -> int:
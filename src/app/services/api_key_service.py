@@ -1,27 +1,168 @@
 # src/app/services/api_key_service.py
-from typing import Optional
-from ..models.user import User
+import hashlib
+import hmac
+import multiprocessing
+import os
 import secrets
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.app.db.database import async_session_maker
+from ..models.api_key import ApiKey
+from ..models.user import User
+
+KEY_PREFIX = "sk_"
+# Length of the stored lookup prefix: "sk_" plus the first 8 characters of the secret.
+PREFIX_LENGTH = len(KEY_PREFIX) + 8
+
+# Bounds how long a revocation on another host goes unnoticed; workers of one host see it at once
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "5"))
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", "4096"))
+
+
+# Revocation generation, bumped on every revocation. It lives in shared memory
+# allocated at import, i.e. before the launcher forks, so a revocation in one
+# worker invalidates the cached keys of all workers of the host.
+_revocations = multiprocessing.Value("q", 0)
+
+
+class VerifiedApiKey:
+    """An API key that passed validation, together with its owner."""
+
+    __slots__ = ("id", "user", "daily_quota")
+
+    def __init__(self, id: uuid.UUID, user: User, daily_quota: Optional[int]):
+        self.id = id
+        self.user = user
+        self.daily_quota = daily_quota
+
 
 class ApiKeyService:
-    def create_api_key(self, user: User) -> str:
-        """
-        Placeholder for creating a new API key for a user.
-        In a real application, this would involve storing the hashed key in the database.
-        """
-        api_key = f"sk_{secrets.token_urlsafe(16)}"
-        # self.store_key(user, api_key)
-        return api_key
+    def __init__(
+        self,
+        ttl_seconds: float = API_KEY_CACHE_TTL_SECONDS,
+        max_entries: int = API_KEY_CACHE_MAX_ENTRIES,
+        revocations=_revocations,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._revocations = revocations
+        # key_hash -> (expires_at, revocation generation when verified, VerifiedApiKey)
+        self._verified: "OrderedDict[str, Tuple[float, int, VerifiedApiKey]]" = OrderedDict()
+
+    def _hash_key(self, api_key: str) -> str:
+        secret = os.getenv("API_KEY_HMAC_SECRET") or os.getenv("SECRET_KEY")
+        if not secret:
+            raise RuntimeError("API_KEY_HMAC_SECRET or SECRET_KEY must be set to use API keys.")
+        return hmac.new(secret.encode(), api_key.encode(), hashlib.sha256).hexdigest()
 
-    def validate_api_key(self, api_key: str) -> Optional[User]:
+    async def create_api_key(self, user: User, name: str, daily_quota: Optional[int] = None) -> Tuple[str, ApiKey]:
+        """Create a new API key for `user`.
+
+        Only the HMAC of the key is stored; the plaintext key is returned once
+        and cannot be recovered afterwards.
         """
-        Placeholder for validating an API key.
-        In a real application, this would involve looking up the hashed key in the database.
+        api_key = f"{KEY_PREFIX}{secrets.token_urlsafe(32)}"
+        record = ApiKey(
+            user_id=user.id,
+            name=name,
+            prefix=api_key[:PREFIX_LENGTH],
+            key_hash=self._hash_key(api_key),
+            daily_quota=daily_quota,
+        )
+        async with async_session_maker() as session:
+            session.add(record)
+            await session.commit()
+        return api_key, record
+
+    async def validate_api_key(self, api_key: str) -> Optional[VerifiedApiKey]:
+        """Return the verified key and its owner, or None if the key is unknown or revoked.
+
+        Verified keys are cached in memory, so repeat checks cost one HMAC, a
+        dict lookup and a read of the shared revocation generation. A
+        revocation in any worker of the host bumps the generation, so every
+        worker checks its cached keys against the database again; other hosts
+        pick it up once the cache TTL expires.
         """
-        if api_key.startswith("sk_"):
-            # In a real app, you would look up the user associated with this key
-            return User(email="test@example.com", is_premium=True)
+        if not api_key.startswith(KEY_PREFIX) or len(api_key) <= PREFIX_LENGTH:
+            return None
+
+        key_hash = self._hash_key(api_key)
+        # Read before the query: a revocation committed after it bumps the generation past this one
+        generation = self._revocations.value
+        cached = self._verified.get(key_hash)
+        if cached is not None:
+            expires_at, cached_generation, verified = cached
+            if expires_at > time.monotonic() and cached_generation == generation:
+                self._verified.move_to_end(key_hash)
+                return verified
+            del self._verified[key_hash]
+
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(ApiKey, User)
+                .join(User, User.id == ApiKey.user_id)
+                .where(ApiKey.prefix == api_key[:PREFIX_LENGTH], ApiKey.revoked_at.is_(None))
+            )
+            rows = result.all()
+
+        for record, user in rows:
+            if hmac.compare_digest(record.key_hash, key_hash) and user.is_active:
+                verified = VerifiedApiKey(record.id, user, record.daily_quota)
+                self._remember(key_hash, generation, verified)
+                return verified
         return None
 
+    async def list_api_keys(self, user: User) -> List[ApiKey]:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(ApiKey).where(ApiKey.user_id == user.id).order_by(ApiKey.created_at.desc())
+            )
+            return result.scalars().all()
+
+    async def revoke_api_key(self, user: User, key_id: uuid.UUID) -> Optional[ApiKey]:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(ApiKey).where(ApiKey.user_id == user.id, ApiKey.id == key_id)
+            )
+            record = result.scalar_one_or_none()
+            if record is None:
+                return None
+            if record.revoked_at is None:
+                record.revoked_at = datetime.utcnow()
+                await session.commit()
+        self._forget(record.key_hash)
+        self._note_revocation()
+        return record
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """Drop cached keys of `user_id` so profile, premium and deactivation changes apply immediately."""
+        for key_hash, (_, _, verified) in list(self._verified.items()):
+            if verified.user.id == user_id:
+                del self._verified[key_hash]
+        # Other workers cannot drop just this user's keys, so they recheck all of theirs
+        self._note_revocation()
+
+    def _note_revocation(self) -> None:
+        """Bump the shared generation; call after the change is committed."""
+        with self._revocations.get_lock():
+            self._revocations.value += 1
+
+    def _remember(self, key_hash: str, generation: int, verified: VerifiedApiKey) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._verified[key_hash] = (time.monotonic() + self.ttl_seconds, generation, verified)
+        self._verified.move_to_end(key_hash)
+        while len(self._verified) > self.max_entries:
+            self._verified.popitem(last=False)
+
+    def _forget(self, key_hash: str) -> None:
+        self._verified.pop(key_hash, None)
+
 # Singleton instance
 api_key_service = ApiKeyService()
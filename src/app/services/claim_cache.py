@@ -0,0 +1,66 @@
+# src/app/services/claim_cache.py
+import copy
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+CLAIM_CACHE_MAX_ENTRIES = int(os.getenv("CLAIM_CACHE_MAX_ENTRIES", "50000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_claim(claim: str) -> str:
+    """Case and spacing do not change a claim's verdict, so they do not change its key."""
+    return _WHITESPACE.sub(" ", claim).strip().casefold()
+
+
+def claim_key(claim: str, context: str) -> str:
+    return f"{hashlib.sha256(normalize_claim(claim).encode()).hexdigest()}:{context}"
+
+
+class ClaimCache:
+    """Bounded LRU of per-claim analysis results, shared by the worker's threads.
+
+    An entry holds a claim's rule matches and, once the claim has been sent
+    to GPT, its verdict and the recommendations of that call. Keys combine
+    the normalized claim with a context string (rules, prompt, account,
+    profile and language versions), so a change to any of them misses the
+    cache instead of reusing stale results, and no account is handed the
+    recommendations made for another account's document. Entries are copied in and out, so callers can
+    build results from them freely.
+    """
+
+    def __init__(self, max_entries: int = CLAIM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return copy.deepcopy(entry)
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        entry = copy.deepcopy(entry)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+# Singleton instance
+claim_cache = ClaimCache()
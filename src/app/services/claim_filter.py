@@ -0,0 +1,111 @@
+# src/app/services/claim_filter.py
+import os
+import re
+from typing import Any, Dict, Iterable, List
+
+# Word stems that make a sentence likely to carry an environmental claim.
+STRONG_TERMS = [
+    "eco", "environment", "sustainab", "green", "climate", "carbon", "co2", "emission",
+    "net-zero", "net zero", "neutral", "recycl", "biodegrad", "compost", "renewable",
+    "planet", "earth", "offset", "footprint", "greenhouse", "fossil", "plastic-free",
+    "zero waste", "zero-waste", "ocean", "deforest", "conscious",
+]
+# Weaker signals; a single weak term is not enough to qualify a sentence.
+WEAK_TERMS = [
+    "natural", "organic", "plant", "forest", "tree", "water", "energy", "solar", "wind",
+    "waste", "packaging", "plastic", "clean", "pure", "responsib", "ethical", "future",
+    "nature", "wildlife", "biodivers", "local", "vegan", "impact", "reduc",
+]
+# Boilerplate that should never be pulled in as surrounding context.
+NOISE_PATTERN = re.compile(
+    r"(terms and conditions|t&c|all rights reserved|©|privacy policy|while stocks last|"
+    r"[$€£]\s?\d|\d\s?[$€£]|\b\d{4,5}\s+[A-Z][a-z]+|\bwww\.|https?://|@\w+\.\w+)",
+    re.IGNORECASE,
+)
+
+CLAIM_FILTER_ENABLED = os.getenv("CLAIM_FILTER_ENABLED", "true").lower() != "false"
+
+
+def _compile_terms(terms: List[str]) -> re.Pattern:
+    alternation = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternation})", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+class ClaimSelection:
+    """The claims picked for LLM scoring and what was saved by dropping the rest."""
+
+    def __init__(self, claims: List[str], indices: List[int], total_claims: int, tokens_in: int):
+        self.claims = claims
+        self.indices = indices
+        self.total_claims = total_claims
+        self.tokens_in = tokens_in
+        self.tokens_sent = estimate_tokens(" ".join(claims))
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_in - self.tokens_sent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "claims_total": self.total_claims,
+            "claims_selected": len(self.claims),
+            "tokens_in": self.tokens_in,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+class ClaimFilter:
+    """Fast local pre-filter that keeps only environment-related sentences.
+
+    Each sentence gets a lexical score (strong terms 1.0, weak terms 0.5,
+    plus a bonus when the rules engine matched it). Sentences reaching the
+    threshold are selected together with up to `context` neighbouring
+    sentences on each side, unless those neighbours look like boilerplate.
+    """
+
+    def __init__(self, threshold: float = 1.0, context: int = 1, rule_bonus: float = 1.0, enabled: bool = CLAIM_FILTER_ENABLED):
+        self.threshold = threshold
+        self.context = context
+        self.rule_bonus = rule_bonus
+        self.enabled = enabled
+        self._strong = _compile_terms(STRONG_TERMS)
+        self._weak = _compile_terms(WEAK_TERMS)
+
+    def score(self, sentence: str) -> float:
+        return len(self._strong.findall(sentence)) + 0.5 * len(self._weak.findall(sentence))
+
+    def is_noise(self, sentence: str) -> bool:
+        return bool(NOISE_PATTERN.search(sentence))
+
+    def select(self, claims: List[str], rule_flagged: Iterable[int] = ()) -> ClaimSelection:
+        """Select the claims worth sending to the LLM.
+
+        `rule_flagged` holds the indices of claims the rules engine matched.
+        """
+        tokens_in = estimate_tokens(" ".join(claims))
+        if not self.enabled:
+            return ClaimSelection(list(claims), list(range(len(claims))), len(claims), tokens_in)
+
+        flagged = set(rule_flagged)
+        relevant = [
+            index for index, claim in enumerate(claims)
+            if self.score(claim) + (self.rule_bonus if index in flagged else 0) >= self.threshold
+        ]
+
+        selected = set(relevant)
+        for index in relevant:
+            for neighbour in range(index - self.context, index + self.context + 1):
+                if 0 <= neighbour < len(claims) and not self.is_noise(claims[neighbour]):
+                    selected.add(neighbour)
+
+        indices = sorted(selected)
+        return ClaimSelection([claims[i] for i in indices], indices, len(claims), tokens_in)
+
+# Singleton instance
+claim_filter = ClaimFilter()
@@ -0,0 +1,234 @@
+# src/app/services/claim_index.py
+"""Similarity index of claims GPT has already judged, shared by all workers.
+
+Green claims are formulaic, so many new claims are near-duplicates of
+earlier ones ("made with recycled materials" / "Made with recycled
+material"). Each judged claim is embedded as a hashed character n-gram
+vector (signed feature hashing, L2-normalized), and a new claim whose
+cosine similarity to a stored claim reaches `CLAIM_INDEX_MIN_SIMILARITY`
+reuses that claim's verdict instead of going to GPT.
+
+The index is one file at `CLAIM_INDEX_PATH`: a small header, then a
+`capacity x dimensions` float32 vector matrix, a scope id per row and a
+fixed-size JSON record per row holding the claim and its verdict. Every
+worker maps the same file (`numpy.memmap`, shared mapping), so there is one
+copy in the page cache whatever the worker count, and a verdict stored by
+one worker is found by the others straight away. Writers append under an
+exclusive `flock`; once full, the oldest rows are overwritten. Verdicts
+depend on the prompt, model and user profile, and their reasons can quote
+the claim they were given for, so each row carries a scope id and only rows
+of the caller's scope can match. The stored claim is only used to confirm a
+match; lookups never return it.
+
+Reusing a neighbour's verdict is an approximation, so the index is off
+until `CLAIM_INDEX_PATH` is set.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from .claim_cache import normalize_claim
+from .tracing import span
+
+CLAIM_INDEX_PATH = os.getenv("CLAIM_INDEX_PATH", "")
+CLAIM_INDEX_CAPACITY = int(os.getenv("CLAIM_INDEX_CAPACITY", "20000"))
+CLAIM_INDEX_DIMENSIONS = int(os.getenv("CLAIM_INDEX_DIMENSIONS", "512"))
+CLAIM_INDEX_MIN_SIMILARITY = float(os.getenv("CLAIM_INDEX_MIN_SIMILARITY", "0.9"))
+CLAIM_INDEX_NGRAM = int(os.getenv("CLAIM_INDEX_NGRAM", "3"))
+
+RECORD_BYTES = 2048
+_MAGIC = 0x43494458  # "CIDX"
+_FORMAT_VERSION = 2
+# magic, format version, dimensions, capacity, rows written so far (grows past capacity once rows wrap)
+_HEADER_FIELDS = 5
+_HEADER_BYTES = 64
+
+
+def scope_id(scope: str) -> int:
+    """Signed 64-bit id of a scope string, stored next to each vector."""
+    return int.from_bytes(hashlib.sha256(scope.encode()).digest()[:8], "little", signed=True)
+
+
+def claim_vector(claim: str, dimensions: int = CLAIM_INDEX_DIMENSIONS, n: int = CLAIM_INDEX_NGRAM):
+    """L2-normalized signed hash of the claim's character n-grams (words padded with spaces)."""
+    import numpy as np
+
+    text = f" {normalize_claim(claim)} "
+    vector = np.zeros(dimensions, dtype=np.float32)
+    grams = [text[i:i + n] for i in range(max(1, len(text) - n + 1))]
+    hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint32, count=len(grams))
+    # The top bit picks the sign, so colliding n-grams tend to cancel out instead of adding up
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % dimensions).astype(np.intp), signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ClaimIndex:
+    def __init__(
+        self,
+        path: str = CLAIM_INDEX_PATH,
+        capacity: int = CLAIM_INDEX_CAPACITY,
+        dimensions: int = CLAIM_INDEX_DIMENSIONS,
+        min_similarity: float = CLAIM_INDEX_MIN_SIMILARITY,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.dimensions = dimensions
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._header = self._vectors = self._scopes = self._records = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.capacity > 0
+
+    def __len__(self) -> int:
+        if not self.enabled:
+            return 0
+        self._open()
+        return int(min(self._header[4], self.capacity))
+
+    def lookup(self, claims: List[str], scope: str) -> List[Optional[Dict[str, Any]]]:
+        """For each claim, the stored verdict of its nearest neighbour in `scope`, or None below the threshold.
+
+        A reused verdict carries its `similarity` to the stored claim, not the claim itself.
+        """
+        if not claims or not self.enabled:
+            return [None] * len(claims)
+        import numpy as np
+
+        self._open()
+        rows = len(self)
+        if rows == 0:
+            return [None] * len(claims)
+        with span("claim_index.lookup", claims=len(claims), rows=rows) as attrs:
+            queries = np.stack([claim_vector(claim, self.dimensions) for claim in claims])
+            similarities = self._vectors[:rows] @ queries.T
+            similarities[self._scopes[:rows] != scope_id(scope)] = -1.0
+            best_rows = similarities.argmax(axis=0)
+            results: List[Optional[Dict[str, Any]]] = []
+            for column, row in enumerate(best_rows):
+                similarity = float(similarities[row, column])
+                record = self._read_record(int(row)) if similarity >= self.min_similarity else None
+                if record is None:
+                    results.append(None)
+                    continue
+                # The row may have been overwritten since the search; confirm against the stored claim
+                similarity = float(claim_vector(record["claim"], self.dimensions) @ queries[column])
+                if similarity < self.min_similarity:
+                    results.append(None)
+                    continue
+                results.append({**record["verdict"], "similarity": round(similarity, 4)})
+            attrs["reused"] = sum(result is not None for result in results)
+        return results
+
+    def add(self, entries: List[Tuple[str, Dict[str, Any]]], scope: str) -> int:
+        """Store (claim, verdict) entries judged in `scope`; returns how many fit."""
+        if not entries or not self.enabled:
+            return 0
+        import numpy as np
+
+        self._open()
+        scope_value = scope_id(scope)
+        prepared = []
+        for claim, verdict in entries:
+            record = _encode_record(claim, verdict)
+            if record is not None:
+                prepared.append((claim_vector(claim, self.dimensions), record))
+        with self._lock:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                written = int(self._header[4])
+                for vector, record in prepared:
+                    row = written % self.capacity
+                    self._vectors[row] = vector
+                    self._scopes[row] = scope_value
+                    self._records[row] = np.frombuffer(record.ljust(RECORD_BYTES, b"\0"), dtype=np.uint8)
+                    written += 1
+                # Rows first, count last, so readers never see a row before it is complete
+                self._header[4] = written
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        return len(prepared)
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        self._open()
+        with self._lock:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                self._header[4] = 0
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        with self._lock:
+            self._header = self._vectors = self._scopes = self._records = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self) -> None:
+        # flock locks belong to the open file, so a forked worker must open its own
+        if self._file is not None and self._pid == os.getpid():
+            return
+        import numpy as np
+
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                return
+            vectors_bytes = self.capacity * self.dimensions * 4
+            scopes_bytes = self.capacity * 8
+            size = _HEADER_BYTES + vectors_bytes + scopes_bytes + self.capacity * RECORD_BYTES
+            expected = [_MAGIC, _FORMAT_VERSION, self.dimensions, self.capacity]
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                # A missing file, or one written with other dimensions or capacity, starts over empty
+                file.seek(0)
+                header = np.frombuffer(file.read(_HEADER_FIELDS * 8).ljust(_HEADER_FIELDS * 8, b"\0"), dtype=np.int64)
+                if os.fstat(file.fileno()).st_size != size or list(header[:4]) != expected:
+                    file.truncate(0)
+                    file.truncate(size)
+                    file.seek(0)
+                    file.write(np.array(expected + [0], dtype=np.int64).tobytes())
+                    file.flush()
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+            self._header = np.memmap(file, dtype=np.int64, mode="r+", offset=0, shape=(_HEADER_FIELDS,))
+            self._vectors = np.memmap(file, dtype=np.float32, mode="r+", offset=_HEADER_BYTES, shape=(self.capacity, self.dimensions))
+            self._scopes = np.memmap(file, dtype=np.int64, mode="r+", offset=_HEADER_BYTES + vectors_bytes, shape=(self.capacity,))
+            self._records = np.memmap(
+                file, dtype=np.uint8, mode="r+", offset=_HEADER_BYTES + vectors_bytes + scopes_bytes, shape=(self.capacity, RECORD_BYTES)
+            )
+            self._file = file
+            self._pid = os.getpid()
+
+    def _read_record(self, row: int) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._records[row].tobytes().rstrip(b"\0"))
+        except ValueError:
+            return None
+
+
+def _encode_record(claim: str, verdict: Dict[str, Any]) -> Optional[bytes]:
+    """JSON record of at most RECORD_BYTES, or None when the verdict does not fit."""
+    verdict = {key: value for key, value in verdict.items() if key not in ("index", "similarity")}
+    encoded = json.dumps({"claim": claim, "verdict": verdict}, separators=(",", ":")).encode()
+    return encoded if len(encoded) <= RECORD_BYTES else None
+
+# Singleton instance
+claim_index = ClaimIndex()
@@ -0,0 +1,131 @@
+# src/app/services/compression.py
+"""Response compression.
+
+Complete (non-streamed) responses of a compressible type over
+`COMPRESSION_MIN_BYTES` are compressed with brotli when the client accepts
+it and the `brotli` package is installed, otherwise with gzip. Streamed
+responses (PDF reports) and responses that already carry a
+`Content-Encoding` pass through unchanged. Strong ETags of compressed
+responses are made weak. Every complete response of a compressible type
+carries `Vary: Accept-Encoding`, compressed or not, so shared caches never
+serve one encoding to a client that asked for another.
+"""
+import gzip
+import os
+from typing import Optional
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+_brotli = None
+
+
+def _get_brotli():
+    """The brotli module, imported on first use; None when it is not installed."""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+        except ImportError:
+            brotli = False
+        _brotli = brotli
+    return _brotli or None
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick `br` or `gzip` from an Accept-Encoding header, honouring `q=0`."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if accepted.get("br", 0) > 0 and _get_brotli() is not None:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return _get_brotli().compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _weak_etag(etag: bytes) -> bytes:
+    """A strong ETag names the exact bytes; the compressed body is only semantically equivalent."""
+    return etag if etag.startswith(b"W/") else b"W/" + etag
+
+
+def _vary_accept_encoding(headers: list) -> list:
+    """`headers` with Accept-Encoding added to its Vary header (or a new one)."""
+    for index, (name, value) in enumerate(headers):
+        if name == b"vary":
+            if b"accept-encoding" in value.lower() or value.strip() == b"*":
+                return headers
+            return headers[:index] + [(name, value + b", Accept-Encoding")] + headers[index + 1:]
+    return headers + [(b"vary", b"Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing complete responses."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start is None:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            response_headers = [(name.lower(), value) for name, value in start.get("headers", [])]
+            content_type = next((value for name, value in response_headers if name == b"content-type"), b"").decode("latin-1")
+            # Streamed and already encoded responses are never compressed, whatever the client accepts
+            if message.get("more_body", False) or any(name == b"content-encoding" for name, _ in response_headers):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            if not content_type.startswith(_COMPRESSIBLE_TYPES):
+                await send(start)
+                await send(message)
+                return
+            response_headers = _vary_accept_encoding(response_headers)
+            if encoding is None or len(body) < self.minimum_size:
+                await send({**start, "headers": response_headers})
+                await send(message)
+                return
+            compressed = compress(body, encoding)
+            response_headers = [(name, _weak_etag(value) if name == b"etag" else value) for name, value in response_headers if name != b"content-length"]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,21 +1,79 @@
 import os
+import hashlib
 import json
-from typing import Dict, Any, Optional
+import sys
+import threading
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from src.app.services.llm_backend import LLMBackend, LLMConfig, build_backend
+from src.app.services.llm_guard import CircuitOpenError
+from src.app.services.tracing import span, trace_event
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 # Load environment variables from .env if present (no-op if missing)
 load_dotenv()
 
-def _get_client() -> OpenAI:
-    """Create an OpenAI client lazily and fail with a clear message if the key is missing."""
-    api_key = os.getenv("OPENAI_API_KEY")
+
+class LLMNotConfiguredError(RuntimeError):
+    """Raised when no API key is configured for the LLM provider."""
+
+
+# (api_key, base_url) -> OpenAI client. Reusing the client keeps its HTTP
+# connection pool, so repeat calls skip the TCP/TLS handshake.
+_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client() -> "OpenAI":
+    """Return the OpenAI client for the configured endpoint, failing clearly if the key is missing.
+
+    LLM_BASE_URL points the client at a self-hosted OpenAI-compatible server;
+    LLM_API_KEY overrides OPENAI_API_KEY for it.
+    """
+    api_key = os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY")
     if not api_key:
-        raise RuntimeError(
+        raise LLMNotConfiguredError(
             "OPENAI_API_KEY is not set. Create a .env with OPENAI_API_KEY=... or export it in your shell."
         )
-    return OpenAI(api_key=api_key)
+    base_url = os.getenv("LLM_BASE_URL") or None
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            # The SDK is imported on first use; it is the slowest import of the app.
+            from openai import OpenAI
+
+            # Retries are handled by llm_guard so they can be bounded and circuit-broken.
+            options = {"base_url": base_url} if base_url else {}
+            client = OpenAI(api_key=api_key, max_retries=0, **options)
+            _clients[(api_key, base_url)] = client
+        return client
+
+
+_backend: Optional[LLMBackend] = None
+
+
+def get_llm_backend() -> LLMBackend:
+    """Return the configured LLM backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        # Resolve _get_client at call time so it can be patched in tests.
+        _backend = build_backend(LLMConfig(), lambda: _get_client())
+    return _backend
+
+
+def set_llm_backend(backend: Optional[LLMBackend]) -> None:
+    """Use `backend` for all analyses; None re-reads the configuration on next use."""
+    global _backend
+    _backend = backend
+    with _clients_lock:
+        _clients.clear()
 
 SYSTEM_PROMPT = """
 You are an expert in environmental communication and greenwashing detection, compliant with EU regulations.
@@ -50,41 +108,85 @@ Scoring guide:
 - 71-100 (High): Claims are misleading, rely on emotional appeals without proof, or omit critical information.
 """
 
+CLAIMS_PROMPT = """
+The text is given as numbered claims ("[1] ...", "[2] ..."). In addition to the fields above,
+score every claim individually and add a "claims" field to the JSON object:
+{
+  "claims": [
+    {"id": "integer (the claim number)", "risk_score": "integer (0-100)", "level": "'Low' or 'Medium' or 'High'",
+     "subtle_triggers": "[string, ...]", "reasons": "[string, ...]"}
+  ]
+}
+Return exactly one entry per claim number. Claims that are not environmental claims get risk_score 0.
+"""
+
+# Maximum estimated prompt tokens of claims per GPT call; longer claim lists are split
+# into chunks that are scored concurrently.
+GPT_CLAIMS_CHUNK_TOKENS = int(os.getenv("GPT_CLAIMS_CHUNK_TOKENS", "3000"))
+
+# The system message is identical for every user and request so that it forms a
+# stable leading prefix for provider-side prompt caching. Per-user context goes
+# into the user message, after that prefix.
+SYSTEM_PROMPT_WITH_CLAIMS = SYSTEM_PROMPT + CLAIMS_PROMPT
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "256"))
+
 from src.app.models.user import User
+from src.app.services.claim_filter import estimate_tokens
 
-def _build_personalized_prompt(user: Optional[User]) -> str:
-    """Build a personalized system prompt based on user data.
+def profile_fingerprint(user: Optional[User]) -> str:
+    """Return a stable key for the profile fields that personalize the prompt.
 
-    If `user` is None, this falls back to the generic SYSTEM_PROMPT.
+    Users with the same sector, company size and role get identical prompts.
     """
-    prompt = SYSTEM_PROMPT
+    if user is None:
+        return ""
+    return "|".join((user.sector or "", user.company_size or "", user.role or ""))
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _profile_context(sector: Optional[str], company_size: Optional[str], role: Optional[str]) -> str:
+    """Build the personalization block for one profile fingerprint (memoized)."""
+    context = ""
+    if sector:
+        context += f"Industry Sector: {sector}\n"
+        if "cosmetics" in sector.lower():
+            context += "Focus: Pay special attention to the Green Claims Directive and rules on 'clean beauty' or 'natural' allegations.\n"
+    if company_size:
+        context += f"Company Size: {company_size}\n"
+        if company_size in ["50-250", "250+"]:
+            context += "Focus: Remind the user of CSRD/CSDDD reporting obligations where relevant.\n"
+    if role:
+        context += f"User's Role: {role}\n"
+        if "marketing" in role.lower():
+            context += "Tone: Provide recommendations oriented towards marketing wording and claim substantiation.\n"
+        elif "legal" in role.lower() or "compliance" in role.lower():
+            context += "Tone: Provide detailed legal citations and focus on regulatory compliance.\n"
 
+    if not context:
+        return ""
+    return "--- User Profile for Personalization ---\n" + context + "---\n\n"
+
+def _build_profile_context(user: Optional[User]) -> str:
+    """Return the personalization block for `user`, or "" for anonymous users."""
     if user is None:
-        return prompt
-
-    prompt += "\n\n--- User Profile for Personalization ---\n"
-    if user.sector:
-        prompt += f"Industry Sector: {user.sector}\n"
-        if "cosmetics" in user.sector.lower():
-            prompt += "Focus: Pay special attention to the Green Claims Directive and rules on 'clean beauty' or 'natural' allegations.\n"
-    if user.company_size:
-        prompt += f"Company Size: {user.company_size}\n"
-        if user.company_size in ["50-250", "250+"]:
-            prompt += "Focus: Remind the user of CSRD/CSDDD reporting obligations where relevant.\n"
-    if user.role:
-        prompt += f"User's Role: {user.role}\n"
-        if "marketing" in user.role.lower():
-            prompt += "Tone: Provide recommendations oriented towards marketing wording and claim substantiation.\n"
-        elif "legal" in user.role.lower() or "compliance" in user.role.lower():
-            prompt += "Tone: Provide detailed legal citations and focus on regulatory compliance.\n"
-
-    return prompt
+        return ""
+    return _profile_context(user.sector, user.company_size, user.role)
+
+def invalidate_prompt_cache() -> None:
+    """Drop memoized profile blocks, e.g. after a user's profile was updated."""
+    _profile_context.cache_clear()
+
+def _build_messages(system_prompt: str, user: Optional[User], request: str) -> List[Dict[str, str]]:
+    """Lay out the chat messages with the static instructions as the leading prefix."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": _build_profile_context(user) + request},
+    ]
 
 def analyze_text_with_gpt(text: str, user: Optional[User] = None) -> Dict[str, Any]:
     """Analyze text for greenwashing risks, triggers, and recommendations.
 
-    When `user` is provided, the system prompt is personalized using the user's
-    profile; otherwise, a generic system prompt is used.
+    When `user` is provided, the request is personalized using the user's
+    profile; the system prompt itself is the same for everyone.
     """
     if not text:
         return {
@@ -93,23 +195,16 @@ def analyze_text_with_gpt(text: str, user: Optional[User] = None) -> Dict[str, A
             "reasons": ["No text provided for analysis."],
             "subtle_triggers": [],
             "recommendations": [],
+            "skipped": True,
+            "skip_reason": "no_text",
         }
 
-    personalized_prompt = _build_personalized_prompt(user)
+    messages = _build_messages(
+        SYSTEM_PROMPT, user, f"Analyze the following text for greenwashing risks and subtle triggers:\n\n{text}"
+    )
 
     try:
-        client = _get_client()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": personalized_prompt},
-                {"role": "user", "content": f"Analyze the following text for greenwashing risks and subtle triggers:\n\n{text}"}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.2,
-        )
-        # The response content is a JSON string, so we parse it
-        result = json.loads(response.choices[0].message.content)
+        result, token_usage = _create_completion(messages)
 
         # Basic validation and normalization
         result["risk_score"] = int(result.get("risk_score", 0))
@@ -117,18 +212,209 @@ def analyze_text_with_gpt(text: str, user: Optional[User] = None) -> Dict[str, A
         result["reasons"] = result.get("reasons", [])
         result["subtle_triggers"] = result.get("subtle_triggers", [])
         result["recommendations"] = result.get("recommendations", [])
+        result["token_usage"] = token_usage
 
         return result
 
     except Exception as e:
         # Keep server running; surface a clear reason in the result
-        print(f"Error during GPT analysis: {e}")
-        return {
-            "risk_score": 0,
-            "level": "Low",
-            "reasons": [
-                "AI analysis skipped due to configuration error. Ensure OPENAI_API_KEY is set.",
-            ],
-            "subtle_triggers": [],
-            "recommendations": [],
-        }
+        reason = _skip_reason(e)
+        trace_event("gpt_error", stage="text", reason=reason, error=str(e), error_type=type(e).__name__)
+        return _skipped_result(reason)
+
+
+def _create_completion(messages: List[Dict[str, str]]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Run one JSON-mode chat completion on the configured backend.
+
+    Returns the parsed JSON content and the token usage of the call.
+    """
+    backend = get_llm_backend()
+    with span("gpt", backend=backend.name, prompt_chars=sum(len(message["content"]) for message in messages)) as attrs:
+        result, token_usage = backend.complete_json(messages)
+        attrs.update(token_usage)
+    return result, token_usage
+
+
+SKIP_MESSAGES = {
+    "not_configured": "AI analysis skipped due to configuration error. Ensure OPENAI_API_KEY is set.",
+    "circuit_open": "AI analysis skipped: the AI provider is currently degraded. The score is based on rules only.",
+    "timeout": "AI analysis skipped: the AI provider did not respond in time. The score is based on rules only.",
+    "provider_error": "AI analysis skipped due to an AI provider error. The score is based on rules only.",
+}
+
+
+def _skip_reason(error: Exception) -> str:
+    if isinstance(error, LLMNotConfiguredError):
+        return "not_configured"
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    # Only an SDK that is already loaded can have raised one of its errors.
+    openai = sys.modules.get("openai")
+    if isinstance(error, TimeoutError) or (openai is not None and isinstance(error, openai.APITimeoutError)):
+        return "timeout"
+    return "provider_error"
+
+
+def _skipped_result(reason: str = "not_configured") -> Dict[str, Any]:
+    """Fallback verdict used when GPT was not consulted.
+
+    `skipped` marks the score as a placeholder so it is never mistaken for a
+    real "Low" verdict; aggregation then falls back to the rules-only score.
+    """
+    return {
+        "risk_score": 0,
+        "level": "Low",
+        "reasons": [SKIP_MESSAGES[reason]],
+        "subtle_triggers": [],
+        "recommendations": [],
+        "skipped": True,
+        "skip_reason": reason,
+    }
+
+
+def _level_for_score(score: int) -> str:
+    if score >= 71:
+        return "High"
+    if score >= 31:
+        return "Medium"
+    return "Low"
+
+
+def _chunk_claims(claims: List[str], max_tokens: int) -> List[List[int]]:
+    """Split claim indices into consecutive chunks of at most `max_tokens` estimated tokens."""
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, claim in enumerate(claims):
+        claim_tokens = estimate_tokens(claim) + 2  # numbering and separator
+        if current and current_tokens + claim_tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += claim_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _score_claim_chunk(claims: List[str], indices: List[int], user: Optional[User]) -> Dict[str, Any]:
+    """Score one chunk of claims with a single structured GPT call.
+
+    Claims are numbered by their position in the full claim list, so verdicts
+    from every chunk map back onto the same indices.
+    """
+    numbered = "\n".join(f"[{index + 1}] {claims[index]}" for index in indices)
+    messages = _build_messages(
+        SYSTEM_PROMPT_WITH_CLAIMS, user, f"Analyze the following claims for greenwashing risks and subtle triggers:\n\n{numbered}"
+    )
+    try:
+        result, token_usage = _create_completion(messages)
+    except Exception as e:
+        reason = _skip_reason(e)
+        trace_event("gpt_error", stage="claims", reason=reason, claims=len(indices), error=str(e), error_type=type(e).__name__)
+        return {**_skipped_result(reason), "claims": []}
+
+    wanted = set(indices)
+    verdicts = []
+    for verdict in result.get("claims") or []:
+        try:
+            index = int(verdict.get("id")) - 1
+            score = max(0, min(100, int(verdict.get("risk_score", 0))))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if index not in wanted:
+            continue
+        wanted.discard(index)
+        verdicts.append({
+            "index": index,
+            "risk_score": score,
+            "level": verdict.get("level") or _level_for_score(score),
+            "subtle_triggers": verdict.get("subtle_triggers", []),
+            "reasons": verdict.get("reasons", []),
+        })
+
+    return {
+        "risk_score": int(result.get("risk_score", 0)),
+        "level": result.get("level", "Low"),
+        "reasons": result.get("reasons", []),
+        "subtle_triggers": result.get("subtle_triggers", []),
+        "recommendations": result.get("recommendations", []),
+        "claims": verdicts,
+        "token_usage": token_usage,
+    }
+
+
+def prompt_version() -> str:
+    """Hash of the claims prompt and the model answering it; cached verdicts from another version are stale."""
+    backend = get_llm_backend()
+    identity = f"{SYSTEM_PROMPT_WITH_CLAIMS}|{backend.name}|{getattr(backend, 'model', '')}"
+    return hashlib.sha256(identity.encode()).hexdigest()[:12]
+
+
+def summarize_claim_verdicts(verdicts: List[Dict[str, Any]], recommendations: List[List[str]]) -> Dict[str, Any]:
+    """Document-level verdict rebuilt from per-claim verdicts, e.g. memoized ones.
+
+    Like merged chunks, the document scores as its riskiest claim; reasons,
+    triggers and the recommendations of the calls that produced the verdicts
+    are de-duplicated.
+    """
+    score = max((verdict["risk_score"] for verdict in verdicts), default=0)
+    return {
+        "risk_score": score,
+        "level": _level_for_score(score),
+        "reasons": _merge_unique([verdict["reasons"] for verdict in verdicts]),
+        "subtle_triggers": _merge_unique([verdict["subtle_triggers"] for verdict in verdicts]),
+        "recommendations": _merge_unique(recommendations),
+        "claims": verdicts,
+    }
+
+
+def _merge_unique(lists: List[List[str]]) -> List[str]:
+    return list(dict.fromkeys(item for items in lists for item in items))
+
+
+def analyze_claims_with_gpt(
+    claims: List[str],
+    user: Optional[User] = None,
+    max_chunk_tokens: int = GPT_CLAIMS_CHUNK_TOKENS,
+) -> Dict[str, Any]:
+    """Score every claim individually with as few GPT calls as possible.
+
+    All claims go into one structured call. When they exceed `max_chunk_tokens`
+    they are split into chunks that run concurrently and are merged: the
+    document score is the highest chunk score and the lists are de-duplicated.
+    The result has the same shape as `analyze_text_with_gpt` plus a "claims"
+    list of per-claim verdicts whose "index" refers to the position in `claims`.
+    """
+    if not claims:
+        return {**analyze_text_with_gpt("", user), "claims": []}
+
+    chunks = _chunk_claims(claims, max_chunk_tokens)
+    if len(chunks) == 1:
+        results = [_score_claim_chunk(claims, chunks[0], user)]
+    else:
+        max_workers = min(len(chunks), get_llm_backend().max_concurrency)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Each chunk runs in a copy of the caller's context so its spans join the request trace.
+            futures = [executor.submit(copy_context().run, _score_claim_chunk, claims, indices, user) for indices in chunks]
+            results = [future.result() for future in futures]
+
+    answered = [result for result in results if not result.get("skipped")]
+    worst = max(answered or results, key=lambda result: result["risk_score"])
+    merged = {
+        "risk_score": worst["risk_score"],
+        "level": worst["level"],
+        "reasons": _merge_unique([result["reasons"] for result in results]),
+        "subtle_triggers": _merge_unique([result["subtle_triggers"] for result in results]),
+        "recommendations": _merge_unique([result["recommendations"] for result in results]),
+        "claims": sorted((verdict for result in results for verdict in result["claims"]), key=lambda v: v["index"]),
+        "token_usage": {
+            key: sum(result.get("token_usage", {}).get(key, 0) for result in results)
+            for key in ("prompt_tokens", "completion_tokens", "cached_tokens")
+        },
+    }
+    # Only a fully failed analysis is a fallback; partial failures keep the answered chunks.
+    if not answered:
+        merged["skipped"] = True
+        merged["skip_reason"] = results[0]["skip_reason"]
+    return merged
@@ -0,0 +1,363 @@
+# src/app/services/idempotency.py
+"""`Idempotency-Key` support for analysis submissions.
+
+A POST to one of `IDEMPOTENCY_PATHS` carrying an `Idempotency-Key` header
+is recorded under (subject, key). The subject is the caller's API key,
+session cookie or IP address. The first request runs normally and its
+successful response is stored for `IDEMPOTENCY_TTL_SECONDS`. A retry with
+the same key gets the stored response replayed (`Idempotent-Replayed: true`).
+It runs no OCR or GPT, writes no usage log and uses no quota. A retry that
+arrives while the original is still running waits for it, and a key reused
+for a different request is rejected with 422.
+
+Records live in the database so retries are deduplicated across workers;
+waiters in the same worker are woken directly, others poll. A running
+request holds its key under a short lease (`IDEMPOTENCY_LEASE_SECONDS`),
+renewed while it runs and separate from the replay TTL. If its worker dies,
+the lease runs out and a retry takes the key over instead of waiting for
+the TTL.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.app.db.database import async_session_maker
+from src.app.models.idempotency import IdempotencyRecord
+from src.app.services.tracing import trace_event
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# A running request's hold on its key; renewed every third of it while the request runs.
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "30"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120"))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.25"))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+IDEMPOTENCY_PATHS = [
+    path.strip()
+    for path in os.getenv(
+        "IDEMPOTENCY_PATHS",
+        "/api/v1/analyze,/api/v1/analyze/text,/api/v1/analyze/text/batch,/api/v1/analyze/text/reanalyze,"
+        "/api/v1/analyze/url,/api/v1/report.pdf",
+    ).split(",")
+    if path.strip()
+]
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Response headers that describe the stored representation; anything else is per-response.
+_STORED_HEADERS = {"content-type", "content-disposition", "etag", "x-analysis-cache"}
+_PURGE_INTERVAL_SECONDS = 600
+
+
+class IdempotencyConflict(Exception):
+    """The key cannot be used for this request; `status_code` and `code` describe why."""
+
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+class IdempotencyService:
+    def __init__(
+        self,
+        ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+        lease_seconds: float = IDEMPOTENCY_LEASE_SECONDS,
+        wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS,
+        poll_seconds: float = IDEMPOTENCY_POLL_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._finished: Dict[Tuple[str, str], asyncio.Event] = {}
+        self._last_purge = 0.0
+
+    async def begin(self, subject: str, key: str, request_hash: str) -> Optional[IdempotencyRecord]:
+        """Claim the key for this request, or return the completed record to replay.
+
+        Returns None when the caller owns the key and must run the request,
+        keep its lease alive with `keep_alive`, then call `complete` or
+        `abandon`. Waits while another request with the key is running, and
+        takes the key over if that request's lease runs out. Raises
+        `IdempotencyConflict` for a reused key or when the original request
+        does not finish in time.
+        """
+        await self._maybe_purge()
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            record = await self._claim(subject, key, request_hash)
+            if record is None:
+                self._finished[(subject, key)] = asyncio.Event()
+                return None
+            if record.request_hash != request_hash:
+                raise IdempotencyConflict(422, "IDEMPOTENCY_KEY_REUSED", "This Idempotency-Key was used for a different request.")
+            if record.status_code is not None:
+                return record
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IdempotencyConflict(409, "IDEMPOTENCY_REQUEST_IN_PROGRESS", "A request with this Idempotency-Key is still running.")
+            # Same worker: wake as soon as the original finishes; other workers: poll
+            event = self._finished.get((subject, key))
+            if event is None:
+                await asyncio.sleep(min(self.poll_seconds, remaining))
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, subject: str, key: str, request_hash: str) -> Optional[IdempotencyRecord]:
+        """Own the key (returns None), or return the record of the request that holds it."""
+        while True:
+            now = datetime.utcnow()
+            owned = {
+                "request_hash": request_hash,
+                "locked_until": now + timedelta(seconds=self.lease_seconds),
+                "expires_at": now + timedelta(seconds=self.ttl_seconds),
+            }
+            async with async_session_maker() as session:
+                session.add(IdempotencyRecord(subject=subject, key=key, **owned))
+                try:
+                    await session.commit()
+                    return None
+                except IntegrityError:
+                    await session.rollback()
+                record = await session.scalar(
+                    select(IdempotencyRecord).where(IdempotencyRecord.subject == subject, IdempotencyRecord.key == key)
+                )
+                if record is None:
+                    continue  # the original was abandoned between our insert and this read
+                lease_expired = record.status_code is None and (record.locked_until is None or record.locked_until <= now)
+                if record.expires_at > now and not (lease_expired and record.request_hash == request_hash):
+                    return record
+                # Take the key over, unless another request did since our read
+                result = await session.execute(
+                    update(IdempotencyRecord)
+                    .where(
+                        IdempotencyRecord.id == record.id,
+                        or_(
+                            IdempotencyRecord.expires_at <= now,
+                            and_(
+                                IdempotencyRecord.status_code.is_(None),
+                                or_(IdempotencyRecord.locked_until.is_(None), IdempotencyRecord.locked_until <= now),
+                            ),
+                        ),
+                    )
+                    .values(status_code=None, response_headers=None, response_body=None, **owned)
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+                if result.rowcount == 1:
+                    if record.expires_at > now:
+                        trace_event("idempotency_lease_expired", level="warning")
+                    return None
+
+    async def keep_alive(self, subject: str, key: str) -> None:
+        """Renew the lease of the running request holding the key, until cancelled."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(
+                        update(IdempotencyRecord)
+                        .where(
+                            IdempotencyRecord.subject == subject,
+                            IdempotencyRecord.key == key,
+                            IdempotencyRecord.status_code.is_(None),
+                        )
+                        .values(locked_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                    )
+                    await session.commit()
+            except Exception as e:
+                trace_event("idempotency_lease_renewal_failed", level="warning", error=str(e), error_type=type(e).__name__)
+
+    async def complete(self, subject: str, key: str, status_code: int, headers: Dict[str, str], body: bytes) -> None:
+        async with async_session_maker() as session:
+            record = await session.scalar(
+                select(IdempotencyRecord).where(IdempotencyRecord.subject == subject, IdempotencyRecord.key == key)
+            )
+            if record is not None:
+                record.status_code = status_code
+                record.response_headers = headers
+                record.response_body = body
+                await session.commit()
+        self._wake(subject, key)
+
+    async def abandon(self, subject: str, key: str) -> None:
+        """Release the key so a retry runs the request again (used when it failed)."""
+        async with async_session_maker() as session:
+            await session.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.subject == subject, IdempotencyRecord.key == key)
+            )
+            await session.commit()
+        self._wake(subject, key)
+
+    def _wake(self, subject: str, key: str) -> None:
+        event = self._finished.pop((subject, key), None)
+        if event is not None:
+            event.set()
+
+    async def _maybe_purge(self) -> None:
+        if time.monotonic() - self._last_purge < _PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        await self.purge_expired()
+
+    async def purge_expired(self) -> int:
+        async with async_session_maker() as session:
+            result = await session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow()))
+            await session.commit()
+        return result.rowcount or 0
+
+
+def request_subject(scope: Dict[str, Any]) -> str:
+    """Hash of the caller's credentials (API key, then session cookie), falling back to the client IP."""
+    from src.app.auth.dependencies import API_KEY_HEADER
+    from src.app.routers.auth import cookie_transport
+
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(API_KEY_HEADER.lower().encode())
+    if api_key:
+        identity = b"key:" + api_key
+    else:
+        cookies = SimpleCookie(headers.get(b"cookie", b"").decode("latin-1"))
+        session = cookies.get(cookie_transport.cookie_name)
+        if session is not None and session.value:
+            identity = b"session:" + session.value.encode()
+        else:
+            client = scope.get("client")
+            identity = b"ip:" + (client[0] if client else "unknown").encode()
+    return hashlib.sha256(identity).hexdigest()
+
+
+def request_hash(scope: Dict[str, Any], body: bytes) -> str:
+    """Hash of method, path, query and body. The random multipart boundary is left out, so a retried upload matches."""
+    headers = dict(scope.get("headers") or [])
+    content_type = headers.get(b"content-type", b"")
+    if content_type.startswith(b"multipart/"):
+        boundary = content_type.partition(b"boundary=")[2].split(b";")[0].strip(b'"')
+        if boundary:
+            body = body.replace(boundary, b"")
+            content_type = content_type.replace(boundary, b"")
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), content_type, body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware applying `Idempotency-Key` to POSTs on `paths`."""
+
+    def __init__(self, app, service: Optional[IdempotencyService] = None, paths=IDEMPOTENCY_PATHS):
+        self.app = app
+        self.service = service or idempotency_service
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        key = dict(scope.get("headers") or []).get(IDEMPOTENCY_HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."})
+            return
+
+        body = await _read_body(receive)
+        subject = request_subject(scope)
+        try:
+            record = await self.service.begin(subject, key, request_hash(scope, body))
+        except IdempotencyConflict as e:
+            await _send_json(send, e.status_code, {"detail": {"code": e.code, "message": str(e)}})
+            return
+        if record is not None:
+            await _replay(send, record)
+            return
+
+        captured = {"status": None, "headers": [], "body": bytearray(), "complete": False}
+
+        async def replay_receive():
+            nonlocal body
+            if body is not None:
+                message, body = {"type": "http.request", "body": body, "more_body": False}, None
+                return message
+            return await receive()
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                if len(captured["body"]) <= IDEMPOTENCY_MAX_BODY_BYTES:
+                    captured["body"].extend(message.get("body", b""))
+                captured["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        lease = asyncio.create_task(self.service.keep_alive(subject, key))
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            lease.cancel()
+            status = captured["status"]
+            storable = (
+                captured["complete"]
+                and status is not None
+                and 200 <= status < 300
+                and len(captured["body"]) <= IDEMPOTENCY_MAX_BODY_BYTES
+            )
+            # Errors are not stored, so the client's retry runs the request again
+            if storable:
+                headers = {
+                    name.decode("latin-1").lower(): value.decode("latin-1")
+                    for name, value in captured["headers"]
+                    if name.decode("latin-1").lower() in _STORED_HEADERS
+                }
+                await self.service.complete(subject, key, status, headers, bytes(captured["body"]))
+            else:
+                await self.service.abandon(subject, key)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break  # the client went away; the app sees the disconnect on its next receive
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _replay(send, record: IdempotencyRecord) -> None:
+    trace_event("idempotent_replay", level="info", status=record.status_code)
+    body = record.response_body or b""
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in (record.response_headers or {}).items()]
+    headers += [(b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true")]
+    await send({"type": "http.response.start", "status": record.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, content: Dict[str, Any]) -> None:
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+# Singleton instance
+idempotency_service = IdempotencyService()
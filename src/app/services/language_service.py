@@ -0,0 +1,166 @@
+# src/app/services/language_service.py
+"""Language hints and detection for OCR and rule selection.
+
+Languages are Tesseract language pack codes (ISO 639-2, e.g. `deu`). A
+customer's `User.country` gives the languages their ads are likely to be
+in; OCR uses them together with the script Tesseract's OSD pass detects on
+each page to load as few language packs as possible. `detect_language`
+then names the language of the extracted text, so rules can be restricted
+to language-specific phrase sets.
+"""
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from ..models.user import User
+
+DEFAULT_LANGUAGE = os.getenv("OCR_DEFAULT_LANGUAGE", "eng")
+
+# Official languages per country, most widely used first. Keys are lower-case
+# English names, native names and ISO 3166 alpha-2 codes, as `User.country` is free text.
+_COUNTRY_LANGUAGES = [
+    (("austria", "österreich", "at"), ("deu",)),
+    (("belgium", "belgië", "belgique", "be"), ("nld", "fra", "deu")),
+    (("bulgaria", "българия", "bg"), ("bul",)),
+    (("croatia", "hrvatska", "hr"), ("hrv",)),
+    (("cyprus", "κύπρος", "cy"), ("ell", "eng")),
+    (("czechia", "czech republic", "česko", "cz"), ("ces",)),
+    (("denmark", "danmark", "dk"), ("dan",)),
+    (("estonia", "eesti", "ee"), ("est",)),
+    (("finland", "suomi", "fi"), ("fin", "swe")),
+    (("france", "fr"), ("fra",)),
+    (("germany", "deutschland", "de"), ("deu",)),
+    (("greece", "ελλάδα", "gr"), ("ell",)),
+    (("hungary", "magyarország", "hu"), ("hun",)),
+    (("iceland", "ísland", "is"), ("isl",)),
+    (("ireland", "éire", "ie"), ("eng", "gle")),
+    (("italy", "italia", "it"), ("ita",)),
+    (("latvia", "latvija", "lv"), ("lav",)),
+    (("lithuania", "lietuva", "lt"), ("lit",)),
+    (("luxembourg", "lëtzebuerg", "lu"), ("fra", "deu", "ltz")),
+    (("malta", "mt"), ("mlt", "eng")),
+    (("netherlands", "the netherlands", "nederland", "holland", "nl"), ("nld",)),
+    (("norway", "norge", "no"), ("nor",)),
+    (("poland", "polska", "pl"), ("pol",)),
+    (("portugal", "pt"), ("por",)),
+    (("romania", "românia", "ro"), ("ron",)),
+    (("slovakia", "slovensko", "sk"), ("slk",)),
+    (("slovenia", "slovenija", "si"), ("slv",)),
+    (("spain", "españa", "es"), ("spa", "cat")),
+    (("sweden", "sverige", "se"), ("swe",)),
+    (("switzerland", "schweiz", "suisse", "svizzera", "ch"), ("deu", "fra", "ita")),
+    (("united kingdom", "uk", "gb", "great britain", "england"), ("eng",)),
+    (("united states", "usa", "us"), ("eng",)),
+]
+COUNTRY_LANGUAGES: Dict[str, Tuple[str, ...]] = {
+    name: languages for names, languages in _COUNTRY_LANGUAGES for name in names
+}
+
+# Script of each language whose script is not Latin, as named by Tesseract's OSD
+LANGUAGE_SCRIPTS = {
+    "bul": "Cyrillic", "rus": "Cyrillic", "ukr": "Cyrillic", "srp": "Cyrillic", "mkd": "Cyrillic",
+    "ell": "Greek", "ara": "Arabic", "heb": "Hebrew", "jpn": "Japanese", "kor": "Hangul",
+    "chi_sim": "Han", "chi_tra": "Han",
+}
+# Language to read a script with when no hinted language uses it
+SCRIPT_DEFAULT_LANGUAGES = {
+    "Latin": DEFAULT_LANGUAGE, "Cyrillic": "rus", "Greek": "ell", "Arabic": "ara",
+    "Hebrew": "heb", "Japanese": "jpn", "Hangul": "kor", "Han": "chi_sim",
+}
+# Unicode name prefixes of letters, mapped to OSD script names
+_UNICODE_SCRIPTS = {
+    "LATIN": "Latin", "CYRILLIC": "Cyrillic", "GREEK": "Greek", "ARABIC": "Arabic", "HEBREW": "Hebrew",
+    "HIRAGANA": "Japanese", "KATAKANA": "Japanese", "HANGUL": "Hangul", "CJK": "Han",
+}
+
+# Frequent function words that set Latin-script languages apart
+_STOPWORDS = {
+    "eng": "the and with for our your is are of to from this",
+    "deu": "der die das und mit für ist nicht unsere ihre auf zu",
+    "fra": "le la les et des est pour avec nos votre une du",
+    "nld": "de het een en van voor met is onze uw niet zijn",
+    "ita": "il lo gli e di per con che è nostri una della",
+    "spa": "el los las y de para con que es nuestros una del",
+    "por": "o os as e de para com que é nossos uma do",
+    "pol": "i w z na się jest dla nie nasze to że od",
+    "swe": "och är för med att det vår en på inte som av",
+    "dan": "og er for med at det vores en på ikke som af",
+}
+_STOPWORD_LANGUAGES: Dict[str, Tuple[str, ...]] = {}
+for _language, _words in _STOPWORDS.items():
+    for _word in _words.split():
+        _STOPWORD_LANGUAGES[_word] = _STOPWORD_LANGUAGES.get(_word, ()) + (_language,)
+
+_WORD = re.compile(r"\w+")
+
+
+def script_of(language: str) -> str:
+    return LANGUAGE_SCRIPTS.get(language, "Latin")
+
+
+@lru_cache(maxsize=1024)
+def language_hints(country: Optional[str]) -> Tuple[str, ...]:
+    """Languages likely to appear in ads of a customer based in `country` (memoized)."""
+    if not country:
+        return ()
+    return COUNTRY_LANGUAGES.get(country.strip().lower().rstrip("."), ())
+
+
+def user_language_hints(user: Optional[User]) -> Tuple[str, ...]:
+    return language_hints(user.country) if user is not None else ()
+
+
+def choose_languages(script: Optional[str], hints: Iterable[str], max_languages: int = 2) -> Tuple[str, ...]:
+    """The smallest language set to OCR a page in `script` (None when OSD could not tell).
+
+    Hinted languages written in that script are used, up to `max_languages`;
+    without one, the script's default language.
+    """
+    hints = tuple(hints)
+    if script is None:
+        return hints[:max_languages] or (DEFAULT_LANGUAGE,)
+    matching = tuple(language for language in hints if script_of(language) == script)
+    if matching:
+        return matching[:max_languages]
+    return (SCRIPT_DEFAULT_LANGUAGES.get(script, DEFAULT_LANGUAGE),)
+
+
+def dominant_script(text: str) -> Optional[str]:
+    """The script most letters of `text` are written in."""
+    counts: Counter = Counter()
+    for char in text:
+        if char.isalpha():
+            script = _UNICODE_SCRIPTS.get(unicodedata.name(char, "").split(" ")[0])
+            if script:
+                counts[script] += 1
+    return counts.most_common(1)[0][0] if counts else None
+
+
+def detect_language(text: str, hints: Iterable[str] = ()) -> Optional[str]:
+    """Best guess at the language of `text`, or None when it has no letters.
+
+    Non-Latin text is attributed to a hinted language of its script (or the
+    script's default). Latin text is scored by its function words, with the
+    customer's hinted languages breaking ties; when no function word is
+    found, the first Latin hint (or the default language) is assumed.
+    """
+    hints = tuple(hints)
+    script = dominant_script(text)
+    if script is None:
+        return None
+    if script != "Latin":
+        return choose_languages(script, hints, max_languages=1)[0]
+
+    scores: Counter = Counter()
+    for word in _WORD.findall(text.lower()):
+        for language in _STOPWORD_LANGUAGES.get(word, ()):
+            scores[language] += 1
+    latin_hints = [language for language in hints if script_of(language) == "Latin"]
+    if not scores:
+        return latin_hints[0] if latin_hints else DEFAULT_LANGUAGE
+    for language in latin_hints:
+        scores[language] += 0.5
+    return scores.most_common(1)[0][0]
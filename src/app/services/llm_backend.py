@@ -0,0 +1,153 @@
+# src/app/services/llm_backend.py
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.app.services.llm_guard import GPT_TIMEOUT_SECONDS, LLMGuard, llm_guard
+
+Messages = List[Dict[str, str]]
+
+
+class LLMConfig:
+    """Backend settings, read from the environment.
+
+    LLM_BACKEND: "openai" (public API or any OpenAI-compatible server) or "stub".
+    LLM_BASE_URL: base URL of a self-hosted OpenAI-compatible server, e.g.
+        http://inference.internal:8000/v1. Unset means the public OpenAI API.
+    LLM_MODEL, LLM_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS: per-backend tuning.
+    LLM_STUB_LATENCY_MS: simulated latency of the in-process stub.
+    """
+
+    def __init__(self):
+        self.backend = os.getenv("LLM_BACKEND", "openai").lower()
+        self.base_url = os.getenv("LLM_BASE_URL") or None
+        self.model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", os.getenv("GPT_MAX_CONCURRENCY", "4")))
+        self.timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", str(GPT_TIMEOUT_SECONDS)))
+        self.stub_latency_ms = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+
+
+class LLMBackend:
+    """A chat model that answers with a JSON object."""
+
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max(1, max_concurrency)
+        # Caps in-flight calls from this process, across requests and claim chunks.
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def complete_json(self, messages: Messages) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """Return the parsed JSON answer and the token usage of the call."""
+        with self._slots:
+            return self._complete_json(messages)
+
+    def _complete_json(self, messages: Messages) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        raise NotImplementedError
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """The public OpenAI API or a self-hosted server speaking the same protocol.
+
+    `client_factory` returns the (cached) OpenAI client; calls run under
+    `guard` for retries, circuit breaking and the overall deadline; each
+    attempt is bounded by `timeout_seconds`.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        model: str = "gpt-4o-mini",
+        timeout_seconds: float = GPT_TIMEOUT_SECONDS,
+        max_concurrency: int = 4,
+        guard: LLMGuard = llm_guard,
+    ):
+        super().__init__(max_concurrency)
+        self.client_factory = client_factory
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.guard = guard
+
+    def _complete_json(self, messages: Messages) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        client = self.client_factory()
+        response = self.guard.call(
+            lambda remaining: client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=0.2,
+                timeout=min(self.timeout_seconds, remaining),
+            )
+        )
+        # The response content is a JSON string, so we parse it
+        return json.loads(response.choices[0].message.content), token_usage(response)
+
+
+class StubBackend(LLMBackend):
+    """In-process heuristic judge for offline runs; no network, no API key.
+
+    Latency is `latency_ms` plus uniform jitter, or drawn from
+    `latency_sampler` (returning milliseconds) when one is given.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        max_concurrency: int = 64,
+        latency_sampler: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(max_concurrency)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.latency_sampler = latency_sampler
+
+    def _complete_json(self, messages: Messages) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        from src.app.services.llm_stub import stub_judgement, stub_usage
+
+        if self.latency_sampler is not None:
+            delay_ms = self.latency_sampler()
+        else:
+            delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        result = stub_judgement(messages)
+        usage = stub_usage(messages, json.dumps(result))
+        return result, {
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+            "cached_tokens": 0,
+        }
+
+
+def token_usage(response: Any) -> Dict[str, int]:
+    """Extract prompt, completion and provider-cached prompt token counts."""
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+        "completion_tokens": getattr(usage, "completion_tokens", 0),
+        "cached_tokens": getattr(details, "cached_tokens", 0),
+    }
+    return {key: value if isinstance(value, int) else 0 for key, value in counts.items()}
+
+
+def build_backend(config: LLMConfig, client_factory: Callable[[], Any]) -> LLMBackend:
+    """Create the backend selected by `config`."""
+    if config.backend == "stub":
+        return StubBackend(latency_ms=config.stub_latency_ms)
+    if config.backend != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND {config.backend!r}; expected 'openai' or 'stub'.")
+    return OpenAICompatibleBackend(
+        client_factory,
+        model=config.model,
+        timeout_seconds=config.timeout_seconds,
+        max_concurrency=config.max_concurrency,
+    )
@@ -0,0 +1,180 @@
+# src/app/services/llm_guard.py
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Callable, Optional, Tuple, Type
+
+# Per attempt; enforced by the backend's client (see llm_backend.LLMConfig).
+GPT_TIMEOUT_SECONDS = float(os.getenv("GPT_TIMEOUT_SECONDS", "20"))
+# Across all attempts, backoff and hedges of one call.
+GPT_DEADLINE_SECONDS = float(os.getenv("GPT_DEADLINE_SECONDS", "30"))
+GPT_MAX_RETRIES = int(os.getenv("GPT_MAX_RETRIES", "2"))
+GPT_RETRY_BASE_DELAY_SECONDS = float(os.getenv("GPT_RETRY_BASE_DELAY_SECONDS", "0.5"))
+GPT_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GPT_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GPT_CIRCUIT_RESET_SECONDS = float(os.getenv("GPT_CIRCUIT_RESET_SECONDS", "30"))
+GPT_HEDGE_ENABLED = os.getenv("GPT_HEDGE_ENABLED", "false").lower() == "true"
+# Hedging only starts once enough latencies are known to estimate a p95.
+GPT_HEDGE_MIN_SAMPLES = int(os.getenv("GPT_HEDGE_MIN_SAMPLES", "20"))
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[Type[BaseException], ...]:
+    """Errors that indicate a transient provider problem and are worth retrying.
+
+    Resolved on first use so importing this module does not load the OpenAI SDK.
+    """
+    import openai
+
+    return (
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+        TimeoutError,
+    )
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call."""
+
+    def __init__(self, failure_threshold: int = GPT_CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = GPT_CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+class LLMGuard:
+    """Wraps blocking LLM calls with retries, a circuit breaker and optional hedging.
+
+    Only errors in retryable_errors() are retried (with full-jitter exponential
+    backoff) and counted by the breaker; anything else is raised at once.
+    While the breaker is open, calls fail fast with CircuitOpenError. The whole
+    call, retries included, gets `deadline_seconds`; once it is spent the call
+    fails with TimeoutError.
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: float = GPT_DEADLINE_SECONDS,
+        max_retries: int = GPT_MAX_RETRIES,
+        retry_base_delay: float = GPT_RETRY_BASE_DELAY_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_enabled: bool = GPT_HEDGE_ENABLED,
+        hedge_min_samples: int = GPT_HEDGE_MIN_SAMPLES,
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyTracker()
+        # Threads are only started on the first hedged call.
+        self._hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+    def call(self, fn: Callable[[float], Any]) -> Any:
+        """Call `fn` under the retry, breaker, hedging and deadline policy.
+
+        `fn` gets the seconds left of the deadline and must not run longer
+        (e.g. by passing the smaller of it and its own timeout to the client).
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM provider circuit is open")
+            started = time.monotonic()
+            try:
+                result = self._call_hedged(fn, deadline)
+            except retryable_errors() as error:
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, self.retry_base_delay * (2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    raise TimeoutError("LLM call ran out of time for another retry") from error
+                time.sleep(delay)
+                continue
+            except Exception:
+                # The provider answered (e.g. a 400); it is not degraded.
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            self.latencies.record(time.monotonic() - started)
+            return result
+
+    def _call_hedged(self, fn: Callable[[float], Any], deadline: float) -> Any:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM call deadline exceeded")
+        hedge_after = self.latencies.percentile(0.95, self.hedge_min_samples) if self.hedge_enabled else None
+        if hedge_after is None or hedge_after >= remaining:
+            return fn(remaining)
+
+        pending = {self._hedge_executor.submit(fn, remaining)}
+        done, _ = wait(pending, timeout=hedge_after)
+        if not done:
+            # The primary is slower than p95: race a second identical request.
+            pending.add(self._hedge_executor.submit(fn, deadline - time.monotonic()))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError("LLM call deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+# Singleton instance
+llm_guard = LLMGuard()
@@ -0,0 +1,146 @@
+# src/app/services/llm_stub.py
+"""Deterministic stand-in for the LLM judge.
+
+`stub_judgement` answers a chat request with the same JSON shape the real
+model is asked for, using local heuristics only. It backs the in-process
+`StubBackend` and a small OpenAI-compatible HTTP server with configurable
+latency, so the full pipeline can run offline in tests and benchmarks:
+
+    python -m src.app.services.llm_stub --port 8001 --latency-ms 400
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 LLM_API_KEY=stub ./run_api.sh
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.app.services.claim_filter import ClaimFilter, estimate_tokens
+
+_NUMBERED_CLAIM = re.compile(r"^\[(\d+)\]\s*(.*)$", re.MULTILINE)
+_ABSOLUTE_TERMS = re.compile(r"\b(100%|carbon neutral|climate positive|zero impact|eco-friendly|net[- ]zero)\b", re.IGNORECASE)
+_claim_filter = ClaimFilter()
+
+
+def _level(score: int) -> str:
+    if score >= 71:
+        return "High"
+    if score >= 31:
+        return "Medium"
+    return "Low"
+
+
+def _score_claim(text: str) -> Tuple[int, List[str]]:
+    triggers = []
+    score = min(60, int(_claim_filter.score(text) * 20))
+    if _ABSOLUTE_TERMS.search(text):
+        score += 30
+        triggers.append("absolute_claim")
+    if score and not re.search(r"\d", text):
+        score += 10
+        triggers.append("unquantified")
+    return min(100, score), triggers
+
+
+def stub_judgement(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Judge the last user message like the real model would, without a network call."""
+    content = messages[-1]["content"] if messages else ""
+    claims = [(int(number), text) for number, text in _NUMBERED_CLAIM.findall(content)]
+    if not claims:
+        claims = [(1, content.rsplit("\n\n", 1)[-1])]
+
+    verdicts = []
+    for number, text in claims:
+        score, triggers = _score_claim(text)
+        verdicts.append({
+            "id": number,
+            "risk_score": score,
+            "level": _level(score),
+            "subtle_triggers": triggers,
+            "reasons": ["Unsubstantiated environmental claim."] if score >= 31 else [],
+        })
+
+    risk_score = max(verdict["risk_score"] for verdict in verdicts)
+    return {
+        "risk_score": risk_score,
+        "level": _level(risk_score),
+        "reasons": ["Stub judge: heuristic verdict."],
+        "subtle_triggers": sorted({trigger for verdict in verdicts for trigger in verdict["subtle_triggers"]}),
+        "recommendations": ["Quantify and substantiate environmental claims."] if risk_score >= 31 else [],
+        "claims": verdicts,
+    }
+
+
+def stub_usage(messages: List[Dict[str, str]], completion: str) -> Dict[str, Any]:
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    completion_tokens = estimate_tokens(completion)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def _make_handler(latency_ms: float, jitter_ms: float):
+    class StubChatHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+            messages = body.get("messages", [])
+            content = json.dumps(stub_judgement(messages))
+            payload = json.dumps({
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": stub_usage(messages, content),
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubChatHandler
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, jitter_ms: float = 0) -> ThreadingHTTPServer:
+    """Start the stand-in server on a background thread and return it.
+
+    Use port 0 to pick a free port; the bound port is `server.server_address[1]`.
+    Call `server.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(latency_ms, jitter_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(args.latency_ms, args.jitter_ms))
+    print(f"Stub LLM listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
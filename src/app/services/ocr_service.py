@@ -1,15 +1,214 @@
-import pytesseract
-from PIL import Image
 import io
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+from src.app.services.language_service import DEFAULT_LANGUAGE, choose_languages
+from src.app.services.tracing import span, trace_event
 
-def extract_text_from_image(image_bytes: bytes) -> str:
-    """
-    Extracts text from an image using Tesseract OCR.
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "20"))
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "4"))
+# Frames whose 64-bit difference hashes differ in at most this many bits are OCRed once.
+OCR_DUPLICATE_HASH_DISTANCE = int(os.getenv("OCR_DUPLICATE_HASH_DISTANCE", "4"))
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+# Largest page held in memory (~120 MB as RGB). Bigger PDF pages are rendered at a lower DPI and
+# bigger JPEGs decoded at a reduced scale; other oversized frames (decompression bombs) are rejected.
+OCR_MAX_PAGE_PIXELS = int(os.getenv("OCR_MAX_PAGE_PIXELS", "40000000"))
+# Orientation and script detection before OCR; it picks the language packs for each page.
+OCR_DETECT_SCRIPT = os.getenv("OCR_DETECT_SCRIPT", "true").lower() != "false"
+OCR_MIN_SCRIPT_CONFIDENCE = float(os.getenv("OCR_MIN_SCRIPT_CONFIDENCE", "1.0"))
+OCR_MIN_ORIENTATION_CONFIDENCE = float(os.getenv("OCR_MIN_ORIENTATION_CONFIDENCE", "2.0"))
+# Pages are scaled down to this longest side for detection, which needs far less detail than OCR.
+OCR_OSD_MAX_SIDE = int(os.getenv("OCR_OSD_MAX_SIDE", "1600"))
+# Every extra language pack slows Tesseract down, so a page is read with at most this many.
+OCR_MAX_LANGUAGES = int(os.getenv("OCR_MAX_LANGUAGES", "2"))
+
+# Separates the pages of the extracted text, as in Tesseract's own multi-page output.
+PAGE_SEPARATOR = "\f"
+
+# Caps the Tesseract processes (OSD and OCR) this worker runs at once, across all requests and pages.
+_tesseract_slots = threading.BoundedSemaphore(max(1, OCR_MAX_WORKERS))
+# Shared by all requests for multi-page inputs; threads are only started on first use.
+_page_executor = ThreadPoolExecutor(max_workers=max(1, OCR_MAX_WORKERS), thread_name_prefix="ocr-page")
+
+
+def is_pdf(data: bytes) -> bool:
+    return data[:5] == b"%PDF-"
+
+
+def load_pages(data: bytes) -> list:
+    """Return the pages of a PDF or the frames of an image (multi-page TIFF, animated GIF) as RGB images."""
+    if is_pdf(data):
+        return _render_pdf_pages(data)
+    from PIL import Image, ImageSequence
+
+    pages = []
+    for frame in ImageSequence.Iterator(Image.open(io.BytesIO(data))):
+        # The size is known from the header, so this runs before the frame is decoded
+        if frame.width * frame.height > OCR_MAX_PAGE_PIXELS:
+            # Only JPEG can be decoded at a reduced (1/2 to 1/8) scale. Asking for half the target
+            # side makes the scale it picks, the nearest one at or above the request, stay under the cap.
+            scale = math.sqrt(OCR_MAX_PAGE_PIXELS / (frame.width * frame.height)) / 2
+            frame.draft("RGB", (max(1, int(frame.width * scale)), max(1, int(frame.height * scale))))
+        if frame.width * frame.height > OCR_MAX_PAGE_PIXELS:
+            raise ValueError(
+                f"Page {len(pages) + 1} is {frame.width}x{frame.height} pixels, over the {OCR_MAX_PAGE_PIXELS} pixel limit."
+            )
+        pages.append(frame.convert("RGB"))
+        if len(pages) >= OCR_MAX_PAGES:
+            break
+    return pages
+
+
+def pdf_page_dpi(width_points: float, height_points: float) -> int:
+    """OCR_PDF_DPI, lowered as far as needed to keep the rendered page within OCR_MAX_PAGE_PIXELS."""
+    pixels = (width_points * OCR_PDF_DPI / 72) * (height_points * OCR_PDF_DPI / 72)
+    if pixels <= OCR_MAX_PAGE_PIXELS:
+        return OCR_PDF_DPI
+    return max(1, int(OCR_PDF_DPI * math.sqrt(OCR_MAX_PAGE_PIXELS / pixels)))
+
+
+def _render_pdf_pages(data: bytes) -> list:
+    # PyMuPDF is only needed for PDF creatives
+    import fitz
+    from PIL import Image
+
+    pages = []
+    with fitz.open(stream=data, filetype="pdf") as document:
+        for page in document.pages(0, min(document.page_count, OCR_MAX_PAGES)):
+            dpi = pdf_page_dpi(page.rect.width, page.rect.height)
+            if dpi < OCR_PDF_DPI:
+                trace_event("ocr_page_downscaled", level="info", page=page.number + 1, dpi=dpi)
+            pixmap = page.get_pixmap(dpi=dpi, alpha=False)
+            pages.append(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples))
+    return pages
+
+
+def difference_hash(image) -> int:
+    """64-bit dHash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour."""
+    pixels = list(image.convert("L").resize((9, 8)).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def _distinct_pages(pages: list) -> List[int]:
+    """Indices of the pages that are not near-duplicates of an earlier page."""
+    seen: List[int] = []
+    distinct = []
+    for index, page in enumerate(pages):
+        page_hash = difference_hash(page)
+        if any(bin(page_hash ^ other).count("1") <= OCR_DUPLICATE_HASH_DISTANCE for other in seen):
+            continue
+        seen.append(page_hash)
+        distinct.append(index)
+    return distinct
+
+
+@lru_cache(maxsize=1)
+def available_languages() -> Optional[FrozenSet[str]]:
+    """Language packs Tesseract has installed (listed once per process), or None when it cannot list them."""
+    import pytesseract
+
+    try:
+        return frozenset(pytesseract.get_languages(config=""))
+    except Exception as e:
+        trace_event("ocr_languages_unavailable", level="warning", error=str(e), error_type=type(e).__name__)
+        return None
+
+
+def detect_orientation_and_script(page) -> Tuple[int, Optional[str]]:
+    """Clockwise rotation that makes the page upright and its script, by Tesseract's OSD.
+
+    Pages with too little text for a confident answer get `(0, None)`.
     """
+    import pytesseract
+
+    installed = available_languages()
+    if installed is not None and "osd" not in installed:
+        return 0, None
+    sample = page.copy()
+    sample.thumbnail((OCR_OSD_MAX_SIDE, OCR_OSD_MAX_SIDE))
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        text = pytesseract.image_to_string(image)
-        return text.strip()
+        osd = pytesseract.image_to_osd(sample, output_type=pytesseract.Output.DICT)
     except Exception as e:
-        print(f"Error during OCR: {e}")
-        return ""
+        trace_event("ocr_osd_skipped", level="info", error=str(e), error_type=type(e).__name__)
+        return 0, None
+    rotate = osd.get("rotate", 0) if osd.get("orientation_conf", 0) >= OCR_MIN_ORIENTATION_CONFIDENCE else 0
+    script = osd.get("script") if osd.get("script_conf", 0) >= OCR_MIN_SCRIPT_CONFIDENCE else None
+    return rotate, script
+
+
+def page_languages(script: Optional[str], language_hints: Iterable[str]) -> str:
+    """Tesseract `lang` for a page: the fewest installed packs covering its script and the hints."""
+    languages = choose_languages(script, language_hints, OCR_MAX_LANGUAGES)
+    installed = available_languages()
+    if installed is not None:
+        languages = tuple(language for language in languages if language in installed)
+    return "+".join(languages) or DEFAULT_LANGUAGE
+
+
+def _ocr_page(page, number: int, language_hints: Tuple[str, ...] = ()) -> str:
+    import pytesseract
+
+    with span("ocr.page", page=number) as attrs, _tesseract_slots:
+        rotate, script = detect_orientation_and_script(page) if OCR_DETECT_SCRIPT else (0, None)
+        if rotate:
+            # PIL rotates counter-clockwise
+            page = page.rotate(-rotate, expand=True)
+        lang = page_languages(script, language_hints)
+        attrs.update(script=script, rotate=rotate, lang=lang)
+        try:
+            text = pytesseract.image_to_string(page, lang=lang).strip()
+        except Exception as e:
+            trace_event("ocr_error", page=number, error=str(e), error_type=type(e).__name__)
+            text = ""
+        attrs["text_chars"] = len(text)
+        return text
+
+
+def extract_pages_from_image(image_bytes: bytes, language_hints: Iterable[str] = ()) -> List[str]:
+    """OCR every page or frame; near-duplicate frames are skipped and yield an empty page.
+
+    Pages are OCRed in parallel. Each pytesseract call runs in its own
+    Tesseract process, so a thread pool is enough to use several cores; the
+    pool and the Tesseract slots are shared by all requests, so the worker
+    never runs more than OCR_MAX_WORKERS Tesseract processes at once.
+    `language_hints` are the languages the customer's ads are likely in.
+    """
+    language_hints = tuple(language_hints)
+    pages = load_pages(image_bytes)
+    distinct = _distinct_pages(pages)
+    texts = [""] * len(pages)
+    if len(distinct) == 1:
+        texts[distinct[0]] = _ocr_page(pages[distinct[0]], distinct[0] + 1, language_hints)
+    elif distinct:
+        # Each task runs in a copy of the request context so its spans join the request trace
+        futures = {index: _page_executor.submit(copy_context().run, _ocr_page, pages[index], index + 1, language_hints) for index in distinct}
+        for index, future in futures.items():
+            texts[index] = future.result()
+    return texts
+
+
+def extract_text_from_image(image_bytes: bytes, language_hints: Iterable[str] = ()) -> str:
+    """
+    Extracts text from an image using Tesseract OCR.
+
+    Multi-page and multi-frame inputs yield one text per page, joined with
+    `PAGE_SEPARATOR` so claims can be traced back to their page.
+    """
+    with span("ocr", image_bytes=len(image_bytes)) as attrs:
+        try:
+            texts = extract_pages_from_image(image_bytes, language_hints)
+        except Exception as e:
+            trace_event("ocr_error", error=str(e), error_type=type(e).__name__)
+            texts = []
+        text = PAGE_SEPARATOR.join(texts)
+        attrs["pages"] = len(texts)
+        attrs["text_chars"] = len(text)
+        return text
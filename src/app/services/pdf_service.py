@@ -1,11 +1,13 @@
 import io
 import datetime
+from xml.sax.saxutils import escape
 from typing import Dict, Any, Tuple
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as ReportLabImage
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 from PIL import Image as PILImage
+from src.app.services.ocr_service import is_pdf, load_pages
 
 class PDFService:
     def __init__(self, image_bytes: bytes, analysis_data: Dict[str, Any]):
@@ -27,9 +29,8 @@ class PDFService:
         story.append(Paragraph("GreenCheck - Analysis Report", self.styles["h1"]))
         story.append(Spacer(1, 0.2 * inch))
 
-        # Add image
-        pil_image = PILImage.open(io.BytesIO(self.image_bytes))
-        img = ReportLabImage(io.BytesIO(self.image_bytes), width=4*inch, height=4*inch)
+        # Add image (the first page of multi-page and PDF creatives)
+        img = ReportLabImage(self._preview(), width=4*inch, height=4*inch)
         story.append(img)
         story.append(Spacer(1, 0.2 * inch))
 
@@ -49,8 +50,26 @@ class PDFService:
         for reason in self.analysis_data.get("reasons", []):
             story.append(Paragraph(f"- {reason}", self.styles["Normal"]))
 
+        # Add flagged claims with the page they were found on
+        claims = self.analysis_data.get("claims", [])
+        if claims:
+            story.append(Spacer(1, 0.2 * inch))
+            story.append(Paragraph("Flagged Claims", self.styles["h2"]))
+            for claim in sorted(claims, key=lambda claim: (claim.get("page") or 0, claim["index"])):
+                page = f"Page {claim['page']}: " if claim.get("page") else ""
+                level = f" ({claim['level']})" if claim.get("level") else ""
+                story.append(Paragraph(f"- {page}{escape(claim['text'])}{level}", self.styles["Normal"]))
+
         return story
 
+    def _preview(self) -> io.BytesIO:
+        if not is_pdf(self.image_bytes) and getattr(PILImage.open(io.BytesIO(self.image_bytes)), "n_frames", 1) == 1:
+            return io.BytesIO(self.image_bytes)
+        buffer = io.BytesIO()
+        load_pages(self.image_bytes)[0].save(buffer, format="PNG")
+        buffer.seek(0)
+        return buffer
+
     def _generate_filename(self) -> str:
         date = datetime.datetime.now().strftime("%Y-%m-%d")
         return f"GreenCheck_Report_{date}.pdf"
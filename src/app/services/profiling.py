@@ -0,0 +1,210 @@
+# src/app/services/profiling.py
+"""Opt-in profiling of single requests.
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` (an
+admin-only shared secret) or is picked by `PROFILE_SAMPLE_RATE`, and its
+path is in `PROFILE_PATHS`. While it runs, a sampling profiler records the
+stacks of the event-loop thread and of every worker thread that is inside one
+of the request's spans. The collapsed stacks (flamegraph format) and a JSON
+summary are saved under `PROFILE_DIR`, named by a server-generated profile id
+(the request id comes from the client and could clash), and the summary is
+added to the request's trace record. Unprofiled requests only pay for a
+header lookup and a random draw.
+
+Requests profiled by token also get their allocation peak from tracemalloc.
+tracemalloc is process-wide, so every request of the worker pays for it while
+it runs: sampled requests never turn it on, and only one request at a time
+traces allocations; the others are profiled without them.
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.app.services.tracing import current_trace
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = [path.strip() for path in os.getenv("PROFILE_PATHS", "/api/v1/analyze,/api/v1/report.pdf").split(",") if path.strip()]
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+PROFILE_HEADER = b"x-profile"
+# Leaf functions of an idle event loop; samples ending here are not work.
+_IDLE_LEAVES = {"select", "poll", "epoll", "kqueue", "_run_once"}
+
+
+class StackSampler:
+    """Samples the stacks of registered threads at a fixed interval."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def enter_thread(self) -> None:
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def exit_thread(self) -> None:
+        thread_id = threading.get_ident()
+        with self._lock:
+            remaining = self._threads.get(thread_id, 0) - 1
+            if remaining > 0:
+                self._threads[thread_id] = remaining
+            else:
+                self._threads.pop(thread_id, None)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                thread_ids = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None and frame.f_code.co_name not in _IDLE_LEAVES:
+                    self.stacks[_collapse(frame)] += 1
+                    self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _AllocationTracker:
+    """Lets one profiled request at a time trace allocations with tracemalloc."""
+
+    def __init__(self):
+        self._active = False
+        self._lock = threading.Lock()
+
+    def try_start(self) -> bool:
+        """Start tracing, unless another request (or `-X tracemalloc`) already is."""
+        with self._lock:
+            if self._active or tracemalloc.is_tracing():
+                return False
+            self._active = True
+            tracemalloc.start()
+            return True
+
+    def stop(self) -> Dict[str, Any]:
+        """Allocation peak and top sites since `try_start`; blocks on the snapshot, so run it off the loop."""
+        with self._lock:
+            _, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+            self._active = False
+        return {
+            "peak_bytes": peak,
+            "top_allocations": [{"site": str(stat.traceback[0]), "bytes": stat.size, "count": stat.count} for stat in top],
+        }
+
+
+_allocations = _AllocationTracker()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests; must run inside TracingMiddleware."""
+
+    def __init__(
+        self,
+        app,
+        token: str = PROFILE_TOKEN,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        paths=PROFILE_PATHS,
+        output_dir: str = PROFILE_DIR,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+    ):
+        self.app = app
+        self.token = token
+        self.sample_rate = sample_rate
+        self.paths = set(paths)
+        self.output_dir = Path(output_dir)
+        self.interval_ms = interval_ms
+
+    def _wants_profile(self, scope) -> Optional[str]:
+        """How the request was picked for profiling ("token" or "sampled"), or None."""
+        if scope["type"] != "http" or scope.get("path") not in self.paths:
+            return None
+        if self.token:
+            header = dict(scope.get("headers") or []).get(PROFILE_HEADER)
+            if header is not None and hmac.compare_digest(header, self.token.encode()):
+                return "token"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trace = current_trace()
+        reason = self._wants_profile(scope) if trace is not None else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(self.interval_ms)
+        trace.profiler = sampler
+        sampler.enter_thread()  # the event loop thread
+        tracing_allocations = reason == "token" and _allocations.try_start()
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+            await asyncio.to_thread(sampler.stop)
+            if tracing_allocations:
+                allocations = await asyncio.to_thread(_allocations.stop)
+            else:
+                allocations = {"peak_bytes": None, "top_allocations": []}
+            trace.profiler = None
+            profile_id = uuid.uuid4().hex
+            summary = {
+                "profile_id": profile_id,
+                "request_id": trace.request_id,
+                "path": scope.get("path"),
+                "duration_ms": elapsed_ms,
+                "interval_ms": self.interval_ms,
+                "samples": sampler.samples,
+                **allocations,
+            }
+            await asyncio.to_thread(self._save, profile_id, sampler.collapsed(), summary)
+            trace.profile = {
+                "samples": sampler.samples,
+                "peak_bytes": allocations["peak_bytes"],
+                "stacks_file": str(self.output_dir / f"{profile_id}.collapsed"),
+            }
+
+    def _save(self, profile_id: str, collapsed: str, summary: Dict[str, Any]) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / f"{profile_id}.collapsed").write_text(collapsed)
+        (self.output_dir / f"{profile_id}.json").write_text(json.dumps(summary, indent=2))
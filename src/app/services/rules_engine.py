@@ -1,11 +1,15 @@
+import hashlib
 import json
 import re
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Pattern, Tuple
+from src.app.services.tracing import trace_event
 
 class RulesEngine:
     def __init__(self, rules_path: Path):
         self.rules = self._load_rules(rules_path)
+        self._compiled: Optional[List[Tuple[Dict[str, Any], Pattern]]] = None
+        self._version: Optional[str] = None
 
     def _load_rules(self, rules_path: Path) -> List[Dict[str, Any]]:
         if not rules_path.exists():
@@ -14,23 +18,46 @@ class RulesEngine:
         with open(rules_path, "r") as f:
             return json.load(f)
 
-    def apply(self, text: str) -> List[Dict[str, Any]]:
+    def compile(self) -> List[Tuple[Dict[str, Any], Pattern]]:
+        """Compile every rule pattern once; invalid patterns are reported and skipped.
+
+        Runs on first use, or up front during warm-up. Large catalogs would
+        otherwise overflow the `re` module's cache and recompile on every call.
+        """
+        if self._compiled is None:
+            compiled = []
+            for rule in self.rules:
+                try:
+                    compiled.append((rule, re.compile(rule["pattern"], re.IGNORECASE)))
+                except re.error as e:
+                    # Log the error with the problematic rule pattern
+                    trace_event("rule_regex_error", rule_id=rule["id"], pattern=rule["pattern"], error=str(e))
+            self._compiled = compiled
+            self._version = hashlib.sha256(json.dumps(self.rules, sort_keys=True).encode()).hexdigest()[:12]
+        return self._compiled
+
+    @property
+    def version(self) -> str:
+        """Hash of the compiled catalog; results memoized under another version are stale."""
+        self.compile()
+        return self._version
+
+    def apply(self, text: str, language: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Match `text` against the rules; rules with a `languages` list only apply to text in one of them."""
         matches = []
-        for rule in self.rules:
-            try:
-                if re.search(rule["pattern"], text, re.IGNORECASE):
-                    matches.append(
-                        {
-                            "rule_id": rule["id"],
-                            "category": rule["category"],
-                            "severity": rule["severity"],
-                            "matched_text": rule["pattern"], # a more advanced impl could find the actual text
-                            "recommendation": rule["recommendation"],
-                        }
-                    )
-            except re.error as e:
-                # Log the error with the problematic rule pattern
-                print(f"Regex error in rule {rule['id']} with pattern '{rule['pattern']}': {e}")
+        for rule, pattern in self.compile():
+            if language and rule.get("languages") and language not in rule["languages"]:
+                continue
+            if pattern.search(text):
+                matches.append(
+                    {
+                        "rule_id": rule["id"],
+                        "category": rule["category"],
+                        "severity": rule["severity"],
+                        "matched_text": rule["pattern"], # a more advanced impl could find the actual text
+                        "recommendation": rule["recommendation"],
+                    }
+                )
         return matches
 
 # You can create a singleton instance for the app to use
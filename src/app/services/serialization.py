@@ -0,0 +1,118 @@
+# src/app/services/serialization.py
+"""Fast JSON responses with optional sparse fieldsets.
+
+Returning a `Response` from an endpoint skips FastAPI's second validation
+pass and `jsonable_encoder`; the body is produced in one step by
+pydantic-core's serializer. `fields=score,level,gpt_analysis.risk_score`
+limits the body to the listed (dot-separated) fields, which the schema
+still filters and orders; on list fields (`claims.text`) the sub-fields apply
+to every item. The ETag helpers answer `If-None-Match`.
+"""
+import hashlib
+import types
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union, get_args, get_origin
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. `score,level` or `gpt_analysis.risk_score`."
+
+
+def parse_fields(fields: Optional[str], model: type[BaseModel]) -> Optional[Dict[str, Any]]:
+    """Turn `a,b.c,d.e` into pydantic's include spec `{"a": True, "b": {"c": True}, "d": {"__all__": {"e": True}}}`.
+
+    Paths are checked against `model`: an unknown field, or a sub-field of a
+    field that has none, is a 400. Sub-fields of list fields are wrapped in
+    `__all__` so they select from every item rather than by index. Keys of an
+    untyped dict field are accepted, but nothing below them.
+    """
+    if not fields:
+        return None
+    include: Dict[str, Any] = {}
+    for path in fields.split(","):
+        parts = [part.strip() for part in path.split(".")]
+        if not all(parts):
+            continue
+        node = include
+        item_type: Any = model
+        for depth, part in enumerate(parts):
+            name = ".".join(parts[:depth + 1])
+            if item_type is None:
+                raise HTTPException(status_code=400, detail=f"Fields inside '{'.'.join(parts[:depth])}' cannot be selected.")
+            if isinstance(item_type, type) and issubclass(item_type, BaseModel):
+                if part not in item_type.model_fields:
+                    raise HTTPException(status_code=400, detail=f"Unknown field '{name}'.")
+                item_type, is_list = _item_type(item_type.model_fields[part].annotation)
+            elif item_type is dict or item_type is Any or get_origin(item_type) is dict:
+                # Free-form JSON: its keys can be picked, but their types are unknown
+                item_type, is_list = None, False
+            else:
+                raise HTTPException(status_code=400, detail=f"Fields inside '{'.'.join(parts[:depth])}' cannot be selected.")
+
+            if depth == len(parts) - 1:
+                node[part] = True
+                break
+            child = node.get(part)
+            if child is True:
+                break  # the whole parent is already included
+            node = node.setdefault(part, {})
+            if is_list:
+                node = node.setdefault("__all__", {})
+    return include or None
+
+
+def _item_type(annotation: Any) -> Tuple[Any, bool]:
+    """The type selected fields apply to, and whether it is the item type of a list; Optional is unwrapped."""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _item_type(args[0]) if len(args) == 1 else (annotation, False)
+    if origin in (list, tuple, set, frozenset, Sequence):
+        args = get_args(annotation)
+        return (args[0] if args else Any), True
+    return annotation, False
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def json_response(
+    schema: Any,
+    data: Any,
+    include: Optional[Dict[str, Any]] = None,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """Validate `data` (dicts or ORM objects) against `schema` and serialize it in one pass."""
+    adapter = _adapter(schema)
+    value = adapter.validate_python(data, from_attributes=True)
+    return Response(
+        content=adapter.dump_json(value, include=include),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def if_none_match_tags(header: Optional[str]) -> List[str]:
+    """Entity tags of an If-None-Match header with any weak prefix removed (it uses weak comparison)."""
+    if not header:
+        return []
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    tags = if_none_match_tags(header)
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def not_modified(etag: str, headers: Optional[Mapping[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
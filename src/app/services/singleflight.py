@@ -0,0 +1,36 @@
+# src/app/services/singleflight.py
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is still running await the same task instead of starting their
+    own. Each caller gets its own deep copy of the result so callers can
+    mutate it freely. Cancelling one caller never cancels the shared work.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,217 @@
+# src/app/services/tracing.py
+"""Structured per-request traces written as JSON lines.
+
+`TracingMiddleware` gives every HTTP request an id (echoed in the
+X-Request-ID header) and collects the spans (`span("ocr", ...)`) and events
+(`trace_event("ocr_error", ...)`) recorded while serving it. When the response
+is finished, one JSON record per request goes to a rotating JSONL file.
+Records are handed to a background thread through a queue, so writing a trace
+never blocks the event loop. Events raised outside a request are written as
+standalone records.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() != "false"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "logs/traces.jsonl")
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+
+REQUEST_ID_HEADER = "x-request-id"
+# Client-supplied request ids are accepted only if they look like ids.
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class Trace:
+    """Spans and events recorded for one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        # Set by ProfilingMiddleware while this request is being profiled.
+        self.profiler = None
+        self.profile: Optional[Dict[str, Any]] = None
+        # Spans may be recorded from worker threads (asyncio.to_thread copies the context).
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, started: float, attrs: Dict[str, Any]) -> None:
+        record = {
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 2),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            **attrs,
+        }
+        with self._lock:
+            self.spans.append(record)
+
+    def add_event(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self.events.append(event)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block as a span of the current request's trace.
+
+    Yields the span's attribute dict so the block can add result sizes.
+    Outside a traced request this only yields.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    # A profiled request samples every thread that is working inside one of its spans.
+    profiler = trace.profiler
+    if profiler is not None:
+        profiler.enter_thread()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, started, attrs)
+        if profiler is not None:
+            profiler.exit_thread()
+
+
+def trace_event(name: str, level: str = "error", **fields: Any) -> None:
+    """Record a structured event on the current trace, or write it on its own outside a request."""
+    event = {"event": name, "level": level, **fields}
+    trace = _current_trace.get()
+    if trace is not None:
+        event["at_ms"] = round((time.perf_counter() - trace.started) * 1000, 2)
+        trace.add_event(event)
+    else:
+        trace_sink.write({"type": "event", "ts": _now(), **event})
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+class TraceSink:
+    """Non-blocking JSONL writer: `write` only enqueues; a listener thread writes and rotates the file."""
+
+    def __init__(self, path: str = TRACE_LOG_PATH, max_bytes: int = TRACE_LOG_MAX_BYTES, backups: int = TRACE_LOG_BACKUPS, enabled: bool = TRACE_ENABLED):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = enabled
+        self._queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._start_lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        if self._listener is None:
+            self._start()
+        line = json.dumps(record, default=str, separators=(",", ":"))
+        self._queue.put(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._listener is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._listener = logging.handlers.QueueListener(self._queue, handler)
+            self._listener.start()
+
+    def flush(self) -> None:
+        """Block until every queued record is written (used at shutdown and in tests)."""
+        with self._start_lock:
+            if self._listener is None:
+                return
+            self._listener.stop()
+            self._listener = None
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces every HTTP request; see the module docstring."""
+
+    def __init__(self, app, sink: Optional[TraceSink] = None):
+        self.app = app
+        self.sink = sink or trace_sink
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.sink.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        trace = Trace(incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex)
+        token = _current_trace.set(trace)
+        declared = headers.get(b"content-length", b"")
+        # Prefer the declared size; handlers do not always read the body.
+        sizes = {"request_bytes": int(declared) if declared.isdigit() else 0, "response_bytes": 0}
+        count_body = not declared.isdigit()
+        status = 500
+
+        async def receive_wrapper():
+            message = await receive()
+            if count_body and message["type"] == "http.request":
+                sizes["request_bytes"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (REQUEST_ID_HEADER.encode(), trace.request_id.encode())]}
+            elif message["type"] == "http.response.body":
+                sizes["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            record = {
+                "type": "request",
+                "ts": _now(),
+                "request_id": trace.request_id,
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "status": status,
+                "duration_ms": round((time.perf_counter() - trace.started) * 1000, 2),
+                **sizes,
+                "spans": trace.spans,
+                "events": trace.events,
+            }
+            if trace.profile is not None:
+                record["profile"] = trace.profile
+            self.sink.write(record)
+
+# Singleton instance
+trace_sink = TraceSink()
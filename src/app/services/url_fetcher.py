@@ -0,0 +1,258 @@
+# src/app/services/url_fetcher.py
+"""Fetching of creatives by URL for `/analyze/url`.
+
+Assets are downloaded with a pooled async HTTP client under strict limits on
+size, total time and content type (images and PDFs). Each fetched asset is remembered with its
+`ETag`/`Last-Modified` validators, its bytes and the analyses already run on
+it. The next fetch of the URL is a conditional request; on `304 Not Modified`
+the cached bytes (and analyses) are reused, so compliance sweeps over
+unchanged creatives neither download nor re-analyze them.
+
+The server must not become a proxy into its own network, so redirects are
+followed by hand and every hop is checked: its host must be allowed, and
+it must resolve to public addresses only (no loopback, private, link-local
+or reserved ranges such as the 169.254.169.254 metadata service). The
+connection is then made to the address that was checked, so a second DNS
+answer cannot point it elsewhere.
+"""
+import asyncio
+import copy
+import hashlib
+import ipaddress
+import os
+import socket
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import SplitResult, urljoin, urlsplit
+
+from src.app.services.tracing import span
+
+URL_FETCH_TIMEOUT_SECONDS = float(os.getenv("URL_FETCH_TIMEOUT_SECONDS", "10"))
+URL_FETCH_MAX_BYTES = int(os.getenv("URL_FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+URL_FETCH_MAX_REDIRECTS = int(os.getenv("URL_FETCH_MAX_REDIRECTS", "3"))
+URL_FETCH_MAX_CONNECTIONS = int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "20"))
+# Hosts the DAM serves creatives from; empty allows any public host, for signed-in callers only.
+URL_FETCH_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv("URL_FETCH_ALLOWED_HOSTS", "").split(",") if host.strip()]
+# Only for a DAM inside the private network; allowed hosts then may resolve to private addresses.
+URL_FETCH_ALLOW_PRIVATE_ADDRESSES = os.getenv("URL_FETCH_ALLOW_PRIVATE_ADDRESSES", "false").lower() == "true"
+URL_FETCH_CACHE_MAX_ENTRIES = int(os.getenv("URL_FETCH_CACHE_MAX_ENTRIES", "256"))
+URL_FETCH_CACHE_MAX_BYTES = int(os.getenv("URL_FETCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class UrlFetchError(Exception):
+    """The asset could not be fetched; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FetchedAsset:
+    """An asset's bytes and validators, plus the analyses already run on them."""
+
+    def __init__(self, url: str, content: bytes, content_type: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.url = url
+        self.content = content
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.sha256 = hashlib.sha256(content).hexdigest()
+        self.not_modified = False
+        self.analyses: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def cacheable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class UrlFetcher:
+    def __init__(
+        self,
+        timeout_seconds: float = URL_FETCH_TIMEOUT_SECONDS,
+        max_bytes: int = URL_FETCH_MAX_BYTES,
+        max_redirects: int = URL_FETCH_MAX_REDIRECTS,
+        max_connections: int = URL_FETCH_MAX_CONNECTIONS,
+        allowed_hosts=URL_FETCH_ALLOWED_HOSTS,
+        allow_private_addresses: bool = URL_FETCH_ALLOW_PRIVATE_ADDRESSES,
+        cache_max_entries: int = URL_FETCH_CACHE_MAX_ENTRIES,
+        cache_max_bytes: int = URL_FETCH_CACHE_MAX_BYTES,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.max_connections = max_connections
+        self.allowed_hosts = set(allowed_hosts)
+        self.allow_private_addresses = allow_private_addresses
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: "OrderedDict[str, FetchedAsset]" = OrderedDict()
+        self._cached_bytes = 0
+        self._client = None
+        self._client_loop = None
+
+    def _get_client(self):
+        # Connection pools are bound to the event loop that created them.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # httpx is imported on first use to keep it out of the API's cold start
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                # Every hop is checked in _send
+                follow_redirects=False,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client, self._client_loop = self._client, None, None
+            try:
+                await client.aclose()
+            except RuntimeError:
+                pass  # its event loop is already closed
+
+    def _check_url(self, url: str) -> SplitResult:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise UrlFetchError("Only http and https URLs can be analyzed.")
+        if self.allowed_hosts and parts.hostname.lower() not in self.allowed_hosts:
+            raise UrlFetchError(f"Fetching from {parts.hostname} is not allowed.", status_code=403)
+        return parts
+
+    async def _resolve(self, host: str, port: int) -> str:
+        """The address to connect to for `host`; every address it resolves to must be public."""
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            raise UrlFetchError(f"Could not resolve {host}.", status_code=502)
+        addresses = [info[4][0] for info in infos]
+        if not addresses:
+            raise UrlFetchError(f"Could not resolve {host}.", status_code=502)
+        if not self.allow_private_addresses and not all(map(is_public_address, addresses)):
+            raise UrlFetchError(f"Fetching from {host} is not allowed.", status_code=403)
+        return addresses[0]
+
+    async def _send(self, url: str, headers: Dict[str, str]):
+        """GET `url` as a streamed response, following redirects one checked hop at a time."""
+        client = self._get_client()
+        for _ in range(self.max_redirects + 1):
+            parts = self._check_url(url)
+            address = await self._resolve(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            request = client.build_request("GET", url, headers=headers)
+            # Connect to the checked address; Host and TLS still name the original host
+            request.url = request.url.copy_with(host=address)
+            request.extensions["sni_hostname"] = parts.hostname
+            response = await client.send(request, stream=True)
+            if response.status_code not in _REDIRECT_STATUSES or "location" not in response.headers:
+                return response
+            await response.aclose()
+            url = urljoin(url, response.headers["location"])
+        raise UrlFetchError("Too many redirects.", status_code=502)
+
+    async def fetch(self, url: str) -> FetchedAsset:
+        """Fetch `url`, revalidating a cached copy with a conditional request."""
+        self._check_url(url)
+        cached = self._cache.get(url)
+        with span("url_fetch", conditional=cached is not None) as attrs:
+            try:
+                asset = await asyncio.wait_for(self._fetch(url, cached), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                raise UrlFetchError(f"Fetching the asset took longer than {self.timeout_seconds:g} seconds.", status_code=504)
+            attrs["not_modified"] = asset.not_modified
+            attrs["bytes"] = len(asset.content)
+        return asset
+
+    async def _fetch(self, url: str, cached: Optional[FetchedAsset]) -> FetchedAsset:
+        import httpx
+
+        headers = {"Accept": "image/*, application/pdf"}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        try:
+            response = await self._send(url, headers)
+            try:
+                if response.status_code == 304 and cached is not None:
+                    self._cache.move_to_end(url)
+                    # A shallow copy shares the bytes and the analyses with the cache entry
+                    revalidated = copy.copy(cached)
+                    revalidated.not_modified = True
+                    return revalidated
+                if response.status_code != 200:
+                    raise UrlFetchError(f"The asset server answered with status {response.status_code}.", status_code=502)
+
+                content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                if not (content_type.startswith("image/") or content_type == "application/pdf"):
+                    raise UrlFetchError(f"URL does not point to an image or PDF (content type {content_type or 'unknown'}).", status_code=415)
+                declared = response.headers.get("content-length")
+                if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                    raise UrlFetchError(f"Asset is larger than {self.max_bytes} bytes.", status_code=413)
+
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > self.max_bytes:
+                        raise UrlFetchError(f"Asset is larger than {self.max_bytes} bytes.", status_code=413)
+                if not body:
+                    raise UrlFetchError("The fetched asset is empty.")
+                etag = response.headers.get("etag")
+                last_modified = response.headers.get("last-modified")
+            finally:
+                await response.aclose()
+        except httpx.TimeoutException:
+            raise UrlFetchError(f"Fetching the asset took longer than {self.timeout_seconds:g} seconds.", status_code=504)
+        except httpx.HTTPError as e:
+            raise UrlFetchError(f"Could not fetch the asset: {type(e).__name__}.", status_code=502)
+
+        asset = FetchedAsset(url, bytes(body), content_type, etag=etag, last_modified=last_modified)
+        # Changed bytes under a new validator keep nothing from the old entry
+        if cached is not None and cached.sha256 == asset.sha256:
+            asset.analyses = cached.analyses
+        self._store(asset)
+        return asset
+
+    def cached_analysis(self, asset: FetchedAsset, key: str) -> Optional[Dict[str, Any]]:
+        result = asset.analyses.get(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def remember_analysis(self, asset: FetchedAsset, key: str, result: Dict[str, Any]) -> None:
+        if asset.cacheable:
+            asset.analyses[key] = copy.deepcopy(result)
+
+    def _store(self, asset: FetchedAsset) -> None:
+        self._evict(asset.url)
+        if not asset.cacheable or len(asset.content) > self.cache_max_bytes or self.cache_max_entries <= 0:
+            return
+        self._cache[asset.url] = asset
+        self._cached_bytes += len(asset.content)
+        while len(self._cache) > self.cache_max_entries or self._cached_bytes > self.cache_max_bytes:
+            self._evict(next(iter(self._cache)))
+
+    def _evict(self, url: str) -> None:
+        asset = self._cache.pop(url, None)
+        if asset is not None:
+            self._cached_bytes -= len(asset.content)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+def is_public_address(address: str) -> bool:
+    """Whether `address` is globally routable unicast (IPv4-mapped IPv6 judged as IPv4)."""
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+# Singleton instance
+url_fetcher = UrlFetcher()
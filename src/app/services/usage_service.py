@@ -1,15 +1,30 @@
-from datetime import datetime
-from typing import Optional
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import Request
-from sqlalchemy import select, func
+from sqlalchemy import delete, select, func, update
+from sqlalchemy.exc import IntegrityError
 from src.app.db.database import async_session_maker
 from src.app.models.user import User
-from src.app.models.usage import UsageLog
+from src.app.models.usage import UsageDailyRollup, UsageLog
+from src.app.services.api_key_service import VerifiedApiKey
+from src.app.services.tracing import trace_event
 
 # Daily free analysis limit for non-premium users (per user/IP).
 # Local development (127.0.0.1) is exempt from this limit so you can test freely.
 NON_PREMIUM_LIMIT = 3
 
+# Upper bounds (inclusive, in ms) of the duration histogram kept in the daily
+# rollups. Durations above the last bound land in an extra overflow bucket.
+DURATION_BUCKETS_MS = [100, 250, 500, 1000, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000]
+SCORE_BUCKETS = 10
+RISK_LEVELS = ("Low", "Medium", "High")
+
+# Attempts at folding a request's logs into its rollup row before giving up.
+# Workers update rollups optimistically, so a lost race only costs a retry;
+# rollups that still miss logs can be repaired with `rebuild_daily_rollups`.
+ROLLUP_MAX_ATTEMPTS = 5
+
 
 async def log_analysis(
     input_type: str,
@@ -17,28 +32,160 @@ async def log_analysis(
     duration_ms: int,
     user: Optional[User] = None,
     ip_address: Optional[str] = None,
+    api_key: Optional[VerifiedApiKey] = None,
 ):
+    await log_analyses(input_type, [(result_json, duration_ms)], user=user, ip_address=ip_address, api_key=api_key)
+
+
+async def log_analyses(
+    input_type: str,
+    entries: List[Tuple[dict, int]],
+    user: Optional[User] = None,
+    ip_address: Optional[str] = None,
+    api_key: Optional[VerifiedApiKey] = None,
+):
+    """Log several analyses of one request, given as (result_json, duration_ms), in a single transaction."""
     async with async_session_maker() as session:
-        usage_log = UsageLog(
-            user_id=user.id if user else None,
-            ip_address=ip_address,
-            input_type=input_type,
-            result_json=result_json,
-            duration_ms=duration_ms,
-            premium_features_used=user.is_premium if user else False,
-        )
-        session.add(usage_log)
+        usage_logs = [
+            UsageLog(
+                user_id=user.id if user else None,
+                api_key_id=api_key.id if api_key else None,
+                ip_address=ip_address,
+                input_type=input_type,
+                result_json=result_json,
+                duration_ms=duration_ms,
+                premium_features_used=user.is_premium if user else False,
+            )
+            for result_json, duration_ms in entries
+        ]
+        session.add_all(usage_logs)
+        # The rollup is only a summary: fold the logs in after they are committed,
+        # so a conflict on the rollup row can never take the logs (and quota counts) with it.
+        delta = None
+        if user is not None:
+            delta = _new_rollup(user.id, datetime.utcnow().date())
+            for usage_log in usage_logs:
+                _add_to_rollup(delta, usage_log)
         await session.commit()
 
-async def _get_daily_usage_count(user: Optional[User] = None, ip_address: Optional[str] = None) -> int:
-    """Return how many analyses have been performed today by this user/IP."""
+    if delta is not None:
+        await _merge_into_rollup(delta)
+
+
+def _new_rollup(user_id, day: date) -> UsageDailyRollup:
+    return UsageDailyRollup(
+        user_id=user_id,
+        day=day,
+        analysis_count=0,
+        premium_count=0,
+        duration_sum_ms=0,
+        duration_max_ms=0,
+        duration_histogram=[0] * (len(DURATION_BUCKETS_MS) + 1),
+        score_histogram=[0] * SCORE_BUCKETS,
+        level_counts={level: 0 for level in RISK_LEVELS},
+    )
+
+
+async def _merge_into_rollup(delta: UsageDailyRollup) -> bool:
+    """Add `delta` to the stored rollup of its user and day, safely across workers.
+
+    The row is created if missing (a concurrent creator wins and we use its
+    row), then updated with a compare-and-set on `analysis_count`, which
+    every merge increases: if another worker merged in between, nothing is
+    written and the merge is retried on fresh values.
+    """
+    for _ in range(ROLLUP_MAX_ATTEMPTS):
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(UsageDailyRollup).where(
+                    UsageDailyRollup.user_id == delta.user_id, UsageDailyRollup.day == delta.day
+                )
+            )
+            rollup = result.scalar_one_or_none()
+            if rollup is None:
+                session.add(_new_rollup(delta.user_id, delta.day))
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    await session.rollback()
+                continue
+
+            result = await session.execute(
+                update(UsageDailyRollup)
+                .where(UsageDailyRollup.id == rollup.id, UsageDailyRollup.analysis_count == rollup.analysis_count)
+                .values(**_merged_rollup_values(rollup, delta))
+            )
+            await session.commit()
+            if result.rowcount == 1:
+                return True
+    trace_event("usage_rollup_conflict", level="warning", user_id=str(delta.user_id), day=str(delta.day))
+    return False
+
+
+def _merged_rollup_values(rollup: UsageDailyRollup, delta: UsageDailyRollup) -> dict:
+    levels = {**rollup.level_counts, **delta.level_counts}
+    return {
+        "analysis_count": rollup.analysis_count + delta.analysis_count,
+        "premium_count": rollup.premium_count + delta.premium_count,
+        "duration_sum_ms": rollup.duration_sum_ms + delta.duration_sum_ms,
+        "duration_max_ms": max(rollup.duration_max_ms, delta.duration_max_ms),
+        "duration_histogram": [a + b for a, b in zip(rollup.duration_histogram, delta.duration_histogram)],
+        "score_histogram": [a + b for a, b in zip(rollup.score_histogram, delta.score_histogram)],
+        "level_counts": {
+            level: rollup.level_counts.get(level, 0) + delta.level_counts.get(level, 0) for level in levels
+        },
+    }
+
+
+def _duration_bucket(duration_ms: int) -> int:
+    for index, bound in enumerate(DURATION_BUCKETS_MS):
+        if duration_ms <= bound:
+            return index
+    return len(DURATION_BUCKETS_MS)
+
+
+def _add_to_rollup(rollup: UsageDailyRollup, usage_log: UsageLog) -> None:
+    """Fold a single usage log into its daily rollup."""
+    duration_ms = max(0, int(usage_log.duration_ms or 0))
+    result = usage_log.result_json or {}
+
+    # JSON columns are only flagged dirty on reassignment, so copy before mutating.
+    duration_histogram = list(rollup.duration_histogram)
+    duration_histogram[_duration_bucket(duration_ms)] += 1
+    rollup.duration_histogram = duration_histogram
+
+    score = result.get("score")
+    if isinstance(score, (int, float)):
+        score_histogram = list(rollup.score_histogram)
+        score_histogram[min(SCORE_BUCKETS - 1, max(0, int(score) // 10))] += 1
+        rollup.score_histogram = score_histogram
+
+    level = result.get("level")
+    if level:
+        level_counts = dict(rollup.level_counts)
+        level_counts[level] = level_counts.get(level, 0) + 1
+        rollup.level_counts = level_counts
+
+    rollup.analysis_count += 1
+    rollup.premium_count += 1 if usage_log.premium_features_used else 0
+    rollup.duration_sum_ms += duration_ms
+    rollup.duration_max_ms = max(rollup.duration_max_ms, duration_ms)
+
+async def _get_daily_usage_count(
+    user: Optional[User] = None,
+    ip_address: Optional[str] = None,
+    api_key_id=None,
+) -> int:
+    """Return how many analyses have been performed today by this API key/user/IP."""
     async with async_session_maker() as session:
         today = datetime.utcnow().date()
         start_of_day = datetime.combine(today, datetime.min.time())
 
         query = select(func.count(UsageLog.id)).where(UsageLog.timestamp >= start_of_day)
 
-        if user:
+        if api_key_id:
+            query = query.where(UsageLog.api_key_id == api_key_id)
+        elif user:
             query = query.where(UsageLog.user_id == user.id)
         elif ip_address:
             query = query.where(UsageLog.ip_address == ip_address)
@@ -50,18 +197,40 @@ async def _get_daily_usage_count(user: Optional[User] = None, ip_address: Option
         return result.scalar_one_or_none() or 0
 
 
-async def can_perform_analysis(user: Optional[User] = None, ip_address: Optional[str] = None) -> bool:
+async def get_remaining_analyses(
+    user: Optional[User] = None,
+    ip_address: Optional[str] = None,
+    api_key: Optional[VerifiedApiKey] = None,
+) -> Optional[int]:
+    """Return how many more analyses may run today, or None when there is no limit."""
+    remaining = None
+    # An explicit per-key quota applies on top of the account's plan, including locally.
+    if api_key and api_key.daily_quota is not None:
+        remaining = max(0, api_key.daily_quota - await _get_daily_usage_count(api_key_id=api_key.id))
+        if remaining == 0:
+            return 0
+
     # Premium users have no limit
     if user and user.is_premium:
-        return True
+        return remaining
 
     # Allow unlimited usage from localhost during development so you don't get blocked
     # while testing the app locally.
     if ip_address in {"127.0.0.1", "localhost"}:
-        return True
+        return remaining
 
     count = await _get_daily_usage_count(user=user, ip_address=ip_address)
-    return count < NON_PREMIUM_LIMIT
+    plan_remaining = max(0, NON_PREMIUM_LIMIT - count)
+    return plan_remaining if remaining is None else min(remaining, plan_remaining)
+
+
+async def can_perform_analysis(
+    user: Optional[User] = None,
+    ip_address: Optional[str] = None,
+    api_key: Optional[VerifiedApiKey] = None,
+) -> bool:
+    remaining = await get_remaining_analyses(user=user, ip_address=ip_address, api_key=api_key)
+    return remaining is None or remaining > 0
 
 
 async def get_usage_summary(user: Optional[User] = None, ip_address: Optional[str] = None) -> dict:
@@ -84,9 +253,108 @@ async def get_usage_history(user: User):
         )
         return result.scalars().all()
 
+async def get_usage_history_version(user: User) -> Tuple[Optional[str], int]:
+    """Id of the user's latest log and their log count; logs are append-only, so this identifies the history."""
+    async with async_session_maker() as session:
+        count = await session.scalar(select(func.count()).select_from(UsageLog).where(UsageLog.user_id == user.id))
+        latest_id = await session.scalar(
+            select(UsageLog.id).where(UsageLog.user_id == user.id).order_by(UsageLog.timestamp.desc()).limit(1)
+        )
+    return (str(latest_id) if latest_id is not None else None), count or 0
+
 async def get_usage_log_by_id(user: User, log_id: str):
     async with async_session_maker() as session:
         result = await session.execute(
             select(UsageLog).where(UsageLog.user_id == user.id, UsageLog.id == log_id)
         )
         return result.scalar_one_or_none()
+
+
+async def rebuild_daily_rollups(day: date) -> int:
+    """Recompute every rollup for `day` from the raw usage logs.
+
+    This is the periodic compaction/repair path; it only scans the logs of a
+    single day. Returns the number of rollup rows written.
+    """
+    start_of_day = datetime.combine(day, datetime.min.time())
+    end_of_day = start_of_day + timedelta(days=1)
+
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(UsageLog).where(
+                UsageLog.user_id.is_not(None),
+                UsageLog.timestamp >= start_of_day,
+                UsageLog.timestamp < end_of_day,
+            )
+        )
+        rollups: Dict = {}
+        for usage_log in result.scalars():
+            if usage_log.user_id not in rollups:
+                rollups[usage_log.user_id] = _new_rollup(usage_log.user_id, day)
+            _add_to_rollup(rollups[usage_log.user_id], usage_log)
+
+        await session.execute(delete(UsageDailyRollup).where(UsageDailyRollup.day == day))
+        session.add_all(rollups.values())
+        await session.commit()
+        return len(rollups)
+
+
+def _percentile_from_histogram(histogram: List[int], max_ms: int, percentile: float) -> Optional[int]:
+    total = sum(histogram)
+    if total == 0:
+        return None
+    rank = math.ceil(total * percentile)
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= rank:
+            if index < len(DURATION_BUCKETS_MS):
+                return min(DURATION_BUCKETS_MS[index], max_ms)
+            return max_ms
+    return max_ms
+
+
+def _summarize_rollups(rollups: Iterable[UsageDailyRollup]) -> dict:
+    """Merge one or more rollups into the stats shape exposed by the API."""
+    analysis_count = premium_count = duration_sum_ms = duration_max_ms = 0
+    duration_histogram = [0] * (len(DURATION_BUCKETS_MS) + 1)
+    score_histogram = [0] * SCORE_BUCKETS
+    level_counts = {level: 0 for level in RISK_LEVELS}
+
+    for rollup in rollups:
+        analysis_count += rollup.analysis_count
+        premium_count += rollup.premium_count
+        duration_sum_ms += rollup.duration_sum_ms
+        duration_max_ms = max(duration_max_ms, rollup.duration_max_ms)
+        duration_histogram = [a + b for a, b in zip(duration_histogram, rollup.duration_histogram)]
+        score_histogram = [a + b for a, b in zip(score_histogram, rollup.score_histogram)]
+        for level, count in rollup.level_counts.items():
+            level_counts[level] = level_counts.get(level, 0) + count
+
+    score_labels = [f"{i * 10}-{i * 10 + 9}" for i in range(SCORE_BUCKETS - 1)] + [f"{(SCORE_BUCKETS - 1) * 10}-100"]
+    return {
+        "analysis_count": analysis_count,
+        "mean_duration_ms": round(duration_sum_ms / analysis_count, 1) if analysis_count else None,
+        "p95_duration_ms": _percentile_from_histogram(duration_histogram, duration_max_ms, 0.95),
+        "score_distribution": dict(zip(score_labels, score_histogram)),
+        "level_distribution": level_counts,
+        "premium_features_used": premium_count,
+    }
+
+
+async def get_usage_stats(user: User, days: int = 30) -> dict:
+    """Return usage statistics for the last `days` days, read from rollups only."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(UsageDailyRollup)
+            .where(UsageDailyRollup.user_id == user.id, UsageDailyRollup.day >= since)
+            .order_by(UsageDailyRollup.day.desc())
+        )
+        rollups = result.scalars().all()
+
+    return {
+        "since": since,
+        "totals": _summarize_rollups(rollups),
+        "daily": [{"day": rollup.day, **_summarize_rollups([rollup])} for rollup in rollups],
+    }
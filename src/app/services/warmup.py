@@ -0,0 +1,132 @@
+# src/app/services/warmup.py
+"""Warm-up of the expensive components, and per-component readiness.
+
+`preload()` does the work whose result can be shared copy-on-write by forked
+workers: it compiles the rules, loads reportlab and renders a throwaway PDF,
+checks the Tesseract binary and tessdata, and imports the LLM SDK.
+`warm_worker()` then does what has to be done in each worker: opening the
+database pool and creating the LLM client (sockets and connection pools must
+not cross a fork). `/ready` reports `readiness()`.
+"""
+import asyncio
+import io
+import os
+import time
+from typing import Any, Callable, Dict, Tuple
+
+OCR_LANGUAGES = [language for language in os.getenv("OCR_LANGUAGES", "eng").split("+") if language]
+
+PENDING, OK, FAILED, SKIPPED = "pending", "ok", "failed", "skipped"
+
+
+class Warmup:
+    components = ("rules", "pdf", "ocr", "llm_client", "database")
+
+    def __init__(self):
+        self.state: Dict[str, Dict[str, Any]] = {name: {"status": PENDING} for name in self.components}
+        self.preloaded = False
+
+    def _run(self, name: str, fn: Callable[[], Tuple[str, Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            status, detail = fn()
+        except Exception as e:
+            status, detail = FAILED, f"{type(e).__name__}: {e}"
+        self.state[name] = {"status": status, "detail": detail, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    def preload(self) -> None:
+        """Warm the fork-safe components; idempotent."""
+        if self.preloaded:
+            return
+        self._run("rules", _compile_rules)
+        self._run("pdf", _render_pdf)
+        self._run("ocr", _check_tesseract)
+        self._run("llm_client", _import_llm_sdk)
+        self.preloaded = True
+
+    async def warm_worker(self) -> None:
+        """Warm the per-process components (running `preload` first if it has not run)."""
+        if not self.preloaded:
+            await asyncio.to_thread(self.preload)
+        started = time.perf_counter()
+        try:
+            detail = await _open_database()
+            self.state["database"] = {"status": OK, "detail": detail}
+        except Exception as e:
+            self.state["database"] = {"status": FAILED, "detail": f"{type(e).__name__}: {e}"}
+        self.state["database"]["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if self.state["llm_client"]["status"] != FAILED:
+            self._run("llm_client", _create_llm_client)
+
+    def readiness(self) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
+        """Ready once every component is warm; a skipped component (e.g. no LLM key) does not block."""
+        ready = all(component["status"] in (OK, SKIPPED) for component in self.state.values())
+        return ready, self.state
+
+
+def _compile_rules() -> Tuple[str, Any]:
+    from src.app.services.rules_engine import rules_engine
+
+    compiled = len(rules_engine.compile())
+    if compiled < len(rules_engine.rules):
+        return FAILED, f"{len(rules_engine.rules) - compiled} of {len(rules_engine.rules)} rules have invalid patterns"
+    return OK, f"{compiled} rules compiled"
+
+
+def _render_pdf() -> Tuple[str, Any]:
+    from PIL import Image
+    from src.app.services.pdf_service import PDFService
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (255, 255, 255)).save(buffer, format="PNG")
+    pdf_bytes, _ = PDFService(buffer.getvalue(), {"text": "Warm-up", "score": 0, "level": "Low", "reasons": []}).generate_report()
+    return OK, f"{len(pdf_bytes)} byte test report rendered"
+
+
+def _check_tesseract() -> Tuple[str, Any]:
+    import pytesseract
+    from src.app.services.ocr_service import OCR_DETECT_SCRIPT, available_languages
+
+    version = str(pytesseract.get_tesseract_version())
+    # Cached here so forked workers do not each list the language packs again
+    languages = available_languages() or frozenset()
+    missing = [language for language in OCR_LANGUAGES if language not in languages]
+    if missing:
+        return FAILED, f"tesseract {version} is missing tessdata for {', '.join(missing)}"
+    if OCR_DETECT_SCRIPT and "osd" not in languages:
+        return OK, f"tesseract {version} ({', '.join(OCR_LANGUAGES)}; no osd tessdata, script detection off)"
+    return OK, f"tesseract {version} ({', '.join(OCR_LANGUAGES)})"
+
+
+def _import_llm_sdk() -> Tuple[str, Any]:
+    from src.app.services.gpt_service import get_llm_backend
+
+    backend = get_llm_backend()
+    if backend.name == "openai":
+        import openai  # noqa: F401  (the slowest import of the app; share it across workers)
+    return PENDING, f"{backend.name} backend"
+
+
+def _create_llm_client() -> Tuple[str, Any]:
+    from src.app.services.gpt_service import LLMNotConfiguredError, get_llm_backend
+
+    backend = get_llm_backend()
+    if backend.name != "openai":
+        return OK, f"{backend.name} backend"
+    try:
+        backend.client_factory()
+    except LLMNotConfiguredError:
+        return SKIPPED, "no API key configured; analyses fall back to rules only"
+    return OK, f"client for {backend.model} created"
+
+
+async def _open_database() -> str:
+    from sqlalchemy import text
+    from src.app.db.database import engine
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    return f"{engine.url.drivername} pool open"
+
+# Singleton instance
+warmup = Warmup()
@@ -0,0 +1,4 @@
+import os
+
+# The JWT strategy reads SECRET_KEY on use; give the suite a throwaway one.
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
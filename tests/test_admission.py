@@ -0,0 +1,225 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from src.app.routers.analysis import _admitted_batch
+from src.app.services.admission import AdmissionController, AdmissionRejected
+
+PREMIUM = SimpleNamespace(is_premium=True)
+FREE = SimpleNamespace(is_premium=False)
+
+
+def _controller(capacity=1, **overrides):
+    settings = {
+        "weights": {"premium": 6, "free": 3, "anonymous": 1},
+        "queue_limits": {"premium": 100, "free": 100, "anonymous": 100},
+        "wait_budgets": {"premium": 60, "free": 60, "anonymous": 60},
+        "initial_service_seconds": 0.01,
+    }
+    settings.update(overrides)
+    return AdmissionController(capacity=capacity, **settings)
+
+
+class TestLanes:
+    def test_lane_follows_subscription(self):
+        controller = _controller()
+        assert controller.lane_for(None) == "anonymous"
+        assert controller.lane_for(FREE) == "free"
+        assert controller.lane_for(PREMIUM) == "premium"
+
+    def test_runs_immediately_below_capacity(self):
+        controller = _controller(capacity=2)
+
+        async def scenario():
+            async with controller.admit(None) as lane:
+                assert controller.stats()["running"] == 1
+                return lane
+
+        assert asyncio.run(scenario()) == "anonymous"
+        assert controller.stats()["running"] == 0
+
+    def test_freed_slots_are_shared_by_weight(self):
+        controller = _controller()
+        order = []
+
+        async def job(user, name):
+            async with controller.admit(user):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        async def scenario():
+            async with controller.admit(None):
+                tasks = [asyncio.create_task(job(PREMIUM, "premium")) for _ in range(6)]
+                tasks += [asyncio.create_task(job(FREE, "free")) for _ in range(3)]
+                tasks += [asyncio.create_task(job(None, "anonymous"))]
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+        # Premium gets most slots, but the lower lanes are served within the first round
+        assert order.count("premium") == 6
+        assert order[0] == "premium"
+        assert "free" in order[:4]
+        assert "anonymous" in order
+        assert controller.stats()["running"] == 0
+
+
+class TestShedding:
+    def test_full_queue_is_shed_with_retry_after(self):
+        controller = _controller(queue_limits={"premium": 100, "free": 100, "anonymous": 1})
+
+        async def scenario():
+            async with controller.admit(None):
+                waiter = asyncio.create_task(controller.admit(None).__aenter__())
+                await asyncio.sleep(0)
+                with pytest.raises(AdmissionRejected) as e:
+                    await controller._acquire("anonymous")
+                waiter.cancel()
+                await asyncio.gather(waiter, return_exceptions=True)
+                return e.value
+
+        rejected = asyncio.run(scenario())
+        assert rejected.lane == "anonymous"
+        assert rejected.retry_after >= 1
+        assert controller.shed["anonymous"] == 1
+        assert controller.stats()["running"] == 0
+
+    def test_projected_wait_over_budget_sheds_lower_lane_only(self):
+        controller = _controller(
+            wait_budgets={"premium": 60, "free": 60, "anonymous": 1},
+            initial_service_seconds=5,
+        )
+
+        async def scenario():
+            async with controller.admit(PREMIUM):
+                with pytest.raises(AdmissionRejected):
+                    async with controller.admit(None):
+                        pass
+                # The premium lane still queues
+                waiter = asyncio.create_task(controller._acquire("premium"))
+                await asyncio.sleep(0)
+                assert controller.stats()["queued"]["premium"] == 1
+            await waiter
+            controller._release()
+
+        asyncio.run(scenario())
+        assert controller.shed == {"anonymous": 1}
+        assert controller.stats()["running"] == 0
+
+    def test_waiter_is_shed_when_budget_runs_out(self):
+        controller = _controller(wait_budgets={"premium": 60, "free": 60, "anonymous": 0.05})
+
+        async def scenario():
+            async with controller.admit(PREMIUM):
+                with pytest.raises(AdmissionRejected):
+                    async with controller.admit(None):
+                        pass
+                assert controller.queued == 0
+
+        asyncio.run(scenario())
+        assert controller.stats()["running"] == 0
+
+    def test_cancelled_waiter_does_not_leak_a_slot(self):
+        controller = _controller()
+
+        async def scenario():
+            async with controller.admit(FREE):
+                waiter = asyncio.create_task(controller._acquire("free"))
+                await asyncio.sleep(0)
+                waiter.cancel()
+                await asyncio.gather(waiter, return_exceptions=True)
+            async with controller.admit(FREE):
+                assert controller.stats()["running"] == 1
+
+        asyncio.run(scenario())
+        assert controller.stats()["running"] == 0
+        assert controller.queued == 0
+
+
+def test_overloaded_endpoint_returns_503_with_retry_after():
+    client = TestClient(app)
+    with patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+         patch('src.app.routers.analysis.admission_controller.admit', side_effect=AdmissionRejected("anonymous", 7)):
+        response = client.post("/api/v1/analyze/text", json={"text": "Our bottles are 100% eco-friendly."})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+    assert response.json()["detail"]["code"] == "OVERLOADED"
+
+
+class TestBatches:
+    def test_batch_takes_only_free_slots(self):
+        controller = _controller(capacity=3)
+
+        async def scenario():
+            async with controller.admit_batch(FREE, 5) as slots:
+                assert controller.stats()["running"] == 3
+                return slots
+
+        assert asyncio.run(scenario()) == 3
+        assert controller.stats()["running"] == 0
+
+    def test_batch_larger_than_the_queue_limit_is_not_shed_by_itself(self):
+        controller = _controller(queue_limits={"premium": 100, "free": 100, "anonymous": 1})
+
+        async def scenario():
+            async with controller.admit(PREMIUM):
+                batch = asyncio.create_task(controller.admit_batch(None, 30).__aenter__())
+                await asyncio.sleep(0)
+            return await batch
+
+        assert asyncio.run(scenario()) == 1
+        assert controller.shed == {}
+
+
+def test_shed_batch_runs_none_of_its_texts():
+    client = TestClient(app)
+    with patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+         patch('src.app.routers.analysis.admission_controller.admit_batch', side_effect=AdmissionRejected("anonymous", 3)), \
+         patch('src.app.routers.analysis.analysis_service.analyze_text_async') as mock_analyze, \
+         patch('src.app.services.usage_service.log_analyses') as mock_log:
+        response = client.post("/api/v1/analyze/text/batch", json={"texts": ["Eco-friendly."] * 30})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    mock_analyze.assert_not_called()
+    mock_log.assert_not_called()
+
+
+def test_batch_runs_its_texts_on_the_slots_it_holds():
+    running, peak = [0], [0]
+
+    async def analyze(text):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {"text": text}
+
+    with patch('src.app.routers.analysis.admission_controller', _controller(capacity=2)):
+        results = asyncio.run(_admitted_batch(None, [lambda i=i: analyze(str(i)) for i in range(5)]))
+
+    assert results == [{"text": str(i)} for i in range(5)]
+    assert peak[0] == 2
+
+
+def test_failing_batch_item_stops_the_rest():
+    controller = _controller(capacity=2)
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(1)
+        finished.append("slow")
+
+    async def failing():
+        raise ValueError("bad item")
+
+    with patch('src.app.routers.analysis.admission_controller', controller), pytest.raises(ValueError):
+        asyncio.run(_admitted_batch(None, [slow, failing, slow]))
+
+    assert finished == []
+    assert controller.stats()["running"] == 0
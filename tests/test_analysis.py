@@ -3,6 +3,7 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch
 from src.app.main import app
 from src.app.schemas.analysis import AnalysisResponse, RuleMatch, GPTAnalysis
+from src.app.services.gpt_service import _skipped_result
 
 @pytest.fixture
 def client():
@@ -74,3 +75,41 @@ def test_analyze_image_endpoint_empty_file(client):
     response = client.post("/api/v1/analyze", files={"file": dummy_file})
     assert response.status_code == 400
     assert "Uploaded file is empty." in response.json()["detail"]
+
+def test_analyze_text_endpoint_skips_ocr(client):
+    """Text input goes straight into the pipeline and is logged as text."""
+    with patch('src.app.services.analysis_service.extract_text_from_image') as mock_ocr, \
+         patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()), \
+         patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+         patch('src.app.services.usage_service.log_analysis') as mock_log:
+        response = client.post("/api/v1/analyze/text", json={"text": "Our bottles are 100% eco-friendly."})
+
+    assert response.status_code == 200
+    assert response.json()["rule_matches"]
+    mock_ocr.assert_not_called()
+    assert mock_log.call_args.kwargs["input_type"] == "text"
+
+def test_analyze_text_batch_endpoint(client):
+    texts = ["Our bottles are 100% eco-friendly.", "Fresh bread daily."]
+    with patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()), \
+         patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+         patch('src.app.services.usage_service.log_analyses') as mock_log:
+        response = client.post("/api/v1/analyze/text/batch", json={"texts": texts})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 2
+    assert results[0]["score"] > results[1]["score"]
+    assert len(mock_log.call_args.kwargs["entries"]) == 2
+
+def test_analyze_text_batch_endpoint_over_quota(client):
+    with patch('src.app.services.usage_service.get_remaining_analyses', return_value=1), \
+         patch('src.app.services.usage_service.get_usage_summary', return_value={}):
+        response = client.post("/api/v1/analyze/text/batch", json={"texts": ["a claim", "another claim"]})
+
+    assert response.status_code == 429
+    assert response.json()["detail"]["code"] == "USAGE_LIMIT_EXCEEDED"
+
+def test_analyze_text_endpoint_rejects_empty_text(client):
+    response = client.post("/api/v1/analyze/text", json={"text": ""})
+    assert response.status_code == 422
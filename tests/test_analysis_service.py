@@ -5,7 +5,7 @@ from src.app.services.rules_engine import rules_engine
 
 class TestAnalysisService(unittest.TestCase):
 
-    @patch('src.app.services.analysis_service.analyze_text_with_gpt')
+    @patch('src.app.services.analysis_service.analyze_claims_with_gpt')
     @patch('src.app.services.analysis_service.extract_text_from_image')
     def test_analysis_pipeline(self, mock_extract_text, mock_analyze_gpt):
         # 1. Setup - Configure mocks
@@ -31,8 +31,8 @@ class TestAnalysisService(unittest.TestCase):
         self.assertIsNotNone(result)
 
         # Check that our mocks were called
-        mock_extract_text.assert_called_once_with(image_bytes)
-        mock_analyze_gpt.assert_called_once_with("This is a test claim about being eco-friendly")
+        mock_extract_text.assert_called_once_with(image_bytes, ())
+        mock_analyze_gpt.assert_called_once_with(["This is a test claim about being eco-friendly"], None)
 
         # Check the aggregated score and level.
         # Rule score: "eco-friendly" is in rule_001, let's say that gives a score of 10.
@@ -49,6 +49,27 @@ class TestAnalysisService(unittest.TestCase):
         # Check that reasons and recommendations are combined
         self.assertIn("Misleading Terminology", result["reasons"])
         self.assertIn("Avoid absolute terms. Quantify the environmental benefit (e.g., 'made with 50% recycled materials').", result["recommendations"])
+    @patch('src.app.services.analysis_service.analyze_claims_with_gpt')
+    @patch('src.app.services.analysis_service.extract_text_from_image')
+    def test_claim_findings_map_back_to_extracted_claims(self, mock_extract_text, mock_analyze_gpt):
+        mock_extract_text.return_value = "Terms and conditions apply. Our range is eco-friendly. Sustainable packaging"
+        mock_analyze_gpt.return_value = {
+            "risk_score": 70, "level": "Medium", "reasons": [], "subtle_triggers": [], "recommendations": [],
+            "claims": [
+                {"index": 0, "risk_score": 80, "level": "High", "subtle_triggers": ["vague"], "reasons": ["Absolute"]},
+                {"index": 1, "risk_score": 40, "level": "Medium", "subtle_triggers": [], "reasons": []},
+            ],
+        }
+
+        result = AnalysisService(rules_engine).analyze_image(b"image")
+
+        mock_analyze_gpt.assert_called_once_with(["Our range is eco-friendly", "Sustainable packaging"], None)
+        findings = {finding["index"]: finding for finding in result["claims"]}
+        self.assertEqual(sorted(findings), [1, 2])
+        self.assertEqual(findings[1]["text"], "Our range is eco-friendly")
+        self.assertEqual(findings[1]["risk_score"], 80)
+        self.assertEqual(findings[1]["rule_ids"], ["rule_001"])
+        self.assertEqual(findings[2]["rule_ids"], ["rule_002"])
 
 if __name__ == "__main__":
     unittest.main()
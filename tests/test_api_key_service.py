@@ -0,0 +1,140 @@
+import asyncio
+import multiprocessing
+import os
+import uuid
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.app.db.database import Base
+from src.app.models.user import User
+from src.app.services import api_key_service as api_key_module
+from src.app.services import usage_service
+from src.app.services.api_key_service import ApiKeyService
+
+
+@pytest.fixture
+def session_maker(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'api_keys.db'}")
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(setup())
+    monkeypatch.setattr(api_key_module, "async_session_maker", maker)
+    monkeypatch.setattr(usage_service, "async_session_maker", maker)
+    monkeypatch.setitem(os.environ, "API_KEY_HMAC_SECRET", "test-hmac-secret")
+    yield maker
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def user(session_maker):
+    user = User(id=uuid.uuid4(), email="ci@example.com", hashed_password="x", is_active=True, is_premium=True)
+
+    async def create():
+        async with session_maker() as session:
+            session.add(user)
+            await session.commit()
+
+    asyncio.run(create())
+    return user
+
+
+def test_created_key_validates_and_only_its_hash_is_stored(user):
+    service = ApiKeyService()
+
+    async def run():
+        api_key, record = await service.create_api_key(user, "CI")
+        return api_key, record, await service.validate_api_key(api_key)
+
+    api_key, record, verified = asyncio.run(run())
+
+    assert api_key.startswith("sk_")
+    assert record.prefix == api_key[:11]
+    assert api_key not in record.key_hash
+    assert verified.id == record.id
+    assert verified.user.id == user.id
+
+
+def test_unknown_and_malformed_keys_are_rejected(user):
+    service = ApiKeyService()
+
+    async def run():
+        api_key, _ = await service.create_api_key(user, "CI")
+        tampered = api_key[:-1] + ("A" if api_key[-1] != "A" else "B")
+        return await service.validate_api_key(tampered), await service.validate_api_key("not-a-key")
+
+    assert asyncio.run(run()) == (None, None)
+
+
+def test_verified_keys_are_served_from_cache_until_revoked(user):
+    service = ApiKeyService()
+
+    async def run():
+        api_key, record = await service.create_api_key(user, "CI")
+        await service.validate_api_key(api_key)
+        with patch.object(api_key_module, "async_session_maker", side_effect=AssertionError("DB hit")):
+            cached = await service.validate_api_key(api_key)
+        await service.revoke_api_key(user, record.id)
+        return cached, await service.validate_api_key(api_key)
+
+    cached, after_revoke = asyncio.run(run())
+
+    assert cached is not None
+    assert after_revoke is None
+
+
+def _revoke_in_other_worker():
+    ApiKeyService()._note_revocation()
+
+
+def test_revocation_in_another_worker_applies_immediately(user):
+    service, other_worker = ApiKeyService(), ApiKeyService()
+
+    async def run():
+        api_key, record = await service.create_api_key(user, "CI")
+        await service.validate_api_key(api_key)
+        await other_worker.revoke_api_key(user, record.id)
+        return await service.validate_api_key(api_key)
+
+    assert asyncio.run(run()) is None
+
+
+def test_forked_workers_share_the_revocation_generation(user):
+    service = ApiKeyService()
+
+    async def validate(api_key):
+        return await service.validate_api_key(api_key)
+
+    api_key, _ = asyncio.run(service.create_api_key(user, "CI"))
+    asyncio.run(validate(api_key))
+    process = multiprocessing.get_context("fork").Process(target=_revoke_in_other_worker)
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+
+    # The key is still valid, but the cached verification is no longer trusted
+    with patch.object(api_key_module, "async_session_maker", side_effect=AssertionError("DB hit")), \
+         pytest.raises(AssertionError, match="DB hit"):
+        asyncio.run(validate(api_key))
+
+
+def test_per_key_daily_quota_is_enforced(user):
+    service = ApiKeyService()
+
+    async def run():
+        api_key, _ = await service.create_api_key(user, "CI", daily_quota=2)
+        verified = await service.validate_api_key(api_key)
+        allowed = []
+        for _ in range(3):
+            allowed.append(await usage_service.can_perform_analysis(user=user, ip_address="10.0.0.1", api_key=verified))
+            await usage_service.log_analysis(
+                input_type="image", result_json={}, duration_ms=10, user=user, ip_address="10.0.0.1", api_key=verified
+            )
+        return allowed
+
+    assert asyncio.run(run()) == [True, True, False]
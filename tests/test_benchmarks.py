@@ -0,0 +1,96 @@
+import asyncio
+import json
+import re
+import time
+
+import pytest
+from unittest.mock import patch
+
+from benchmarks.corpus import generate_ad_copy, generate_rule_catalog
+from benchmarks.loadtest import LoopLagMonitor, _images, _install_simulations, parse_latency, summarize
+from benchmarks.run import BASELINE_PATH, compare, measure
+
+
+class TestCorpus:
+    def test_ad_copy_is_deterministic_and_sized(self):
+        text = generate_ad_copy(40, 0.5, seed=3)
+        assert text == generate_ad_copy(40, 0.5, seed=3)
+        assert len([sentence for sentence in text.split(".") if sentence.strip()]) == 40
+
+    def test_rule_catalog_has_unique_valid_patterns(self):
+        catalog = generate_rule_catalog(500)
+        assert len({rule["pattern"] for rule in catalog}) == 500
+        for rule in catalog:
+            re.compile(rule["pattern"])
+
+
+class TestRegressionCheck:
+    def test_only_slowdowns_beyond_threshold_are_reported(self):
+        baseline = {"results": {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}}}
+        current = {"results": {"a": {"median_ms": 12.0}, "b": {"median_ms": 14.0}, "new": {"median_ms": 1.0}}}
+
+        regressions = compare(current, baseline, threshold=0.25)
+
+        assert [regression["case"] for regression in regressions] == ["b"]
+        assert regressions[0]["ratio"] == 1.4
+
+    def test_measure_reports_stats(self):
+        stats = measure(lambda: sum(range(100)), min_time=0.01, min_runs=5)
+        assert stats["runs"] >= 5
+        assert stats["min_ms"] <= stats["median_ms"] <= stats["p95_ms"]
+
+    def test_stored_baseline_is_readable(self):
+        baseline = json.loads(BASELINE_PATH.read_text())
+        assert any(name.startswith("rules_apply[rules=10000") for name in baseline["results"])
+
+
+class TestLoadTestHelpers:
+    def test_latency_specs(self):
+        assert parse_latency("fixed:250")() == 250
+        assert 10 <= parse_latency("uniform:10:20", seed=1)() <= 20
+        sampler = parse_latency("lognormal:100:0.5", seed=1)
+        samples = sorted(sampler() for _ in range(2001))
+        assert 80 < samples[1000] < 125
+        with pytest.raises(ValueError):
+            parse_latency("gaussian:100")
+
+    def test_summary_reports_percentiles_and_errors(self):
+        stats = summarize([float(ms) for ms in range(1, 101)], errors=5, elapsed=2.0, lag_ms=[0.5, 1.0, 30.0])
+        assert stats["rps"] == 50.0
+        assert stats["p50_ms"] == 51.0
+        assert stats["p99_ms"] == 100.0
+        assert stats["error_rate"] == 0.05
+        assert stats["loop_lag_max_ms"] == 30.0
+
+    def test_loop_lag_monitor_sees_blocking_calls(self):
+        async def scenario():
+            monitor = LoopLagMonitor(interval=0.005)
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)  # blocks the loop
+            await asyncio.sleep(0.02)
+            monitor.stop()
+            await task
+            return monitor.samples_ms
+
+        assert max(asyncio.run(scenario())) >= 80
+
+
+def test_simulated_request_goes_through_the_app():
+    from fastapi.testclient import TestClient
+
+    from src.app.main import app
+    from src.app.services import analysis_service, gpt_service
+
+    backend = gpt_service.get_llm_backend()
+    try:
+        with patch.object(analysis_service, "extract_text_from_image", analysis_service.extract_text_from_image), \
+             patch("src.app.services.usage_service.get_remaining_analyses", return_value=None), \
+             patch("src.app.services.usage_service.log_analysis"):
+            _install_simulations(parse_latency("fixed:0"), parse_latency("fixed:0"))
+            response = TestClient(app).post("/api/v1/analyze", files={"file": ("ad.png", _images(1)[0], "image/png")})
+    finally:
+        gpt_service.set_llm_backend(backend)
+
+    assert response.status_code == 200
+    assert response.json()["claims"]
@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import patch
+
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.claim_filter import ClaimFilter, estimate_tokens
+from src.app.services.rules_engine import rules_engine
+
+
+class TestClaimFilter(unittest.TestCase):
+    def setUp(self):
+        self.claim_filter = ClaimFilter(context=1)
+
+    def test_selects_environmental_claims_with_context_and_drops_boilerplate(self):
+        claims = [
+            "Summer sale on all sneakers",
+            "Our new range is made from recycled ocean plastic",
+            "Available in five colours",
+            "Prices from $49",
+            "Terms and conditions apply",
+            "Visit our store at 12 Main Street",
+        ]
+        selection = self.claim_filter.select(claims)
+
+        self.assertEqual(selection.indices, [0, 1, 2])
+        self.assertEqual(selection.claims, claims[:3])
+        self.assertEqual(selection.tokens_in, estimate_tokens(" ".join(claims)))
+        self.assertGreater(selection.tokens_saved, 0)
+        self.assertEqual(selection.to_dict()["claims_selected"], 3)
+
+    def test_noise_neighbours_are_not_added_as_context(self):
+        claims = ["Prices from $49", "Carbon neutral delivery", "All rights reserved"]
+        self.assertEqual(self.claim_filter.select(claims).indices, [1])
+
+    def test_rule_flagged_claims_are_selected_even_without_lexical_hits(self):
+        claims = ["Price list", "Feel-good formula", "Price list"]
+        self.assertEqual(ClaimFilter(context=0).select(claims).claims, [])
+        self.assertEqual(ClaimFilter(context=0).select(claims, rule_flagged=[1]).claims, ["Feel-good formula"])
+
+    def test_disabled_filter_keeps_everything(self):
+        claims = ["Prices from $49", "Terms and conditions apply"]
+        selection = ClaimFilter(enabled=False).select(claims)
+        self.assertEqual(selection.claims, claims)
+        self.assertEqual(selection.tokens_saved, 0)
+
+
+class TestAnalysisServiceClaimFilter(unittest.TestCase):
+    @patch('src.app.services.analysis_service.analyze_claims_with_gpt')
+    @patch('src.app.services.analysis_service.extract_text_from_image')
+    def test_only_relevant_claims_are_sent_to_gpt(self, mock_extract_text, mock_analyze_gpt):
+        mock_extract_text.return_value = (
+            "Spring collection. Our bottles are 100% recyclable. Free shipping over $50. "
+            "Terms and conditions apply. Offer valid until 31 May"
+        )
+        mock_analyze_gpt.return_value = {"risk_score": 20, "level": "Low", "reasons": [], "recommendations": []}
+
+        result = AnalysisService(rules_engine, ClaimFilter(context=1)).analyze_image(b"image")
+
+        mock_analyze_gpt.assert_called_once_with(["Spring collection", "Our bottles are 100% recyclable"], None)
+        self.assertEqual(result["claim_filter"]["claims_total"], 5)
+        self.assertEqual(result["claim_filter"]["claims_selected"], 2)
+        self.assertGreater(result["claim_filter"]["tokens_saved"], 0)
+
+    @patch('src.app.services.analysis_service.analyze_claims_with_gpt')
+    @patch('src.app.services.analysis_service.extract_text_from_image')
+    def test_gpt_is_skipped_when_no_environmental_claims(self, mock_extract_text, mock_analyze_gpt):
+        mock_extract_text.return_value = "Summer sale. Prices from $49. Terms and conditions apply"
+
+        result = AnalysisService(rules_engine, ClaimFilter()).analyze_image(b"image")
+
+        mock_analyze_gpt.assert_not_called()
+        self.assertEqual(result["gpt_analysis"]["risk_score"], 0)
+        self.assertIn("No environmental claims", result["gpt_analysis"]["reasons"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing
+import threading
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.claim_cache import ClaimCache
+from src.app.services.claim_index import ClaimIndex, claim_vector
+from src.app.services.rules_engine import rules_engine
+
+VERDICT = {"risk_score": 62, "level": "Medium", "subtle_triggers": ["vague"], "reasons": ["No evidence given."]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    claim_index = ClaimIndex(str(tmp_path / "claims.idx"), capacity=8, dimensions=256)
+    yield claim_index
+    claim_index.close()
+
+
+def _add_from_other_process(path):
+    ClaimIndex(path, capacity=8, dimensions=256).add([("carbon neutral delivery", VERDICT)], "scope")
+
+
+class TestClaimVectors:
+    def test_near_duplicates_are_close(self):
+        similarity = float(claim_vector("Made with recycled materials") @ claim_vector("made with recycled material"))
+        assert similarity > 0.9
+
+    def test_different_claims_are_not(self):
+        assert float(claim_vector("carbon neutral delivery") @ claim_vector("carbon neutral shipping")) < 0.9
+        assert float(claim_vector("Our bottles are eco-friendly") @ claim_vector("Our cans are eco-friendly")) < 0.9
+
+
+class TestClaimIndex:
+    def test_near_duplicate_reuses_the_stored_verdict(self, index):
+        assert index.add([("Made with recycled materials", VERDICT)], "scope") == 1
+        similar, unrelated = index.lookup(["made with recycled material", "Plastic-free packaging"], "scope")
+        assert similar["risk_score"] == 62
+        assert similar["similarity"] >= index.min_similarity
+        # The stored claim belongs to whoever sent it first and is never handed out
+        assert "Made with recycled materials" not in str(similar)
+        assert unrelated is None
+
+    def test_other_scopes_do_not_match(self, index):
+        index.add([("Made with recycled materials", VERDICT)], "scope")
+        assert index.lookup(["Made with recycled materials"], "other-profile") == [None]
+
+    def test_file_is_shared_with_other_processes(self, index):
+        index.add([("Made with recycled materials", VERDICT)], "scope")
+        process = multiprocessing.get_context("fork").Process(target=_add_from_other_process, args=(index.path,))
+        process.start()
+        process.join(10)
+        assert process.exitcode == 0
+        assert len(index) == 2
+        assert index.lookup(["Carbon neutral delivery"], "scope")[0]["risk_score"] == 62
+
+    def test_oldest_rows_are_overwritten_when_full(self, index):
+        claims = [f"claim number {word}" for word in "one two three four five six seven eight nine ten".split()]
+        index.add([(claim, VERDICT) for claim in claims], "scope")
+        assert len(index) == 8
+        assert index.lookup([claims[0]], "scope") == [None]
+        assert index.lookup([claims[-1]], "scope")[0] is not None
+
+    def test_changed_layout_starts_a_new_index(self, index):
+        index.add([("Made with recycled materials", VERDICT)], "scope")
+        resized = ClaimIndex(index.path, capacity=16, dimensions=256)
+        assert len(resized) == 0
+        resized.close()
+
+    def test_disabled_without_a_path(self):
+        disabled = ClaimIndex("")
+        assert disabled.add([("Made with recycled materials", VERDICT)], "scope") == 0
+        assert disabled.lookup(["Made with recycled materials"], "scope") == [None]
+
+
+def _user(**profile):
+    return SimpleNamespace(id=uuid.uuid4(), is_premium=False, country=None, **{"sector": None, "company_size": None, "role": None, **profile})
+
+
+def _fake_gpt(claims, user=None):
+    return {
+        "risk_score": 70, "level": "Medium", "reasons": ["document"], "subtle_triggers": [], "recommendations": ["rec"],
+        "claims": [{**VERDICT, "index": i} for i in range(len(claims))],
+        "token_usage": {"prompt_tokens": 1, "completion_tokens": 1, "cached_tokens": 0},
+    }
+
+
+class TestVerdictReuse:
+    def test_near_duplicate_claims_skip_gpt(self, index):
+        service = AnalysisService(rules_engine, claim_cache=ClaimCache(), claim_index=index)
+        user = _user()
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            first = service.analyze_text("Our bottles are eco-friendly", user)
+            second = service.analyze_text("Our bottles are ECO-FRIENDLY. Made with recycled packaging", user)
+
+        # The first document got GPT's own verdict; the second only sent its new claim
+        assert first["gpt_analysis"]["risk_score"] == 70
+        assert mock_gpt.call_args.args[0] == ["Made with recycled packaging"]
+        reused = next(claim for claim in second["claims"] if claim["index"] == 0)
+        assert reused["similarity"] >= index.min_similarity
+        assert reused["risk_score"] == 62
+        assert second["gpt_analysis"]["risk_score"] == 62
+        # Only the new claim's call contributes recommendations
+        assert second["gpt_analysis"]["recommendations"] == ["rec"]
+
+    def test_all_claims_reused_needs_no_gpt_call(self, index):
+        service = AnalysisService(rules_engine, claim_cache=ClaimCache(), claim_index=index)
+        user = _user()
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            service.analyze_text("Our bottles are eco-friendly", user)
+            result = service.analyze_text("Our bottles are all eco-friendly", user)
+        assert mock_gpt.call_count == 1
+        assert not result["gpt_skipped"]
+        assert result["claims"][0]["similarity"] >= index.min_similarity
+        assert result["gpt_analysis"]["recommendations"] == []
+
+    def test_users_with_the_same_profile_do_not_share_verdicts(self, index):
+        service = AnalysisService(rules_engine, claim_cache=ClaimCache(), claim_index=index)
+        first, second = _user(sector="Retail"), _user(sector="Retail")
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            service.analyze_text("Our bottles are eco-friendly", first)
+            result = service.analyze_text("Our bottles are all eco-friendly", second)
+        assert mock_gpt.call_count == 2
+        assert mock_gpt.call_args.args[0] == ["Our bottles are all eco-friendly"]
+        assert result["claims"][0]["similarity"] is None
+
+    def test_anonymous_callers_neither_store_nor_reuse(self, index):
+        service = AnalysisService(rules_engine, claim_cache=ClaimCache(), claim_index=index)
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            service.analyze_text("Our bottles are eco-friendly")
+            service.analyze_text("Our bottles are all eco-friendly")
+        assert mock_gpt.call_count == 2
+        assert len(index) == 0
+
+    def test_accounts_with_the_same_profile_do_not_share_results(self, index):
+        service = AnalysisService(rules_engine, claim_cache=ClaimCache(), claim_index=index)
+        first, second = _user(sector="Retail"), _user(sector="Retail")
+        assert service.content_key(b"creative", first) != service.content_key(b"creative", second)
+        assert service.text_content_key("copy", first) != service.text_content_key("copy", second)
+        # Without the index, results only depend on the profile and stay shared
+        shared = AnalysisService(rules_engine, claim_cache=ClaimCache(), claim_index=ClaimIndex(""))
+        assert shared.content_key(b"creative", first) == shared.content_key(b"creative", second)
+
+        release = threading.Event()
+
+        def slow_gpt(claims, user=None):
+            release.wait(timeout=5)
+            return _fake_gpt(claims, user)
+
+        async def run():
+            pending = [
+                asyncio.ensure_future(service.analyze_text_async("Our bottles are eco-friendly", user))
+                for user in (first, second)
+            ]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*pending)
+
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=slow_gpt) as mock_gpt:
+            asyncio.run(run())
+        # Neither account joined the other's in-flight analysis
+        assert mock_gpt.call_count == 2
@@ -0,0 +1,23 @@
+import os
+
+from benchmarks.importtime import LAZY_MODULES, best_import_ms, timed_import
+
+# Wall-clock budget for `import src.app.main` in a fresh interpreter (best of 3).
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "1500"))
+
+
+def _env_without_secret():
+    return {key: value for key, value in os.environ.items() if key != "SECRET_KEY"}
+
+
+class TestColdStart:
+    def test_app_imports_without_secret_key_and_heavy_dependencies(self):
+        result = timed_import(_env_without_secret())
+        assert result["loaded"] == [], f"{result['loaded']} must be imported lazily (one of {LAZY_MODULES})"
+
+    def test_import_time_within_budget(self):
+        best_ms = best_import_ms(runs=3)
+        assert best_ms <= COLD_START_BUDGET_MS, (
+            f"import src.app.main took {best_ms:.0f} ms (budget {COLD_START_BUDGET_MS:.0f} ms); "
+            "run `python -m benchmarks.importtime` for the breakdown"
+        )
@@ -1,9 +1,20 @@
 import pytest
 import os
+import json
 from unittest.mock import patch, MagicMock
 import uuid
 from src.app.models.user import User
-from src.app.services.gpt_service import _get_client, analyze_text_with_gpt
+from src.app.services.gpt_service import (
+    SYSTEM_PROMPT,
+    _build_messages,
+    _build_profile_context,
+    _chunk_claims,
+    _get_client,
+    _profile_context,
+    analyze_claims_with_gpt,
+    analyze_text_with_gpt,
+    invalidate_prompt_cache,
+)
 
 
 class TestGetClient:
@@ -17,7 +28,7 @@ class TestGetClient:
                 _get_client()
             assert "OPENAI_API_KEY is not set" in str(exc_info.value)
     
-    @patch('src.app.services.gpt_service.OpenAI')
+    @patch('openai.OpenAI')
     def test_get_client_returns_openai_instance_when_api_key_present(self, mock_openai):
         mock_instance = MagicMock()
         mock_instance.api_key = "test-api-key-12345"
@@ -25,7 +36,7 @@ class TestGetClient:
 
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test-api-key-12345"}):
             client = _get_client()
-            mock_openai.assert_called_once_with(api_key="test-api-key-12345")
+            mock_openai.assert_called_once_with(api_key="test-api-key-12345", max_retries=0)
             assert client is mock_instance
 
 
@@ -71,3 +82,109 @@ class TestAnalyzeTextWithGPT:
         assert result["risk_score"] == 0
         assert result["level"] == "Low"
         assert "No text provided" in result["reasons"][0]
+
+
+class TestAnalyzeClaimsWithGPT:
+    """Test cases for analyze_claims_with_gpt() function."""
+
+    @staticmethod
+    def _response(payload):
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = json.dumps(payload)
+        return response
+
+    @patch('src.app.services.gpt_service._get_client')
+    def test_scores_all_claims_in_a_single_numbered_call(self, mock_get_client):
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.return_value = self._response({
+            "risk_score": 60, "level": "Medium", "reasons": ["Vague"], "subtle_triggers": ["jargon"],
+            "recommendations": ["Be specific"],
+            "claims": [
+                {"id": 1, "risk_score": 10, "level": "Low", "subtle_triggers": [], "reasons": []},
+                {"id": 2, "risk_score": 80, "level": "High", "subtle_triggers": ["jargon"], "reasons": ["No proof"]},
+                {"id": 7, "risk_score": 99, "level": "High"},
+            ],
+        })
+        mock_get_client.return_value = mock_client
+
+        result = analyze_claims_with_gpt(["Made in Italy", "Carbon neutral shipping"])
+
+        mock_client.chat.completions.create.assert_called_once()
+        user_message = mock_client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+        assert "[1] Made in Italy" in user_message
+        assert "[2] Carbon neutral shipping" in user_message
+        assert result["risk_score"] == 60
+        assert [claim["index"] for claim in result["claims"]] == [0, 1]
+        assert result["claims"][1]["reasons"] == ["No proof"]
+
+    @patch('src.app.services.gpt_service._get_client')
+    def test_long_claim_lists_are_chunked_and_merged(self, mock_get_client):
+        def create(**kwargs):
+            content = kwargs["messages"][1]["content"]
+            ids = [int(line[1:line.index("]")]) for line in content.splitlines() if line.startswith("[")]
+            return self._response({
+                "risk_score": 90 if 3 in ids else 20,
+                "level": "High" if 3 in ids else "Low",
+                "reasons": ["shared reason", f"chunk {ids[0]}"],
+                "claims": [{"id": i, "risk_score": i * 10} for i in ids],
+            })
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = create
+        mock_get_client.return_value = mock_client
+
+        claims = ["x" * 40, "y" * 40, "z" * 40, "w" * 40]
+        result = analyze_claims_with_gpt(claims, max_chunk_tokens=25)
+
+        assert mock_client.chat.completions.create.call_count == 2
+        assert result["risk_score"] == 90
+        assert result["level"] == "High"
+        assert result["reasons"] == ["shared reason", "chunk 1", "chunk 3"]
+        assert [claim["index"] for claim in result["claims"]] == [0, 1, 2, 3]
+        assert result["claims"][3]["level"] == "Medium"
+
+    def test_chunk_claims_respects_the_token_budget(self):
+        assert _chunk_claims(["a" * 40] * 5, max_tokens=30) == [[0, 1], [2, 3], [4]]
+        assert _chunk_claims(["a" * 400], max_tokens=30) == [[0]]
+
+
+class TestPromptLayout:
+    """Test cases for prompt assembly and caching."""
+
+    def test_system_message_is_a_shared_static_prefix(self):
+        marketing = User(id=uuid.uuid4(), email="a@example.com", sector="Cosmetics", role="Marketing lead")
+        legal = User(id=uuid.uuid4(), email="b@example.com", company_size="250+", role="Legal")
+
+        messages = [_build_messages(SYSTEM_PROMPT, user, "Analyze: text") for user in (None, marketing, legal)]
+
+        assert {m[0]["content"] for m in messages} == {SYSTEM_PROMPT}
+        assert messages[0][1]["content"] == "Analyze: text"
+        assert "Industry Sector: Cosmetics" in messages[1][1]["content"]
+        assert messages[1][1]["content"].endswith("Analyze: text")
+        assert "CSRD/CSDDD" in messages[2][1]["content"]
+
+    def test_profile_context_is_memoized_per_fingerprint_and_invalidated(self):
+        invalidate_prompt_cache()
+        first = User(id=uuid.uuid4(), email="a@example.com", sector="Retail", role="Legal")
+        second = User(id=uuid.uuid4(), email="b@example.com", sector="Retail", role="Legal")
+
+        assert _build_profile_context(first) is _build_profile_context(second)
+        assert _profile_context.cache_info().hits == 1
+
+        invalidate_prompt_cache()
+        assert _profile_context.cache_info().currsize == 0
+
+    @patch('src.app.services.gpt_service._get_client')
+    def test_token_usage_including_cached_tokens_is_recorded(self, mock_get_client):
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = '{"risk_score": 10, "claims": [{"id": 1, "risk_score": 10}]}'
+        mock_response.usage.prompt_tokens = 1500
+        mock_response.usage.completion_tokens = 120
+        mock_response.usage.prompt_tokens_details.cached_tokens = 1280
+        mock_get_client.return_value.chat.completions.create.return_value = mock_response
+
+        result = analyze_claims_with_gpt(["Carbon neutral shipping"])
+
+        assert result["token_usage"] == {"prompt_tokens": 1500, "completion_tokens": 120, "cached_tokens": 1280}
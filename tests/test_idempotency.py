@@ -0,0 +1,195 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.app.db.database import Base
+from src.app.main import app
+from src.app.services import idempotency
+from src.app.services.gpt_service import _skipped_result
+from src.app.models.idempotency import IdempotencyRecord
+from src.app.services.idempotency import IdempotencyMiddleware, IdempotencyService, request_hash, request_subject
+
+
+@pytest.fixture
+def session_maker(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'idempotency.db'}")
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(setup())
+    monkeypatch.setattr(idempotency, "async_session_maker", maker)
+    yield maker
+    asyncio.run(engine.dispose())
+
+
+def _work_app(service: IdempotencyService, delay: float = 0):
+    calls = []
+    work_app = FastAPI()
+    work_app.add_middleware(IdempotencyMiddleware, service=service, paths=["/work"])
+
+    @work_app.post("/work")
+    async def work(request: Request):
+        payload = await request.json()
+        calls.append(payload)
+        await asyncio.sleep(delay)
+        if payload.get("fail"):
+            raise HTTPException(status_code=503, detail="try again")
+        return {"call": len(calls), "id": str(uuid.uuid4())}
+
+    return work_app, calls
+
+
+class TestIdempotencyMiddleware:
+    def test_retry_replays_stored_response(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService())
+        client = TestClient(work_app)
+        first = client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+        retry = client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+
+        assert len(calls) == 1
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert "idempotent-replayed" not in first.headers
+
+    def test_requests_without_key_are_untouched(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService())
+        client = TestClient(work_app)
+        client.post("/work", json={"n": 1})
+        client.post("/work", json={"n": 1})
+        assert len(calls) == 2
+
+    def test_key_reused_for_other_request_is_rejected(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService())
+        client = TestClient(work_app)
+        client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+        response = client.post("/work", json={"n": 2}, headers={"Idempotency-Key": "abc"})
+
+        assert response.status_code == 422
+        assert response.json()["detail"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+        assert len(calls) == 1
+
+    def test_failed_request_is_not_stored(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService())
+        client = TestClient(work_app)
+        assert client.post("/work", json={"fail": True}, headers={"Idempotency-Key": "abc"}).status_code == 503
+        assert client.post("/work", json={"fail": True}, headers={"Idempotency-Key": "abc"}).status_code == 503
+        assert len(calls) == 2
+
+    def test_keys_are_scoped_to_the_caller(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService())
+        client = TestClient(work_app)
+        client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc", "X-API-Key": "sk_one"})
+        client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc", "X-API-Key": "sk_two"})
+        assert len(calls) == 2
+
+    def test_expired_record_is_reclaimed(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService(ttl_seconds=-1))
+        client = TestClient(work_app)
+        client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+        client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+        assert len(calls) == 2
+
+    def test_concurrent_duplicate_waits_for_the_original(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService(), delay=0.2)
+
+        async def run():
+            transport = httpx.ASGITransport(app=work_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                send = lambda: client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+                return await asyncio.gather(send(), send())
+
+        first, second = asyncio.run(run())
+        assert len(calls) == 1
+        assert first.json() == second.json()
+
+    def test_key_of_a_dead_worker_is_taken_over_once_its_lease_expires(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService(wait_seconds=5))
+        _orphan(session_maker, locked_until=datetime.utcnow() + timedelta(seconds=0.3))
+
+        response = TestClient(work_app).post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+
+        assert response.status_code == 200
+        assert len(calls) == 1
+
+    def test_live_lease_is_not_taken_over(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService(wait_seconds=0.3))
+        _orphan(session_maker, locked_until=datetime.utcnow() + timedelta(seconds=60))
+
+        response = TestClient(work_app).post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+
+        assert response.status_code == 409
+        assert calls == []
+
+    def test_running_request_renews_its_lease(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService(lease_seconds=0.3), delay=0.8)
+
+        async def run():
+            transport = httpx.ASGITransport(app=work_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                send = lambda: client.post("/work", json={"n": 1}, headers={"Idempotency-Key": "abc"})
+                first = asyncio.ensure_future(send())
+                await asyncio.sleep(0.05)
+                # A retry from another worker polls the database rather than waiting on the event
+                work_app.user_middleware[0].kwargs["service"]._finished.clear()
+                return await asyncio.gather(first, send())
+
+        first, second = asyncio.run(run())
+        assert len(calls) == 1
+        assert first.json() == second.json()
+
+    def test_overlong_key_is_rejected(self, session_maker):
+        work_app, calls = _work_app(IdempotencyService())
+        response = TestClient(work_app).post("/work", json={}, headers={"Idempotency-Key": "k" * 256})
+        assert response.status_code == 400
+        assert calls == []
+
+
+def _orphan(session_maker, locked_until):
+    """A pending record left by a worker that died while running the request."""
+    scope = {"method": "POST", "path": "/work", "query_string": b"", "client": ("testclient", 50000),
+             "headers": [(b"content-type", b"application/json")]}
+
+    async def insert():
+        async with session_maker() as session:
+            session.add(IdempotencyRecord(
+                subject=request_subject(scope), key="abc", request_hash=request_hash(scope, b'{"n": 1}'),
+                locked_until=locked_until, expires_at=datetime.utcnow() + timedelta(hours=24),
+            ))
+            await session.commit()
+
+    asyncio.run(insert())
+
+
+def test_request_hash_ignores_multipart_boundary():
+    def scope(boundary):
+        return {"method": "POST", "path": "/api/v1/analyze", "query_string": b"", "headers": [(b"content-type", b"multipart/form-data; boundary=" + boundary)]}
+
+    body = b'--%s\r\nContent-Disposition: form-data; name="file"; filename="ad.png"\r\n\r\nPNG\r\n--%s--\r\n'
+    assert request_hash(scope(b"aaa111"), body % (b"aaa111", b"aaa111")) == request_hash(scope(b"bbb222"), body % (b"bbb222", b"bbb222"))
+    assert request_hash(scope(b"aaa111"), body % (b"aaa111", b"aaa111")) != request_hash(scope(b"aaa111"), body.replace(b"PNG", b"GIF") % (b"aaa111", b"aaa111"))
+
+
+def test_retried_analysis_is_neither_recomputed_nor_charged(session_maker):
+    client = TestClient(app)
+    with patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()) as mock_gpt, \
+         patch('src.app.services.usage_service.get_remaining_analyses', return_value=None) as mock_quota, \
+         patch('src.app.services.usage_service.log_analysis') as mock_log:
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        first = client.post("/api/v1/analyze/text", json={"text": "Our bottles are eco-friendly."}, headers=headers)
+        retry = client.post("/api/v1/analyze/text", json={"text": "Our bottles are eco-friendly."}, headers=headers)
+
+    assert retry.json() == first.json()
+    assert mock_gpt.call_count == 1
+    assert mock_quota.call_count == 1
+    assert mock_log.call_count == 1
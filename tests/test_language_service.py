@@ -0,0 +1,56 @@
+from src.app.services import language_service
+from src.app.services.language_service import choose_languages, detect_language, language_hints
+
+
+class TestLanguageHints:
+    def test_country_names_and_codes(self):
+        assert language_hints("Germany") == ("deu",)
+        assert language_hints(" deutschland ") == ("deu",)
+        assert language_hints("BE") == ("nld", "fra", "deu")
+
+    def test_unknown_or_missing_country(self):
+        assert language_hints(None) == ()
+        assert language_hints("Atlantis") == ()
+
+    def test_hints_are_memoized(self):
+        language_hints.cache_clear()
+        language_hints("France")
+        language_hints("France")
+        assert language_hints.cache_info().hits == 1
+
+
+class TestChooseLanguages:
+    def test_hints_of_the_detected_script_are_kept(self):
+        assert choose_languages("Latin", ("ell", "eng")) == ("eng",)
+        assert choose_languages("Greek", ("ell", "eng")) == ("ell",)
+
+    def test_set_is_capped(self):
+        assert choose_languages("Latin", ("nld", "fra", "deu"), max_languages=2) == ("nld", "fra")
+
+    def test_script_default_without_matching_hint(self):
+        assert choose_languages("Cyrillic", ("deu",)) == ("rus",)
+        assert choose_languages("Latin", ()) == (language_service.DEFAULT_LANGUAGE,)
+
+    def test_unknown_script_uses_hints(self):
+        assert choose_languages(None, ("ell",)) == ("ell",)
+        assert choose_languages(None, ()) == (language_service.DEFAULT_LANGUAGE,)
+
+
+class TestDetectLanguage:
+    def test_function_words(self):
+        assert detect_language("Nos bouteilles sont recyclables et pour la planète") == "fra"
+        assert detect_language("Our bottles are made from recycled plastic") == "eng"
+        assert detect_language("Onze flessen zijn gemaakt van gerecycled plastic") == "nld"
+
+    def test_hints_break_ties_and_fill_gaps(self):
+        assert detect_language("de", ("spa",)) == "spa"
+        assert detect_language("Környezetbarát palackok", ("hun",)) == "hun"
+        assert detect_language("Környezetbarát palackok") == language_service.DEFAULT_LANGUAGE
+
+    def test_non_latin_scripts(self):
+        assert detect_language("Φιλικό προς το περιβάλλον") == "ell"
+        assert detect_language("Экологичная упаковка", ("bul",)) == "bul"
+
+    def test_text_without_letters(self):
+        assert detect_language("") is None
+        assert detect_language("100% 2024") is None
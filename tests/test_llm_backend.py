@@ -0,0 +1,81 @@
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.services import gpt_service
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.llm_backend import LLMConfig, OpenAICompatibleBackend, StubBackend, build_backend
+from src.app.services.llm_guard import CircuitBreaker, LLMGuard
+from src.app.services.llm_stub import start_stub_server
+from src.app.services.rules_engine import rules_engine
+
+
+@pytest.fixture
+def restore_backend():
+    yield
+    gpt_service.set_llm_backend(None)
+
+
+class TestBackendSelection:
+    def test_default_config_uses_openai_compatible_backend(self):
+        with patch.dict(os.environ, {}, clear=True):
+            backend = build_backend(LLMConfig(), MagicMock())
+        assert isinstance(backend, OpenAICompatibleBackend)
+        assert backend.model == "gpt-4o-mini"
+
+    def test_stub_backend_is_selected_by_config(self):
+        with patch.dict(os.environ, {"LLM_BACKEND": "stub", "LLM_STUB_LATENCY_MS": "5"}):
+            backend = build_backend(LLMConfig(), MagicMock())
+        assert isinstance(backend, StubBackend)
+        assert backend.latency_ms == 5
+
+    def test_unknown_backend_is_rejected(self):
+        with patch.dict(os.environ, {"LLM_BACKEND": "carrier-pigeon"}):
+            with pytest.raises(ValueError):
+                build_backend(LLMConfig(), MagicMock())
+
+    @patch('openai.OpenAI')
+    def test_client_targets_base_url_and_is_reused(self, mock_openai, restore_backend):
+        gpt_service.set_llm_backend(None)
+        env = {"LLM_API_KEY": "local-key", "LLM_BASE_URL": "http://inference.internal:8000/v1"}
+        with patch.dict(os.environ, env):
+            first = gpt_service._get_client()
+            second = gpt_service._get_client()
+        assert first is second
+        mock_openai.assert_called_once_with(api_key="local-key", max_retries=0, base_url="http://inference.internal:8000/v1")
+
+
+class TestOfflinePipeline:
+    @patch('src.app.services.analysis_service.extract_text_from_image')
+    def test_analysis_runs_against_in_process_stub(self, mock_extract_text, restore_backend):
+        mock_extract_text.return_value = "Our bottles are 100% carbon neutral. Order today."
+        gpt_service.set_llm_backend(StubBackend())
+
+        result = AnalysisService(rules_engine).analyze_image(b"image")
+
+        assert not result["gpt_skipped"]
+        assert result["gpt_analysis"]["token_usage"]["prompt_tokens"] > 0
+        assert result["claims"][0]["risk_score"] >= 31
+
+    def test_claims_are_scored_through_local_stand_in_server(self, restore_backend):
+        server = start_stub_server(latency_ms=50)
+        port = server.server_address[1]
+        try:
+            env = {"LLM_API_KEY": "stub", "LLM_BASE_URL": f"http://127.0.0.1:{port}/v1"}
+            with patch.dict(os.environ, env):
+                guard = LLMGuard(max_retries=0, breaker=CircuitBreaker())
+                gpt_service.set_llm_backend(OpenAICompatibleBackend(gpt_service._get_client, model="local-judge", guard=guard))
+
+                started = time.monotonic()
+                result = gpt_service.analyze_claims_with_gpt(["Carbon neutral shipping.", "Free returns within 30 days."])
+                elapsed = time.monotonic() - started
+        finally:
+            server.shutdown()
+
+        assert "skipped" not in result
+        assert elapsed >= 0.05
+        assert [claim["index"] for claim in result["claims"]] == [0, 1]
+        assert result["claims"][0]["risk_score"] > result["claims"][1]["risk_score"]
+        assert result["token_usage"]["completion_tokens"] > 0
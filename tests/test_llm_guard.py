@@ -0,0 +1,123 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+
+from src.app.services import gpt_service
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.llm_guard import CircuitBreaker, CircuitOpenError, LLMGuard
+from src.app.services.rules_engine import rules_engine
+
+
+def _guard(**kwargs):
+    kwargs.setdefault("retry_base_delay", 0)
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=3, reset_seconds=60))
+    return LLMGuard(**kwargs)
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+class TestLLMGuard:
+    def test_retries_retryable_errors_then_succeeds(self):
+        fn = MagicMock(side_effect=[_connection_error(), TimeoutError(), "ok"])
+        assert _guard(max_retries=2).call(fn) == "ok"
+        assert fn.call_count == 3
+
+    def test_non_retryable_errors_are_raised_immediately(self):
+        fn = MagicMock(side_effect=ValueError("bad request"))
+        with pytest.raises(ValueError):
+            _guard(max_retries=2).call(fn)
+        assert fn.call_count == 1
+
+    def test_breaker_opens_after_consecutive_failures_and_fails_fast(self):
+        guard = _guard(max_retries=0)
+        fn = MagicMock(side_effect=TimeoutError())
+        for _ in range(3):
+            with pytest.raises(TimeoutError):
+                guard.call(fn)
+        with pytest.raises(CircuitOpenError):
+            guard.call(fn)
+        assert fn.call_count == 3
+
+    def test_breaker_allows_a_single_trial_after_reset_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+        with patch("src.app.services.llm_guard.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+            assert not breaker.allow()
+        with patch("src.app.services.llm_guard.time.monotonic", return_value=111.0):
+            assert breaker.allow()
+            assert not breaker.allow()
+            breaker.record_success()
+            assert breaker.allow()
+
+    def test_hedges_slow_calls_after_the_observed_p95(self):
+        guard = _guard(hedge_enabled=True, hedge_min_samples=1)
+        guard.latencies.record(0.01)
+        calls = []
+        lock = threading.Lock()
+
+        def fn(remaining):
+            with lock:
+                calls.append(1)
+                first = len(calls) == 1
+            time.sleep(1.0 if first else 0.0)
+            return "slow" if first else "hedged"
+
+        started = time.monotonic()
+        assert guard.call(fn) == "hedged"
+        assert time.monotonic() - started < 0.5
+        assert len(calls) == 2
+
+
+    def test_attempts_get_the_remaining_budget(self):
+        fn = MagicMock(side_effect=[TimeoutError(), "ok"])
+        assert _guard(max_retries=1, deadline_seconds=5).call(fn) == "ok"
+        budgets = [call.args[0] for call in fn.call_args_list]
+        assert 0 < budgets[1] <= budgets[0] <= 5
+
+    def test_no_retry_once_the_deadline_is_spent(self):
+        fn = MagicMock(side_effect=TimeoutError())
+        guard = _guard(max_retries=5, retry_base_delay=10, deadline_seconds=0.05)
+        with patch("src.app.services.llm_guard.random.uniform", return_value=1.0):
+            started = time.monotonic()
+            with pytest.raises(TimeoutError, match="out of time"):
+                guard.call(fn)
+        assert fn.call_count == 1
+        assert time.monotonic() - started < 0.5
+
+    def test_hedged_call_stops_at_the_deadline(self):
+        guard = _guard(hedge_enabled=True, hedge_min_samples=1, deadline_seconds=0.2)
+        guard.latencies.record(0.01)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            guard.call(lambda remaining: time.sleep(1.0))
+        assert time.monotonic() - started < 0.6
+
+
+class TestSkippedVerdicts:
+    @patch('src.app.services.gpt_service._get_client')
+    def test_open_circuit_yields_flagged_fallback(self, mock_get_client):
+        guard = _guard(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+        guard.breaker.record_failure()
+        with patch.object(gpt_service.get_llm_backend(), "guard", guard):
+            result = gpt_service.analyze_text_with_gpt("Carbon neutral shipping")
+        assert result["skipped"] is True
+        assert result["skip_reason"] == "circuit_open"
+        mock_get_client.return_value.chat.completions.create.assert_not_called()
+
+    @patch('src.app.services.analysis_service.analyze_claims_with_gpt')
+    @patch('src.app.services.analysis_service.extract_text_from_image')
+    def test_skipped_gpt_falls_back_to_rules_only_score(self, mock_extract_text, mock_analyze_gpt):
+        mock_extract_text.return_value = "Our products are eco-friendly"
+        mock_analyze_gpt.return_value = {**gpt_service._skipped_result("timeout"), "claims": []}
+
+        result = AnalysisService(rules_engine).analyze_image(b"image")
+
+        assert result["gpt_skipped"] is True
+        assert result["score"] == 10
+        assert result["gpt_analysis"]["skip_reason"] == "timeout"
@@ -0,0 +1,202 @@
+import io
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.app.services import ocr_service
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.gpt_service import _skipped_result
+from src.app.services.pdf_service import PDFService
+from src.app.services.rules_engine import RulesEngine, rules_engine
+
+
+def _frame(seed: int) -> Image.Image:
+    """A frame with a distinct pattern, so frames differ in their difference hash."""
+    image = Image.new("RGB", (90, 80), "white")
+    draw = ImageDraw.Draw(image)
+    for col in range(9):
+        if (seed >> col) & 1:
+            draw.rectangle([col * 10, 0, col * 10 + 9, 79], fill="black")
+    return image
+
+
+def _multi_frame(frames, format="TIFF") -> bytes:
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format=format, save_all=True, append_images=frames[1:])
+    return buffer.getvalue()
+
+
+def _fake_ocr(texts):
+    """Stand-in for Tesseract that reads the frame's pattern back as text."""
+    by_hash = {ocr_service.difference_hash(_frame(seed)): text for seed, text in texts.items()}
+    return lambda image, **kwargs: by_hash[ocr_service.difference_hash(image)]
+
+
+class TestMultiPageOcr:
+    def test_every_frame_is_read_in_page_order(self):
+        data = _multi_frame([_frame(0b101), _frame(0b110), _frame(0b011)])
+        fake = _fake_ocr({0b101: "Page one", 0b110: "Page two", 0b011: "Page three"})
+        with patch("pytesseract.image_to_string", side_effect=fake):
+            text = ocr_service.extract_text_from_image(data)
+        assert text.split(ocr_service.PAGE_SEPARATOR) == ["Page one", "Page two", "Page three"]
+
+    def test_near_duplicate_frames_are_ocred_once(self):
+        data = _multi_frame([_frame(0b101), _frame(0b101), _frame(0b110)])
+        fake = _fake_ocr({0b101: "Eco sale", 0b110: "Carbon neutral"})
+        with patch("pytesseract.image_to_string", side_effect=fake) as mock_ocr:
+            pages = ocr_service.extract_pages_from_image(data)
+        assert pages == ["Eco sale", "", "Carbon neutral"]
+        assert mock_ocr.call_count == 2
+
+    def test_animated_gif_frames_are_read(self):
+        data = _multi_frame([_frame(0b101), _frame(0b110)], format="GIF")
+        with patch("pytesseract.image_to_string", side_effect=_fake_ocr({0b101: "Frame one", 0b110: "Frame two"})):
+            assert ocr_service.extract_pages_from_image(data) == ["Frame one", "Frame two"]
+
+    def test_tesseract_processes_are_capped_across_requests(self):
+        data = _multi_frame([_frame(0b101), _frame(0b110), _frame(0b011)])
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow_ocr(image, **kwargs):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return "text"
+
+        with patch("pytesseract.image_to_string", side_effect=slow_ocr), \
+             patch.object(ocr_service, "_tesseract_slots", threading.BoundedSemaphore(2)):
+            with ThreadPoolExecutor(max_workers=4) as requests:
+                results = list(requests.map(lambda _: ocr_service.extract_pages_from_image(data), range(4)))
+        assert all(pages == ["text"] * 3 for pages in results)
+        assert peak[0] == 2
+
+    def test_page_count_is_capped(self):
+        data = _multi_frame([_frame(seed) for seed in (1, 2, 4, 8)])
+        with patch.object(ocr_service, "OCR_MAX_PAGES", 2):
+            assert len(ocr_service.load_pages(data)) == 2
+
+    def test_pdf_pages_are_rasterized(self):
+        pytest.importorskip("fitz")
+        buffer = io.BytesIO()
+        _frame(0b101).save(buffer, format="PDF", save_all=True, append_images=[_frame(0b110)])
+        assert len(ocr_service.load_pages(buffer.getvalue())) == 2
+
+    def test_oversized_pdf_pages_are_rendered_at_a_lower_dpi(self):
+        a4 = (595, 842)
+        assert ocr_service.pdf_page_dpi(*a4) == ocr_service.OCR_PDF_DPI
+        # A 200-inch square banner would be 1.6 billion pixels at 200 DPI
+        dpi = ocr_service.pdf_page_dpi(14400, 14400)
+        assert dpi < ocr_service.OCR_PDF_DPI
+        assert (200 * dpi) ** 2 <= ocr_service.OCR_MAX_PAGE_PIXELS
+
+    def test_oversized_frame_is_rejected_before_decoding(self):
+        data = _multi_frame([_frame(0b101), Image.new("RGB", (3000, 2000), "white")])
+        decoded = []
+        convert = Image.Image.convert
+
+        def recording_convert(image, *args, **kwargs):
+            decoded.append(image.size)
+            return convert(image, *args, **kwargs)
+
+        with patch.object(ocr_service, "OCR_MAX_PAGE_PIXELS", 1_000_000), \
+             patch.object(Image.Image, "convert", recording_convert):
+            with pytest.raises(ValueError, match="3000x2000"):
+                ocr_service.load_pages(data)
+            assert ocr_service.extract_text_from_image(data) == ""
+        # Only the first, small frame was ever decoded
+        assert set(decoded) == {(90, 80)}
+
+    def test_oversized_jpeg_is_decoded_at_a_reduced_scale(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (4000, 3000), "white").save(buffer, format="JPEG")
+        with patch.object(ocr_service, "OCR_MAX_PAGE_PIXELS", 1_000_000):
+            [page] = ocr_service.load_pages(buffer.getvalue())
+        assert page.width * page.height <= 1_000_000
+        assert page.width >= 250
+
+
+class TestPageProvenance:
+    @patch("src.app.services.analysis_service.analyze_claims_with_gpt", return_value=_skipped_result())
+    @patch("src.app.services.analysis_service.extract_text_from_image")
+    def test_claims_keep_their_page_through_to_the_report(self, mock_extract_text, mock_analyze_gpt):
+        mock_extract_text.return_value = "Summer sale. Free shipping" + ocr_service.PAGE_SEPARATOR + "Our bottles are eco-friendly"
+        image_bytes = _multi_frame([_frame(0b101), _frame(0b110)])
+
+        result = AnalysisService(rules_engine).analyze_image(image_bytes)
+
+        assert [(claim["text"], claim["page"]) for claim in result["claims"]] == [("Our bottles are eco-friendly", 2)]
+        story = PDFService(image_bytes, result)._build_story()
+        assert any("Page 2: Our bottles are eco-friendly" in getattr(flowable, "text", "") for flowable in story)
+        pdf_bytes, _ = PDFService(image_bytes, result).generate_report()
+        assert pdf_bytes.startswith(b"%PDF")
+
+
+class TestLanguageSelection:
+    def _ocr(self, page, osd, hints=(), installed=frozenset({"osd", "eng", "deu", "fra", "rus", "bul"})):
+        with patch("pytesseract.image_to_osd", return_value=osd) as mock_osd, \
+             patch("pytesseract.image_to_string", return_value="text") as mock_ocr, \
+             patch.object(ocr_service, "available_languages", return_value=installed):
+            ocr_service._ocr_page(page, 1, hints)
+        mock_osd.assert_called_once()
+        return mock_ocr.call_args
+
+    def test_detected_script_and_country_hints_pick_the_packs(self):
+        osd = {"rotate": 0, "orientation_conf": 5.0, "script": "Cyrillic", "script_conf": 3.0}
+        call = self._ocr(_frame(0b101), osd, hints=("bul",))
+        assert call.kwargs["lang"] == "bul"
+
+    def test_latin_page_uses_only_latin_hints(self):
+        osd = {"rotate": 0, "orientation_conf": 5.0, "script": "Latin", "script_conf": 3.0}
+        assert self._ocr(_frame(0b101), osd, hints=("nld", "fra", "deu")).kwargs["lang"] == "fra"
+        assert self._ocr(_frame(0b101), osd).kwargs["lang"] == "eng"
+
+    def test_uninstalled_packs_fall_back_to_the_default(self):
+        osd = {"rotate": 0, "orientation_conf": 5.0, "script": "Greek", "script_conf": 3.0}
+        assert self._ocr(_frame(0b101), osd, hints=("ell",)).kwargs["lang"] == "eng"
+
+    def test_detection_is_skipped_without_osd_tessdata(self):
+        with patch("pytesseract.image_to_osd") as mock_osd, \
+             patch.object(ocr_service, "available_languages", return_value=frozenset({"eng"})):
+            assert ocr_service.detect_orientation_and_script(_frame(0b101)) == (0, None)
+        mock_osd.assert_not_called()
+
+    def test_page_is_turned_upright(self):
+        page = Image.new("RGB", (120, 40), "white")
+        osd = {"rotate": 90, "orientation_conf": 5.0, "script": "Latin", "script_conf": 3.0}
+        assert self._ocr(page, osd).args[0].size == (40, 120)
+
+    def test_low_confidence_detection_is_ignored(self):
+        page = Image.new("RGB", (120, 40), "white")
+        osd = {"rotate": 90, "orientation_conf": 0.5, "script": "Cyrillic", "script_conf": 0.2}
+        call = self._ocr(page, osd, hints=("deu",))
+        assert call.args[0].size == (120, 40)
+        assert call.kwargs["lang"] == "deu"
+
+    @patch("src.app.services.analysis_service.analyze_claims_with_gpt", return_value=_skipped_result())
+    @patch("src.app.services.analysis_service.extract_text_from_image")
+    def test_language_is_recorded_and_selects_rules(self, mock_extract_text, mock_analyze_gpt):
+        mock_extract_text.return_value = "Unsere Flaschen sind umweltfreundlich und klimaneutral"
+        engine = RulesEngine(Path("missing.json"))
+        engine.rules = [
+            {"id": "de", "pattern": "klimaneutral", "category": "c", "severity": "high", "recommendation": "r", "languages": ["deu"]},
+            {"id": "fr", "pattern": "klimaneutral", "category": "c", "severity": "high", "recommendation": "r", "languages": ["fra"]},
+            {"id": "any", "pattern": "klimaneutral", "category": "c", "severity": "high", "recommendation": "r"},
+        ]
+        user = SimpleNamespace(id=uuid.uuid4(), country="Belgium", sector=None, company_size=None, role=None)
+
+        result = AnalysisService(engine).analyze_image(b"image", user)
+
+        assert mock_extract_text.call_args.args[1] == ("nld", "fra", "deu")
+        assert result["language"] == "deu"
+        assert [match["rule_id"] for match in result["rule_matches"]] == ["de", "any"]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import tracemalloc
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app.services.profiling import ProfilingMiddleware
+from src.app.services.tracing import TraceSink, TracingMiddleware, span
+
+
+def busy_ocr_work():
+    total = 0
+    for i in range(1_000_000):
+        total += i
+    return total
+
+
+def _app(sink, profile_dir, **options):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, output_dir=str(profile_dir), interval_ms=1, paths=["/api/v1/analyze"], **options)
+    app.add_middleware(TracingMiddleware, sink=sink)
+
+    def work():
+        with span("ocr"):
+            busy_ocr_work()
+            blob = [bytearray(1024) for _ in range(2000)]
+            return len(blob)
+
+    @app.post("/api/v1/analyze")
+    async def analyze():
+        return {"n": await asyncio.to_thread(work)}
+
+    return app
+
+
+def _records(sink):
+    sink.flush()
+    return [json.loads(line) for line in sink.path.read_text().splitlines()]
+
+
+class TestProfilingMiddleware:
+    def test_admin_header_profiles_worker_threads(self, tmp_path):
+        sink = TraceSink(path=tmp_path / "traces.jsonl", enabled=True)
+        client = TestClient(_app(sink, tmp_path / "profiles", token="s3cret", sample_rate=0))
+        response = client.post("/api/v1/analyze", headers={"X-Profile": "s3cret"})
+
+        [record] = _records(sink)
+        stacks_file = Path(record["profile"]["stacks_file"])
+        collapsed = stacks_file.read_text()
+        summary = json.loads(stacks_file.with_suffix(".json").read_text())
+        assert "busy_ocr_work" in collapsed
+        assert summary["samples"] > 0
+        assert summary["peak_bytes"] >= 2000 * 1024
+        assert summary["request_id"] == response.headers["x-request-id"]
+        assert record["profile"]["samples"] == summary["samples"]
+        assert not tracemalloc.is_tracing()
+
+    def test_profile_files_are_not_named_by_the_client(self, tmp_path):
+        sink = TraceSink(path=tmp_path / "traces.jsonl", enabled=True)
+        client = TestClient(_app(sink, tmp_path / "profiles", token="s3cret", sample_rate=0))
+        for _ in range(2):
+            client.post("/api/v1/analyze", headers={"X-Profile": "s3cret", "X-Request-ID": "victim"})
+
+        # Both profiles are kept, under ids the server picked
+        assert len(list((tmp_path / "profiles").glob("*.collapsed"))) == 2
+        assert not (tmp_path / "profiles" / "victim.collapsed").exists()
+
+    def test_allocations_are_traced_by_one_request_at_a_time(self, tmp_path):
+        sink = TraceSink(path=tmp_path / "traces.jsonl", enabled=True)
+        client = TestClient(_app(sink, tmp_path / "profiles", token="s3cret", sample_rate=0))
+        tracemalloc.start()  # stands in for a profile already tracing allocations
+        try:
+            client.post("/api/v1/analyze", headers={"X-Profile": "s3cret"})
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+        [record] = _records(sink)
+        assert record["profile"]["samples"] > 0
+        assert record["profile"]["peak_bytes"] is None
+
+    def test_requests_without_token_or_sampling_are_not_profiled(self, tmp_path):
+        sink = TraceSink(path=tmp_path / "traces.jsonl", enabled=True)
+        client = TestClient(_app(sink, tmp_path / "profiles", token="s3cret", sample_rate=0))
+        client.post("/api/v1/analyze", headers={"X-Profile": "guess"})
+        client.post("/api/v1/analyze")
+
+        assert not (tmp_path / "profiles").exists()
+        assert all("profile" not in record for record in _records(sink))
+
+    def test_sample_rate_selects_requests(self, tmp_path):
+        sink = TraceSink(path=tmp_path / "traces.jsonl", enabled=True)
+        client = TestClient(_app(sink, tmp_path / "profiles", token="", sample_rate=1.0))
+        client.post("/api/v1/analyze")
+
+        assert len(list((tmp_path / "profiles").glob("*.collapsed"))) == 1
+        # Sampled requests never switch tracemalloc on, so other requests do not pay for it
+        [record] = _records(sink)
+        assert record["profile"]["peak_bytes"] is None
@@ -0,0 +1,190 @@
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from src.app.auth.dependencies import get_optional_current_user
+from src.app.services.analysis_service import AnalysisService, analysis_service
+from src.app.services.claim_cache import ClaimCache, claim_key, normalize_claim
+from src.app.services.gpt_service import _skipped_result
+from src.app.services.rules_engine import RulesEngine, rules_engine
+
+ORIGINAL = "Our bottles are eco-friendly. Fresh bread daily. We are carbon neutral"
+EDITED = "Our bottles are eco-friendly. Fresh bread daily. We are carbon neutral since 2020"
+
+
+def _user(**profile):
+    return SimpleNamespace(id=uuid.uuid4(), is_premium=False, country=None, **{"sector": None, "company_size": None, "role": None, **profile})
+
+
+USER = _user()
+
+
+def _fake_gpt(claims, user=None):
+    """Scores each claim by its length, so verdicts are distinguishable."""
+    verdicts = [
+        {"index": i, "risk_score": 40 + len(claim) % 50, "level": "Medium", "subtle_triggers": ["vague"], "reasons": [f"why: {claim}"]}
+        for i, claim in enumerate(claims)
+    ]
+    return {
+        "risk_score": 99, "level": "High", "reasons": ["document"], "subtle_triggers": [],
+        "recommendations": [f"rec: {claims[0]}"], "claims": verdicts,
+        "token_usage": {"prompt_tokens": 10 * len(claims), "completion_tokens": 5, "cached_tokens": 0},
+    }
+
+
+@pytest.fixture
+def service():
+    return AnalysisService(rules_engine, claim_cache=ClaimCache())
+
+
+class TestClaimCache:
+    def test_keys_ignore_case_and_spacing(self):
+        assert normalize_claim("  Eco   Friendly\n") == "eco friendly"
+        assert claim_key("Eco  friendly", "ctx") == claim_key("eco friendly", "ctx")
+        assert claim_key("eco friendly", "ctx") != claim_key("eco friendly", "other")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ClaimCache(max_entries=2)
+        cache.put("a", {"rule_matches": []})
+        cache.put("b", {"rule_matches": []})
+        cache.get("a")
+        cache.put("c", {"rule_matches": []})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and len(cache) == 2
+
+    def test_entries_are_copied(self):
+        cache = ClaimCache()
+        entry = {"rule_matches": [{"rule_id": "r"}]}
+        cache.put("a", entry)
+        entry["rule_matches"].clear()
+        cache.get("a")["rule_matches"].clear()
+        assert cache.get("a") == {"rule_matches": [{"rule_id": "r"}]}
+
+
+class TestReanalysis:
+    def test_only_the_edited_sentence_is_scored(self, service):
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            first = service.analyze_text(ORIGINAL, USER)
+            result = service.reanalyze_text(EDITED, USER)
+
+        assert mock_gpt.call_args.args[0] == ["We are carbon neutral since 2020"]
+        assert result["reanalysis"] == {"claims_total": 3, "claims_reused": 2, "claims_sent_to_gpt": 1}
+        assert result["gpt_analysis"]["token_usage"]["prompt_tokens"] == 10
+        # The document verdict is rebuilt from the per-claim verdicts
+        scores = [claim["risk_score"] for claim in result["claims"] if claim["risk_score"] is not None]
+        assert result["gpt_analysis"]["risk_score"] == max(scores)
+        assert "why: Our bottles are eco-friendly" in result["gpt_analysis"]["reasons"]
+        assert "why: We are carbon neutral" not in result["gpt_analysis"]["reasons"]
+        assert [m["rule_id"] for m in result["rule_matches"]] == [m["rule_id"] for m in first["rule_matches"]]
+        assert result["claim_texts"] == ["Our bottles are eco-friendly", "Fresh bread daily", "We are carbon neutral since 2020"]
+
+    def test_unchanged_copy_needs_no_gpt_call(self, service):
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            first = service.analyze_text(ORIGINAL, USER)
+            again = service.reanalyze_text(ORIGINAL.replace("Fresh", "FRESH"), USER)
+
+        assert mock_gpt.call_count == 1
+        assert again["reanalysis"]["claims_sent_to_gpt"] == 0
+        assert [c["risk_score"] for c in again["claims"]] == [c["risk_score"] for c in first["claims"]]
+        assert again["score"] > 0
+
+    def test_cold_cache_scores_everything(self, service):
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt):
+            result = service.reanalyze_text(ORIGINAL, USER)
+            repeat = service.reanalyze_text(ORIGINAL, USER)
+        assert result["reanalysis"]["claims_reused"] == 0
+        assert repeat["reanalysis"] == {"claims_total": 3, "claims_reused": 3, "claims_sent_to_gpt": 0}
+
+    def test_changed_rules_invalidate_memoized_claims(self):
+        engine = RulesEngine(Path("missing.json"))
+        engine.rules = [{"id": "a", "pattern": "eco", "category": "c", "severity": "high", "recommendation": "r"}]
+        service = AnalysisService(engine, claim_cache=ClaimCache())
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt):
+            service.analyze_text(ORIGINAL, USER)
+            engine.rules = engine.rules + [{"id": "b", "pattern": "bread", "category": "c", "severity": "low", "recommendation": "r"}]
+            engine._compiled = None
+            result = service.reanalyze_text(ORIGINAL, USER)
+        assert result["reanalysis"]["claims_reused"] == 0
+        assert {m["rule_id"] for m in result["rule_matches"]} == {"a", "b"}
+
+    def test_gpt_outage_keeps_memoized_verdicts(self, service):
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt):
+            service.analyze_text(ORIGINAL, USER)
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", return_value={**_skipped_result("timeout"), "claims": []}):
+            result = service.reanalyze_text(EDITED, USER)
+            cold = AnalysisService(rules_engine, claim_cache=ClaimCache()).reanalyze_text(EDITED, USER)
+        assert not result["gpt_skipped"]
+        assert result["gpt_analysis"]["risk_score"] > 0
+        assert cold["gpt_skipped"]
+
+    def test_accounts_with_the_same_profile_do_not_share_memoized_claims(self, service):
+        first, second = _user(sector="Retail"), _user(sector="Retail")
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt) as mock_gpt:
+            service.analyze_text(ORIGINAL, first)
+            result = service.reanalyze_text(ORIGINAL, second)
+        assert result["reanalysis"]["claims_reused"] == 0
+        assert mock_gpt.call_count == 2
+        assert result["reanalysis"]["claims_sent_to_gpt"] == len(mock_gpt.call_args.args[0])
+
+    def test_anonymous_callers_are_not_memoized(self, service):
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt):
+            service.analyze_text(ORIGINAL)
+            result = service.reanalyze_text(ORIGINAL)
+        assert result["reanalysis"]["claims_reused"] == 0
+        assert len(service.claim_cache) == 0
+
+
+class TestReanalysisEndpoint:
+    @pytest.fixture
+    def client(self):
+        analysis_service.claim_cache.clear()
+        yield TestClient(app)
+        app.dependency_overrides.clear()
+
+    def test_revised_text(self, client):
+        app.dependency_overrides[get_optional_current_user] = lambda: USER
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt), \
+             patch("src.app.services.usage_service.get_remaining_analyses", return_value=None), \
+             patch("src.app.services.usage_service.log_analysis") as mock_log:
+            client.post("/api/v1/analyze/text", json={"text": ORIGINAL})
+            response = client.post("/api/v1/analyze/text/reanalyze", json={"text": EDITED})
+
+        assert response.status_code == 200
+        assert response.json()["reanalysis"]["claims_sent_to_gpt"] == 1
+        assert "claim_texts" not in response.json()
+        assert mock_log.call_args.kwargs["input_type"] == "reanalysis"
+
+    def test_prior_log_with_edits(self, client):
+        user = SimpleNamespace(id=uuid.uuid4(), is_premium=False, country=None, sector=None, company_size=None, role=None)
+        app.dependency_overrides[get_optional_current_user] = lambda: user
+        log = SimpleNamespace(result_json={"claim_texts": ORIGINAL.split(". ")})
+        with patch("src.app.services.analysis_service.analyze_claims_with_gpt", side_effect=_fake_gpt), \
+             patch("src.app.services.usage_service.get_remaining_analyses", return_value=None), \
+             patch("src.app.services.usage_service.get_usage_log_by_id", return_value=log), \
+             patch("src.app.services.usage_service.log_analysis"):
+            response = client.post("/api/v1/analyze/text/reanalyze", json={
+                "log_id": str(uuid.uuid4()),
+                "edits": [{"index": 1, "text": ""}, {"index": 2, "text": "We are carbon neutral since 2020"}],
+            })
+
+        assert response.status_code == 200
+        assert [claim["text"] for claim in response.json()["claims"]] == ["Our bottles are eco-friendly", "We are carbon neutral since 2020"]
+
+    def test_edit_out_of_range(self, client):
+        user = SimpleNamespace(id=uuid.uuid4(), is_premium=False, country=None, sector=None, company_size=None, role=None)
+        app.dependency_overrides[get_optional_current_user] = lambda: user
+        log = SimpleNamespace(result_json={"claim_texts": ["One"]})
+        with patch("src.app.services.usage_service.get_usage_log_by_id", return_value=log):
+            response = client.post("/api/v1/analyze/text/reanalyze", json={"log_id": str(uuid.uuid4()), "edits": [{"index": 3, "text": "x"}]})
+        assert response.status_code == 400
+
+    def test_invalid_requests(self, client):
+        assert client.post("/api/v1/analyze/text/reanalyze", json={}).status_code == 400
+        assert client.post("/api/v1/analyze/text/reanalyze", json={"text": "a", "log_id": str(uuid.uuid4())}).status_code == 400
+        assert client.post("/api/v1/analyze/text/reanalyze", json={"text": "a", "edits": [{"index": 0, "text": "b"}]}).status_code == 400
+        assert client.post("/api/v1/analyze/text/reanalyze", json={"log_id": str(uuid.uuid4())}).status_code == 401
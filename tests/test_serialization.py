@@ -0,0 +1,167 @@
+import gzip
+import uuid
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from src.app.models.usage import UsageLog
+from src.app.routers.auth import current_user
+from src.app.schemas.analysis import AnalysisResponse
+from src.app.schemas.usage import UsageLogRead
+from src.app.services import compression
+from src.app.services.compression import CompressionMiddleware, choose_encoding
+from src.app.services.gpt_service import _skipped_result
+from src.app.services.serialization import parse_fields
+
+
+class TestParseFields:
+    def test_dotted_paths_become_an_include_spec(self):
+        include = parse_fields("score, level,gpt_analysis.risk_score,gpt_analysis.level", AnalysisResponse)
+        assert include == {"score": True, "level": True, "gpt_analysis": {"risk_score": True, "level": True}}
+
+    def test_whole_field_wins_over_subfields(self):
+        assert parse_fields("gpt_analysis.level,gpt_analysis", AnalysisResponse) == {"gpt_analysis": True}
+        assert parse_fields("gpt_analysis,gpt_analysis.level", AnalysisResponse) == {"gpt_analysis": True}
+
+    def test_empty_selection_returns_everything(self):
+        assert parse_fields(None, AnalysisResponse) is None
+        assert parse_fields(" , ", AnalysisResponse) is None
+
+    def test_unknown_field_is_rejected(self):
+        with pytest.raises(HTTPException) as excinfo:
+            parse_fields("score,password", AnalysisResponse)
+        assert excinfo.value.status_code == 400
+
+    def test_list_subfields_apply_to_every_item(self):
+        assert parse_fields("rule_matches.rule_id", AnalysisResponse) == {"rule_matches": {"__all__": {"rule_id": True}}}
+        assert parse_fields("claims.text,claims.page", AnalysisResponse) == {"claims": {"__all__": {"text": True, "page": True}}}
+        assert parse_fields("claims.text,claims", AnalysisResponse) == {"claims": True}
+
+    @pytest.mark.parametrize("fields", ["gpt_analysis.password", "claims.secret", "score.value", "reasons.text"])
+    def test_unknown_or_impossible_subfields_are_rejected(self, fields):
+        with pytest.raises(HTTPException) as excinfo:
+            parse_fields(fields, AnalysisResponse)
+        assert excinfo.value.status_code == 400
+
+    def test_untyped_json_allows_only_its_keys(self):
+        assert parse_fields("result_json.score", UsageLogRead) == {"result_json": {"score": True}}
+        with pytest.raises(HTTPException):
+            parse_fields("result_json.claims.text", UsageLogRead)
+
+
+class TestSparseFieldsets:
+    def test_analysis_returns_only_requested_fields(self):
+        client = TestClient(app)
+        with patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()), \
+             patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+             patch('src.app.services.usage_service.log_analysis'):
+            response = client.post("/api/v1/analyze/text?fields=score,level,gpt_analysis.skipped", json={"text": "100% eco-friendly."})
+
+        assert response.status_code == 200
+        assert response.json() == {"score": 10, "level": "Low", "gpt_analysis": {"skipped": True}}
+
+    def test_list_fields_select_from_every_item(self):
+        client = TestClient(app)
+        with patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()), \
+             patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+             patch('src.app.services.usage_service.log_analysis'):
+            rule_ids = client.post("/api/v1/analyze/text?fields=rule_matches.rule_id", json={"text": "100% eco-friendly."})
+            claims = client.post("/api/v1/analyze/text?fields=claims.text", json={"text": "100% eco-friendly."})
+
+        assert rule_ids.json()["rule_matches"] and all(list(match) == ["rule_id"] for match in rule_ids.json()["rule_matches"])
+        assert claims.json() == {"claims": [{"text": "100% eco-friendly"}]}
+
+    def test_batch_fields_apply_to_each_result(self):
+        client = TestClient(app)
+        with patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()), \
+             patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+             patch('src.app.services.usage_service.log_analyses'):
+            response = client.post("/api/v1/analyze/text/batch?fields=level", json={"texts": ["Eco-friendly.", "Fresh bread."]})
+
+        assert response.json() == {"results": [{"level": "Low"}, {"level": "Low"}]}
+
+    def test_usage_history_fields_reach_into_result_json(self):
+        log = UsageLog(
+            id=uuid.uuid4(), timestamp=datetime(2024, 5, 1), input_type="text", chars_count=None,
+            premium_features_used=False, result_json={"score": 10, "level": "Low", "claims": []}, duration_ms=5,
+        )
+        app.dependency_overrides[current_user] = lambda: None
+        try:
+            with patch('src.app.services.usage_service.get_usage_history_version', return_value=(str(log.id), 1)), \
+                 patch('src.app.services.usage_service.get_usage_history', return_value=[log]):
+                response = TestClient(app).get("/api/v1/me/usage?fields=input_type,result_json.score")
+        finally:
+            del app.dependency_overrides[current_user]
+
+        assert response.json() == [{"input_type": "text", "result_json": {"score": 10}}]
+
+
+def _compression_app():
+    test_app = FastAPI()
+    test_app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @test_app.get("/big")
+    def big():
+        return {"items": ["greenwashing"] * 100}
+
+    @test_app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @test_app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"x" * 500, b"y" * 500]), media_type="application/pdf")
+
+    @test_app.get("/text")
+    def text():
+        return PlainTextResponse("z" * 500)
+
+    @test_app.get("/vary")
+    def vary():
+        return PlainTextResponse("z" * 500, headers={"Vary": "Origin"})
+
+    return TestClient(test_app)
+
+
+class TestCompression:
+    def test_large_json_is_gzipped(self):
+        response = _compression_app().get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.json() == {"items": ["greenwashing"] * 100}  # httpx decodes the body
+        assert int(response.headers["content-length"]) < 200
+
+    def test_small_and_streamed_responses_are_not_compressed(self):
+        client = _compression_app()
+        assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+        streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in streamed.headers
+        assert streamed.content == b"x" * 500 + b"y" * 500
+
+    def test_identity_clients_get_plain_bodies(self):
+        response = _compression_app().get("/text", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.text == "z" * 500
+
+    def test_uncompressed_variants_also_vary_on_accept_encoding(self):
+        client = _compression_app()
+        assert client.get("/text", headers={"Accept-Encoding": "identity"}).headers["vary"] == "Accept-Encoding"
+        assert client.get("/small", headers={"Accept-Encoding": "gzip"}).headers["vary"] == "Accept-Encoding"
+        assert client.get("/vary", headers={"Accept-Encoding": "gzip"}).headers["vary"] == "Origin, Accept-Encoding"
+        # Never compressed, so nothing to vary on
+        assert "vary" not in client.get("/stream", headers={"Accept-Encoding": "gzip"}).headers
+
+    def test_encoding_negotiation(self):
+        with patch.object(compression, "_brotli", False):
+            assert choose_encoding("br, gzip") == "gzip"
+        with patch.object(compression, "_brotli", object()):
+            assert choose_encoding("gzip, br") == "br"
+            assert choose_encoding("br;q=0, gzip;q=0.5") == "gzip"
+        assert choose_encoding("gzip;q=0") is None
+        assert choose_encoding("*") == "gzip"
+        assert choose_encoding("") is None
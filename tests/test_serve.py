@@ -0,0 +1,50 @@
+import argparse
+import os
+from unittest.mock import MagicMock, patch
+
+from src.app import serve
+
+
+class TestWorkerSupervision:
+    def test_crashing_worker_logs_its_traceback(self, capfd):
+        with patch.object(serve, "_run_worker", side_effect=RuntimeError("database URL is malformed")):
+            pid = serve._fork_worker(None, argparse.Namespace())
+            _, status = os.waitpid(pid, 0)
+
+        assert os.waitstatus_to_exitcode(status) == 1
+        err = capfd.readouterr().err
+        assert "Traceback" in err and "database URL is malformed" in err
+
+    def test_restart_delay_backs_off(self):
+        assert serve._restart_delay(0) == 1
+        assert [serve._restart_delay(n) for n in (1, 2, 3)] == [1, 2, 4]
+        assert serve._restart_delay(50) == serve.WORKER_RESTART_MAX_DELAY_SECONDS
+
+    def test_launcher_gives_up_on_a_worker_that_keeps_crashing_on_start(self):
+        pids = iter(range(1000, 1100))
+        forked = []
+
+        def fork_worker(sock, args):
+            forked.append(next(pids))
+            return forked[-1]
+
+        def wait():
+            if not forked:
+                raise ChildProcessError
+            return forked.pop(0), 256
+
+        with patch.object(serve, "_bind", return_value=MagicMock()), \
+             patch("src.app.services.warmup.warmup.preload"), \
+             patch("gc.freeze"), \
+             patch("signal.signal"), \
+             patch("os.kill"), \
+             patch.object(serve, "_fork_worker", side_effect=fork_worker) as mock_fork, \
+             patch("os.wait", side_effect=wait), \
+             patch("time.sleep") as mock_sleep:
+            code = serve.main(["--workers", "1"])
+
+        assert code == 1
+        assert mock_fork.call_count == serve.WORKER_MAX_QUICK_CRASHES
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [
+            serve._restart_delay(n) for n in range(1, serve.WORKER_MAX_QUICK_CRASHES)
+        ]
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from src.app.models.user import User
+from src.app.services.analysis_service import AnalysisService
+from src.app.services.rules_engine import rules_engine
+from src.app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_with_same_key_share_one_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"score": 42, "reasons": []}
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("same", work) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result == {"score": 42, "reasons": []} for result in results)
+    results[0]["reasons"].append("mutated")
+    assert results[1]["reasons"] == []
+    assert not flight.in_flight("same")
+
+
+def test_different_keys_and_sequential_calls_run_separately():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def run():
+        flight = SingleFlight()
+        await asyncio.gather(flight.do("a", work), flight.do("b", work))
+        await flight.do("a", work)
+
+    asyncio.run(run())
+    assert len(calls) == 3
+
+
+def test_errors_reach_every_waiter_and_clear_the_key():
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not flight.in_flight("k")
+
+
+def test_cancelling_one_caller_does_not_cancel_shared_work():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_analysis_service_coalesces_identical_uploads_per_profile():
+    service = AnalysisService(rules_engine)
+    release = threading.Event()
+    calls = []
+
+    def slow_analyze(image_bytes, user=None):
+        calls.append((image_bytes, user))
+        release.wait(timeout=5)
+        return {"score": 10}
+
+    marketing = User(id=uuid.uuid4(), email="m@example.com", sector="Retail", role="Marketing")
+    colleague = User(id=uuid.uuid4(), email="c@example.com", sector="Retail", role="Marketing")
+    legal = User(id=uuid.uuid4(), email="l@example.com", sector="Retail", role="Legal")
+
+    async def run():
+        pending = [
+            asyncio.ensure_future(service.analyze_image_async(b"creative", marketing)),
+            asyncio.ensure_future(service.analyze_image_async(b"creative", colleague)),
+            asyncio.ensure_future(service.analyze_image_async(b"creative", legal)),
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*pending)
+
+    with patch.object(service, "analyze_image", side_effect=slow_analyze):
+        results = asyncio.run(run())
+
+    assert results == [{"score": 10}] * 3
+    assert len(calls) == 2
+    assert service.content_key(b"creative", marketing) == service.content_key(b"creative", colleague)
+    assert service.content_key(b"creative", marketing) != service.content_key(b"creative", legal)
@@ -0,0 +1,257 @@
+import asyncio
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from src.app.auth.dependencies import get_optional_current_user
+from src.app.services.gpt_service import _skipped_result
+from src.app.services.url_fetcher import UrlFetcher, UrlFetchError, is_public_address, url_fetcher
+
+PNG_BYTES = open("tests/test_image.png", "rb").read()
+
+
+class AssetServer:
+    """Local stand-in for the DAM: serves assets with an ETag and honours If-None-Match."""
+
+    def __init__(self):
+        self.assets = {}
+        self.redirects = {"/redirect": "/ad.png"}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get("If-None-Match")))
+                if self.path in server.redirects:
+                    self.send_response(302)
+                    self.send_header("Location", server.redirects[self.path])
+                    self.end_headers()
+                    return
+                if self.path not in server.assets:
+                    self.send_error(404)
+                    return
+                body, content_type, etag = server.assets[self.path]
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+
+@pytest.fixture
+def server():
+    server = AssetServer()
+    server.assets["/ad.png"] = (PNG_BYTES, "image/png", '"v1"')
+    yield server
+    server.httpd.shutdown()
+
+
+def _local_fetcher(**kwargs):
+    """A fetcher allowed to reach the local stand-in DAM."""
+    return UrlFetcher(allow_private_addresses=True, **kwargs)
+
+
+class TestUrlFetcher:
+    def test_unchanged_asset_is_revalidated_not_downloaded(self, server):
+        fetcher = _local_fetcher()
+
+        async def run():
+            first = await fetcher.fetch(server.url("/ad.png"))
+            second = await fetcher.fetch(server.url("/ad.png"))
+            await fetcher.aclose()
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first.content == PNG_BYTES and not first.not_modified
+        assert second.not_modified and second.content == PNG_BYTES
+        assert server.requests == [("/ad.png", None), ("/ad.png", '"v1"')]
+
+    def test_changed_asset_replaces_cached_copy(self, server):
+        fetcher = _local_fetcher()
+
+        async def run():
+            first = await fetcher.fetch(server.url("/ad.png"))
+            fetcher.remember_analysis(first, "key", {"score": 1})
+            server.assets["/ad.png"] = (PNG_BYTES + b"changed", "image/png", '"v2"')
+            second = await fetcher.fetch(server.url("/ad.png"))
+            await fetcher.aclose()
+            return second
+
+        second = asyncio.run(run())
+        assert not second.not_modified
+        assert second.etag == '"v2"'
+        assert fetcher.cached_analysis(second, "key") is None
+
+    def test_redirects_are_followed(self, server):
+        fetcher = _local_fetcher()
+
+        async def run():
+            asset = await fetcher.fetch(server.url("/redirect"))
+            await fetcher.aclose()
+            return asset
+
+        assert asyncio.run(run()).content == PNG_BYTES
+
+    @pytest.mark.parametrize("path, asset, status_code", [
+        ("/page.html", (b"<html></html>", "text/html", None), 415),
+        ("/huge.png", (b"x" * 2048, "image/png", None), 413),
+        ("/missing.png", None, 502),
+    ])
+    def test_limits_are_enforced(self, server, path, asset, status_code):
+        if asset is not None:
+            server.assets[path] = asset
+        fetcher = _local_fetcher(max_bytes=1024)
+
+        async def run():
+            try:
+                await fetcher.fetch(server.url(path))
+            finally:
+                await fetcher.aclose()
+
+        with pytest.raises(UrlFetchError) as excinfo:
+            asyncio.run(run())
+        assert excinfo.value.status_code == status_code
+
+    def test_disallowed_scheme_and_host_are_rejected(self):
+        fetcher = UrlFetcher(allowed_hosts=["dam.example.com"])
+        with pytest.raises(UrlFetchError):
+            asyncio.run(fetcher.fetch("file:///etc/passwd"))
+        with pytest.raises(UrlFetchError) as excinfo:
+            asyncio.run(fetcher.fetch("http://127.0.0.1/ad.png"))
+        assert excinfo.value.status_code == 403
+
+    @pytest.mark.parametrize("url", [
+        "http://127.0.0.1/ad.png",
+        "http://localhost/ad.png",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.5/ad.png",
+        "http://[::ffff:127.0.0.1]/ad.png",
+    ])
+    def test_private_addresses_are_rejected(self, url):
+        with pytest.raises(UrlFetchError) as excinfo:
+            asyncio.run(UrlFetcher().fetch(url))
+        assert excinfo.value.status_code == 403
+
+    def test_redirect_to_a_private_address_is_rejected(self, server):
+        server.redirects["/to-loopback"] = server.url("/ad.png")
+        fetcher = UrlFetcher()
+        real_resolve = fetcher._resolve
+
+        async def resolve(host, port):
+            # cdn.example.com stands for a public host that redirects into the private network
+            return "127.0.0.1" if host == "cdn.example.com" else await real_resolve(host, port)
+
+        async def run():
+            try:
+                await fetcher.fetch(f"http://cdn.example.com:{server.httpd.server_address[1]}/to-loopback")
+            finally:
+                await fetcher.aclose()
+
+        with patch.object(fetcher, "_resolve", side_effect=resolve), pytest.raises(UrlFetchError) as excinfo:
+            asyncio.run(run())
+        assert excinfo.value.status_code == 403
+        assert [path for path, _ in server.requests] == ["/to-loopback"]
+
+    def test_redirect_off_the_allowlist_is_rejected(self, server):
+        server.redirects["/elsewhere"] = server.url("/ad.png")
+        fetcher = _local_fetcher(allowed_hosts=["localhost"])
+
+        async def run():
+            try:
+                await fetcher.fetch(f"http://localhost:{server.httpd.server_address[1]}/elsewhere")
+            finally:
+                await fetcher.aclose()
+
+        with pytest.raises(UrlFetchError) as excinfo:
+            asyncio.run(run())
+        assert excinfo.value.status_code == 403
+        assert [path for path, _ in server.requests] == ["/elsewhere"]
+
+    def test_public_addresses(self):
+        assert is_public_address("93.184.216.34")
+        assert not is_public_address("100.64.0.1")
+        assert not is_public_address("fd00::1")
+        assert not is_public_address("224.0.0.1")
+
+    def test_cache_is_bounded_by_bytes(self, server):
+        server.assets["/other.png"] = (PNG_BYTES, "image/png", '"o1"')
+        fetcher = _local_fetcher(cache_max_bytes=len(PNG_BYTES) + 1)
+
+        async def run():
+            await fetcher.fetch(server.url("/ad.png"))
+            await fetcher.fetch(server.url("/other.png"))
+            await fetcher.aclose()
+
+        asyncio.run(run())
+        assert len(fetcher) == 1
+
+
+class TestAnalyzeUrlEndpoint:
+    @pytest.fixture(autouse=True)
+    def local_dam(self):
+        # The stand-in DAM listens on loopback, so it has to be allowlisted like a private DAM
+        with patch.object(url_fetcher, "allowed_hosts", {"127.0.0.1"}), \
+             patch.object(url_fetcher, "allow_private_addresses", True):
+            yield
+
+    def test_unchanged_asset_reuses_cached_analysis(self, server):
+        client = TestClient(app)
+        url_fetcher.clear()
+        with patch('src.app.services.analysis_service.extract_text_from_image', return_value="100% eco-friendly bottles") as mock_ocr, \
+             patch('src.app.services.analysis_service.analyze_claims_with_gpt', return_value=_skipped_result()), \
+             patch('src.app.services.usage_service.get_remaining_analyses', return_value=None), \
+             patch('src.app.services.usage_service.log_analysis') as mock_log:
+            first = client.post("/api/v1/analyze/url", json={"url": server.url("/ad.png")})
+            second = client.post("/api/v1/analyze/url", json={"url": server.url("/ad.png")})
+
+        assert first.status_code == 200 and second.status_code == 200
+        assert first.headers["X-Analysis-Cache"] == "miss"
+        assert second.headers["X-Analysis-Cache"] == "hit"
+        assert first.json()["score"] == second.json()["score"]
+        assert mock_ocr.call_count == 1
+        assert mock_log.call_args.kwargs["input_type"] == "url"
+        url_fetcher.clear()
+
+    def test_fetch_errors_map_to_http_status(self, server):
+        server.assets["/page.html"] = (b"<html></html>", "text/html", None)
+        client = TestClient(app)
+        with patch('src.app.services.usage_service.get_remaining_analyses', return_value=None):
+            response = client.post("/api/v1/analyze/url", json={"url": server.url("/page.html")})
+        assert response.status_code == 415
+
+    def test_anonymous_callers_need_an_allowlist(self, server):
+        client = TestClient(app)
+        user = SimpleNamespace(id=uuid.uuid4(), is_premium=False, country=None, sector=None, company_size=None, role=None)
+        with patch.object(url_fetcher, "allowed_hosts", set()), \
+             patch('src.app.services.usage_service.get_remaining_analyses', return_value=None):
+            anonymous = client.post("/api/v1/analyze/url", json={"url": "http://169.254.169.254/latest/meta-data/"})
+            app.dependency_overrides[get_optional_current_user] = lambda: user
+            try:
+                with patch.object(url_fetcher, "allow_private_addresses", False):
+                    signed_in = client.post("/api/v1/analyze/url", json={"url": "http://169.254.169.254/latest/meta-data/"})
+            finally:
+                app.dependency_overrides.clear()
+        assert anonymous.status_code == 401
+        assert signed_in.status_code == 403
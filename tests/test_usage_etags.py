@@ -0,0 +1,106 @@
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from src.app.models.usage import UsageLog
+from src.app.routers.auth import current_user
+from src.app.services.serialization import etag_matches
+
+
+def _log(**overrides):
+    values = dict(
+        id=uuid.uuid4(), timestamp=datetime(2024, 5, 1), input_type="text", chars_count=None,
+        premium_features_used=False, result_json={"score": 10, "level": "Low"}, duration_ms=5,
+    )
+    return UsageLog(**{**values, **overrides})
+
+
+OWNER = SimpleNamespace(id=uuid.uuid4())
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[current_user] = lambda: OWNER
+    yield TestClient(app)
+    del app.dependency_overrides[current_user]
+
+
+class TestSingleLog:
+    def test_log_carries_content_etag_and_immutable_caching(self, client):
+        log = _log()
+        with patch('src.app.services.usage_service.get_usage_log_by_id', return_value=log):
+            response = client.get(f"/api/v1/me/usage/{log.id}")
+
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith(f'"{log.id}-')
+        assert "immutable" in response.headers["cache-control"]
+        assert "private" in response.headers["cache-control"]
+
+    def test_revalidation_is_answered_without_a_query(self, client):
+        log = _log()
+        with patch('src.app.services.usage_service.get_usage_log_by_id', return_value=log) as mock_get:
+            etag = client.get(f"/api/v1/me/usage/{log.id}").headers["etag"]
+            response = client.get(f"/api/v1/me/usage/{log.id}", headers={"If-None-Match": f"W/{etag}"})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert mock_get.call_count == 1
+
+    def test_tag_of_another_log_does_not_match(self, client):
+        log = _log()
+        with patch('src.app.services.usage_service.get_usage_log_by_id', return_value=log):
+            response = client.get(f"/api/v1/me/usage/{log.id}", headers={"If-None-Match": f'"{uuid.uuid4()}-abc"'})
+        assert response.status_code == 200
+
+    def test_tag_of_another_user_does_not_match(self, client):
+        log = _log()
+        with patch('src.app.services.usage_service.get_usage_log_by_id', return_value=log):
+            etag = client.get(f"/api/v1/me/usage/{log.id}").headers["etag"]
+        app.dependency_overrides[current_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+        with patch('src.app.services.usage_service.get_usage_log_by_id', return_value=None):
+            response = client.get(f"/api/v1/me/usage/{log.id}", headers={"If-None-Match": etag})
+        # Another user learns nothing from a tag, not even that the log exists
+        assert response.status_code == 404
+
+
+class TestHistory:
+    def test_history_revalidates_against_latest_id_and_count(self, client):
+        logs = [_log(), _log()]
+        with patch('src.app.services.usage_service.get_usage_history_version', return_value=(str(logs[0].id), 2)), \
+             patch('src.app.services.usage_service.get_usage_history', return_value=logs) as mock_history:
+            first = client.get("/api/v1/me/usage")
+            etag = first.headers["etag"]
+            second = client.get("/api/v1/me/usage", headers={"If-None-Match": etag})
+
+        assert first.status_code == 200 and len(first.json()) == 2
+        assert etag.startswith(f'"{logs[0].id}-2-')
+        assert second.status_code == 304
+        assert mock_history.call_count == 1
+
+    def test_new_log_changes_the_history_etag(self, client):
+        with patch('src.app.services.usage_service.get_usage_history_version', return_value=("a", 1)), \
+             patch('src.app.services.usage_service.get_usage_history', return_value=[]):
+            etag = client.get("/api/v1/me/usage").headers["etag"]
+        with patch('src.app.services.usage_service.get_usage_history_version', return_value=("b", 2)), \
+             patch('src.app.services.usage_service.get_usage_history', return_value=[]):
+            response = client.get("/api/v1/me/usage", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+    def test_field_selection_is_part_of_the_etag(self, client):
+        with patch('src.app.services.usage_service.get_usage_history_version', return_value=("a", 1)), \
+             patch('src.app.services.usage_service.get_usage_history', return_value=[]):
+            full = client.get("/api/v1/me/usage").headers["etag"]
+            sparse = client.get("/api/v1/me/usage?fields=id").headers["etag"]
+        assert full != sparse
+
+
+def test_if_none_match_uses_weak_comparison():
+    assert etag_matches('W/"a-1", "b-2"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
@@ -0,0 +1,159 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.app.db.database import Base
+from src.app.models.user import User
+from src.app.services import usage_service
+
+
+@pytest.fixture
+def session_maker(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rollups.db'}")
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(setup())
+    monkeypatch.setattr(usage_service, "async_session_maker", maker)
+    yield maker
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def user(session_maker):
+    user = User(id=uuid.uuid4(), email="stats@example.com", hashed_password="x", is_premium=False)
+
+    async def create():
+        async with session_maker() as session:
+            session.add(user)
+            await session.commit()
+
+    asyncio.run(create())
+    return user
+
+
+def _log(user, score, level, duration_ms):
+    return usage_service.log_analysis(
+        input_type="image",
+        result_json={"score": score, "level": level},
+        duration_ms=duration_ms,
+        user=user,
+        ip_address="10.0.0.1",
+    )
+
+
+def test_log_analysis_updates_daily_rollup(user):
+    async def run():
+        await _log(user, 12, "Low", 80)
+        await _log(user, 52, "Medium", 900)
+        await _log(user, 100, "High", 4000)
+        return await usage_service.get_usage_stats(user, days=7)
+
+    stats = asyncio.run(run())
+
+    totals = stats["totals"]
+    assert totals["analysis_count"] == 3
+    assert totals["mean_duration_ms"] == pytest.approx((80 + 900 + 4000) / 3, abs=0.1)
+    assert totals["p95_duration_ms"] == 4000
+    assert totals["level_distribution"] == {"Low": 1, "Medium": 1, "High": 1}
+    assert totals["score_distribution"]["10-19"] == 1
+    assert totals["score_distribution"]["50-59"] == 1
+    assert totals["score_distribution"]["90-100"] == 1
+    assert len(stats["daily"]) == 1
+    assert stats["daily"][0]["day"] == datetime.utcnow().date()
+
+
+def test_rebuild_daily_rollups_matches_incremental_rollup(user):
+    async def run():
+        await _log(user, 30, "Low", 150)
+        await _log(user, 80, "High", 2500)
+        incremental = await usage_service.get_usage_stats(user, days=1)
+        written = await usage_service.rebuild_daily_rollups(datetime.utcnow().date())
+        rebuilt = await usage_service.get_usage_stats(user, days=1)
+        return incremental, written, rebuilt
+
+    incremental, written, rebuilt = asyncio.run(run())
+
+    assert written == 1
+    assert rebuilt == incremental
+
+
+def test_anonymous_usage_is_not_rolled_up(session_maker, user):
+    async def run():
+        await _log(None, 40, "Medium", 200)
+        return await usage_service.get_usage_stats(user, days=1)
+
+    stats = asyncio.run(run())
+
+    assert stats["totals"]["analysis_count"] == 0
+    assert stats["totals"]["p95_duration_ms"] is None
+    assert stats["daily"] == []
+
+
+def test_history_version_tracks_latest_log_and_count(user):
+    assert asyncio.run(usage_service.get_usage_history_version(user)) == (None, 0)
+
+    asyncio.run(_log(user, 10, "Low", 100))
+    asyncio.run(_log(user, 80, "High", 100))
+
+    latest_id, count = asyncio.run(usage_service.get_usage_history_version(user))
+    history = asyncio.run(usage_service.get_usage_history(user))
+    assert count == 2
+    assert latest_id in {str(log.id) for log in history}
+
+
+def test_concurrent_logs_are_all_counted(user):
+    async def run():
+        # Separate sessions interleave at every await, like concurrent workers
+        await asyncio.gather(*(_log(user, 10 * i, "Low", 100) for i in range(8)))
+        return await usage_service.get_usage_stats(user, days=1), await usage_service.get_usage_history_version(user)
+
+    stats, (_, log_count) = asyncio.run(run())
+
+    assert log_count == 8
+    assert stats["totals"]["analysis_count"] == 8
+    assert sum(stats["totals"]["score_distribution"].values()) == 8
+
+
+def test_rollup_conflict_never_loses_the_log(user, monkeypatch):
+    real_update = usage_service.update
+    # Another worker wins every compare-and-set
+    monkeypatch.setattr(usage_service, "update", lambda *args: real_update(*args).where(False))
+
+    asyncio.run(_log(user, 10, "Low", 100))
+
+    assert asyncio.run(usage_service.get_usage_history_version(user))[1] == 1
+    assert asyncio.run(usage_service.get_usage_stats(user, days=1))["totals"]["analysis_count"] == 0
+
+
+def test_rollup_created_by_another_worker_is_reused(user, session_maker):
+    async def run():
+        # Another worker inserts the row between our lookup and our insert
+        async with session_maker() as session:
+            session.add(usage_service._new_rollup(user.id, datetime.utcnow().date()))
+            await session.commit()
+        real_select = usage_service.select
+        calls = []
+
+        def first_lookup_misses(*args):
+            statement = real_select(*args)
+            calls.append(statement)
+            return statement.where(False) if len(calls) == 1 else statement
+
+        usage_service.select = first_lookup_misses
+        try:
+            await _log(user, 50, "Medium", 300)
+        finally:
+            usage_service.select = real_select
+        return await usage_service.get_usage_stats(user, days=1)
+
+    stats = asyncio.run(run())
+
+    assert stats["totals"]["analysis_count"] == 1
+    assert len(stats["daily"]) == 1
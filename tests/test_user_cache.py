@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.app.auth import dependencies
+from src.app.auth.user_cache import UserCache
+from src.app.models.user import User
+
+
+def _user():
+    return User(id=uuid.uuid4(), email=f"{uuid.uuid4().hex}@example.com", is_active=True, is_premium=False)
+
+
+def _request(token):
+    request = MagicMock()
+    request.cookies = {"greencheck": token} if token else {}
+    request.headers = {}
+    return request
+
+
+class TestUserCache:
+    def test_returns_cached_user_until_ttl_expires(self):
+        cache = UserCache(ttl_seconds=30, max_entries=10)
+        user = _user()
+        with patch("src.app.auth.user_cache.time.monotonic", return_value=100.0):
+            cache.set("token-a", user)
+            assert cache.get("token-a") is user
+        with patch("src.app.auth.user_cache.time.monotonic", return_value=131.0):
+            assert cache.get("token-a") is None
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used_entry_when_full(self):
+        cache = UserCache(ttl_seconds=30, max_entries=2)
+        users = [_user() for _ in range(3)]
+        cache.set("a", users[0])
+        cache.set("b", users[1])
+        cache.get("a")
+        cache.set("c", users[2])
+        assert cache.get("a") is users[0]
+        assert cache.get("b") is None
+        assert cache.get("c") is users[2]
+
+    def test_invalidate_user_drops_all_tokens_of_that_user(self):
+        cache = UserCache(ttl_seconds=30, max_entries=10)
+        user, other = _user(), _user()
+        cache.set("session-1", user)
+        cache.set("session-2", user)
+        cache.set("session-3", other)
+        cache.invalidate_user(user.id)
+        assert cache.get("session-1") is None
+        assert cache.get("session-2") is None
+        assert cache.get("session-3") is other
+
+
+class TestGetOptionalCurrentUser:
+    def test_anonymous_request_skips_token_lookup(self):
+        with patch.object(dependencies, "_read_user_from_token", new=AsyncMock()) as mock_read:
+            assert asyncio.run(dependencies.get_optional_current_user(_request(None))) is None
+            mock_read.assert_not_called()
+
+    def test_resolved_user_is_cached_until_invalidated(self):
+        user = _user()
+        cache = UserCache(ttl_seconds=30, max_entries=10)
+        with patch.object(dependencies, "user_cache", cache), \
+             patch.object(dependencies, "_read_user_from_token", new=AsyncMock(return_value=user)) as mock_read:
+            for _ in range(3):
+                assert asyncio.run(dependencies.get_optional_current_user(_request("jwt"))) is user
+            assert mock_read.await_count == 1
+
+            cache.invalidate_user(user.id)
+            assert asyncio.run(dependencies.get_optional_current_user(_request("jwt"))) is user
+            assert mock_read.await_count == 2
+
+    def test_invalid_token_is_not_cached(self):
+        cache = UserCache(ttl_seconds=30, max_entries=10)
+        with patch.object(dependencies, "user_cache", cache), \
+             patch.object(dependencies, "_read_user_from_token", new=AsyncMock(return_value=None)):
+            assert asyncio.run(dependencies.get_optional_current_user(_request("bad"))) is None
+        assert len(cache) == 0
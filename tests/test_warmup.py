@@ -0,0 +1,73 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from src.app.services import warmup as warmup_module
+from src.app.services.warmup import FAILED, OK, SKIPPED, Warmup
+
+
+def _ok(detail="ok"):
+    return lambda: (OK, detail)
+
+
+class TestWarmup:
+    def test_worker_is_ready_once_every_component_is_warm(self):
+        warmup = Warmup()
+        assert warmup.readiness()[0] is False
+
+        with patch.multiple(
+            warmup_module,
+            _compile_rules=_ok(), _render_pdf=_ok(), _check_tesseract=_ok(),
+            _import_llm_sdk=lambda: ("pending", "openai backend"),
+            _create_llm_client=lambda: (SKIPPED, "no API key configured"),
+        ), patch.object(warmup_module, "_open_database", return_value="pool open") as open_database:
+            asyncio.run(warmup.warm_worker())
+
+        ready, components = warmup.readiness()
+        assert ready is True
+        assert components["llm_client"]["status"] == SKIPPED
+        assert components["database"]["status"] == OK
+        open_database.assert_awaited_once()
+
+    def test_failed_component_keeps_worker_unready(self):
+        warmup = Warmup()
+
+        def missing_tesseract():
+            raise FileNotFoundError("tesseract")
+
+        with patch.multiple(
+            warmup_module,
+            _compile_rules=_ok(), _render_pdf=_ok(), _check_tesseract=missing_tesseract,
+            _import_llm_sdk=_ok(), _create_llm_client=_ok(),
+        ), patch.object(warmup_module, "_open_database", return_value="pool open"):
+            asyncio.run(warmup.warm_worker())
+
+        ready, components = warmup.readiness()
+        assert ready is False
+        assert components["ocr"]["status"] == FAILED
+        assert "FileNotFoundError" in components["ocr"]["detail"]
+
+    def test_preload_is_idempotent(self):
+        warmup = Warmup()
+        with patch.object(warmup_module, "_compile_rules", return_value=(OK, "3 rules")) as compile_rules, patch.multiple(
+            warmup_module, _render_pdf=_ok(), _check_tesseract=_ok(), _import_llm_sdk=_ok(),
+        ):
+            warmup.preload()
+            warmup.preload()
+        compile_rules.assert_called_once()
+
+
+class TestReadyEndpoint:
+    def test_ready_reports_components_and_503_until_warm(self):
+        client = TestClient(app)
+        with patch.object(warmup_module.warmup, "state", {"rules": {"status": OK}, "database": {"status": "pending"}}):
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["components"]["database"]["status"] == "pending"
+
+        with patch.object(warmup_module.warmup, "state", {"rules": {"status": OK}, "llm_client": {"status": SKIPPED}}):
+            response = client.get("/ready")
+            assert response.status_code == 200
+            assert response.json()["status"] == "ready"